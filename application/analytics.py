@@ -0,0 +1,307 @@
+"""
+Analytics engine.
+
+Activity is appended to `activity_events` and folded into small rollup tables
+as it happens, so the analytics endpoints read O(days) precomputed rows instead
+of scanning `users`/`tasks`. The rollups can be rebuilt from the event log at
+any time with rebuild_rollups() (`python manage.py backfill`).
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, exists, func, insert, literal, null, select
+
+from application import retention
+from application.models import (
+    ActivityEvent,
+    DailyRollup,
+    RetentionRollup,
+    Task,
+    User,
+    UserActivityDay,
+)
+from infrastructure.database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+SIGNUP = "signup"
+LOGIN = "login"
+TASK_CREATED = "task_created"
+TASK_COMPLETED = "task_completed"
+HABIT_CHECKED_IN = "habit_checked_in"
+
+RETENTION_WEEKS = 4
+
+# Event types that bump a per-day counter besides active_users
+_DAILY_COUNTERS = {
+    SIGNUP: "signups",
+    TASK_CREATED: "tasks_created",
+    TASK_COMPLETED: "tasks_completed",
+}
+
+
+def week_start(day: date) -> date:
+    """Monday of the week containing `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def _increment(db, model, keys: dict, column: str, amount: int = 1):
+    table = model.__table__
+    stmt = dialect_insert(db, table).values(**keys, **{column: amount})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + amount},
+    )
+    db.execute(stmt)
+
+
+def _mark_active(db, user_id: int, day: date) -> bool:
+    """Record that the user was active on `day`; True if this is their first activity that day."""
+    stmt = dialect_insert(db, UserActivityDay.__table__).values(user_id=user_id, day=day)
+    return db.execute(stmt.on_conflict_do_nothing()).rowcount == 1
+
+
+def _count_retention(db, user_id: int, day: date):
+    start = week_start(day)
+    days_this_week = db.scalar(
+        select(func.count()).select_from(UserActivityDay).where(
+            UserActivityDay.user_id == user_id,
+            UserActivityDay.day >= start,
+            UserActivityDay.day < start + timedelta(days=7),
+        )
+    )
+    if days_this_week > 1:
+        # Already counted for this week
+        return
+    signed_up_at = db.scalar(select(User.created_at).where(User.id == user_id))
+    if signed_up_at is None:
+        return
+    cohort_week = week_start(signed_up_at.date())
+    offset = (start - cohort_week).days // 7
+    if 0 <= offset <= RETENTION_WEEKS:
+        _increment(db, RetentionRollup, {"cohort_week": cohort_week, "week_offset": offset}, "active_users")
+
+
+def apply_event(db, user_id: int, event_type: str, occurred_at: datetime, track_retention: bool = True,
+                count: int = 1):
+    """
+    Fold `count` events of one type and day into the rollups. Each step is a
+    keyed upsert, so the cost does not depend on how much history already exists.
+    """
+    day = occurred_at.date()
+    column = _DAILY_COUNTERS.get(event_type)
+    if column:
+        _increment(db, DailyRollup, {"day": day}, column, count)
+    if _mark_active(db, user_id, day):
+        _increment(db, DailyRollup, {"day": day}, "active_users")
+        if track_retention:
+            _count_retention(db, user_id, day)
+
+
+def record_event(db, user_id: int, event_type: str, subject_id: int = None, occurred_at: datetime = None):
+    """
+    Append an activity event and update the rollups in the caller's transaction.
+    The caller is responsible for committing.
+    """
+    occurred_at = occurred_at or datetime.utcnow()
+    db.add(ActivityEvent(
+        user_id=user_id,
+        event_type=event_type,
+        subject_id=subject_id,
+        occurred_at=occurred_at,
+    ))
+    apply_event(db, user_id, event_type, occurred_at)
+
+
+def record_events(db, user_id: int, event_type: str, events):
+    """
+    Bulk form of record_event() for (subject_id, occurred_at) pairs: one
+    multi-row insert into the event log and one rollup update per day.
+    """
+    if not events:
+        return
+    db.execute(insert(ActivityEvent).values([
+        {"user_id": user_id, "event_type": event_type, "subject_id": subject_id, "occurred_at": occurred_at}
+        for subject_id, occurred_at in events
+    ]))
+    per_day = Counter(occurred_at.date() for _, occurred_at in events)
+    for day, count in sorted(per_day.items()):
+        apply_event(db, user_id, event_type, datetime.combine(day, time()), count=count)
+
+
+# ----------------------------
+# Queries
+# ----------------------------
+
+def _window(days: int):
+    today = datetime.utcnow().date()
+    return [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+
+def _daily_series(db, column, days: int):
+    window = _window(days)
+    rows = db.execute(
+        select(DailyRollup.day, column).where(DailyRollup.day >= window[0])
+    ).all()
+    values = {row[0]: row[1] for row in rows}
+    return [(day, values.get(day, 0)) for day in window]
+
+
+def daily_active_users(db, days: int = 30) -> dict:
+    series = _daily_series(db, DailyRollup.active_users, days)
+    return {
+        "DAU": series[-1][1],
+        "days": [{"day": day.isoformat(), "active_users": count} for day, count in series],
+    }
+
+
+def tasks_completed_per_day(db, days: int = 30) -> dict:
+    series = _daily_series(db, DailyRollup.tasks_completed, days)
+    total = sum(count for _, count in series)
+    return {
+        "tasks_completed_per_day": round(total / days, 2),
+        "days": [{"day": day.isoformat(), "tasks_completed": count} for day, count in series],
+    }
+
+
+def four_week_retention(db, cohorts: int = 8) -> dict:
+    """
+    Weekly signup cohorts with the share of each cohort active 0..4 weeks later.
+    The headline percentage covers cohorts old enough to have a week-4 value.
+    """
+    this_week = week_start(datetime.utcnow().date())
+    first_cohort = this_week - timedelta(weeks=cohorts - 1)
+    rows = db.execute(
+        select(RetentionRollup.cohort_week, RetentionRollup.week_offset, RetentionRollup.active_users)
+        .where(RetentionRollup.cohort_week >= first_cohort)
+    ).all()
+    counts = {}
+    for cohort_week, offset, active in rows:
+        counts.setdefault(cohort_week, [0] * (RETENTION_WEEKS + 1))[offset] = active
+
+    result = []
+    retained = cohort_total = 0
+    for cohort_week in sorted(counts):
+        row = counts[cohort_week]
+        size = row[0]
+        elapsed = (this_week - cohort_week).days // 7
+        result.append({
+            "cohort_week": cohort_week.isoformat(),
+            "size": size,
+            "retention": [
+                round(100 * active / size, 2) if size and offset <= elapsed else None
+                for offset, active in enumerate(row)
+            ],
+        })
+        if elapsed >= RETENTION_WEEKS:
+            retained += row[RETENTION_WEEKS]
+            cohort_total += size
+
+    percentage = round(100 * retained / cohort_total, 2) if cohort_total else 0.0
+    return {"4_week_retention_percentage": percentage, "cohorts": result}
+
+
+# ----------------------------
+# Backfill
+# ----------------------------
+
+def seed_events_from_history(db) -> int:
+    """
+    Append synthetic events for users and tasks that predate the event log.
+    Runs as set-based INSERT ... SELECT statements, so nothing is loaded into Python.
+    Completed tasks without completed_at fall back to created_at.
+    """
+    E = ActivityEvent
+    sources = [
+        select(User.id, literal(SIGNUP), null(), User.created_at).where(
+            User.created_at.isnot(None),
+            ~exists().where(E.user_id == User.id, E.event_type == SIGNUP),
+        ),
+        select(Task.user_id, literal(TASK_CREATED), Task.id, Task.created_at).where(
+            Task.user_id.isnot(None),
+            Task.created_at.isnot(None),
+            ~exists().where(E.user_id == Task.user_id, E.event_type == TASK_CREATED, E.subject_id == Task.id),
+        ),
+        select(Task.user_id, literal(TASK_COMPLETED), Task.id, func.coalesce(Task.completed_at, Task.created_at)).where(
+            Task.user_id.isnot(None),
+            Task.completed.is_(True),
+            ~exists().where(E.user_id == Task.user_id, E.event_type == TASK_COMPLETED, E.subject_id == Task.id),
+        ),
+    ]
+    seeded = 0
+    for source in sources:
+        result = db.execute(
+            insert(E).from_select(["user_id", "event_type", "subject_id", "occurred_at"], source)
+        )
+        seeded += result.rowcount
+    db.commit()
+    return seeded
+
+
+def rebuild_retention_rollups(db, batch_size: int = retention.DEFAULT_BATCH_SIZE) -> int:
+    """
+    Recompute retention_rollups in one vectorized pass over user_activity_days
+    (see application.retention) and write them with a single bulk insert.
+    """
+    written = _write_retention_rollups(db, batch_size)
+    db.commit()
+    return written
+
+
+def _write_retention_rollups(db, batch_size: int = retention.DEFAULT_BATCH_SIZE) -> int:
+    cohort_weeks, counts = retention.load_cohort_matrix(db, weeks=RETENTION_WEEKS, batch_size=batch_size)
+    rows = [
+        {"cohort_week": retention.week_date(week), "week_offset": offset, "active_users": int(active)}
+        for week, row in zip(cohort_weeks, counts)
+        for offset, active in enumerate(row)
+        if active
+    ]
+    db.execute(delete(RetentionRollup))
+    if rows:
+        db.execute(insert(RetentionRollup), rows)
+    return len(rows)
+
+
+def rebuild_rollups(db, batch_size: int = 1000) -> dict:
+    """
+    Rebuild every rollup table from the event log.
+
+    The tables are cleared and refilled in a single transaction, so readers
+    keep seeing the old rollups until it commits. Only events up to the
+    highest id present when the rebuild starts are replayed: later ones were
+    applied by record_event() as they happened, on top of whatever the
+    rebuild has written, and replaying them would count them twice. Events
+    are read `batch_size` at a time, so memory use stays bounded regardless
+    of history size. Retention is derived afterwards from the rebuilt
+    activity days.
+    """
+    seeded = seed_events_from_history(db)
+    try:
+        upto = db.scalar(select(func.max(ActivityEvent.id))) or 0
+        for model in (UserActivityDay, DailyRollup, RetentionRollup):
+            db.execute(delete(model))
+
+        last_id = 0
+        replayed = 0
+        while last_id < upto:
+            batch = db.execute(
+                select(ActivityEvent.id, ActivityEvent.user_id, ActivityEvent.event_type, ActivityEvent.occurred_at)
+                .where(ActivityEvent.id > last_id, ActivityEvent.id <= upto)
+                .order_by(ActivityEvent.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            for event in batch:
+                apply_event(db, event.user_id, event.event_type, event.occurred_at, track_retention=False)
+            last_id = batch[-1].id
+            replayed += len(batch)
+            logger.info("Analytics backfill: replayed %d events", replayed)
+
+        cohorts = _write_retention_rollups(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"seeded": seeded, "replayed": replayed, "retention_rows": cohorts}
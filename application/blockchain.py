@@ -1,45 +1,142 @@
+"""
+Optional on-chain copy of lists and tasks.
+
+Nothing here runs at import time: web3 is imported, the node connected and
+the contract ABI loaded on the first call to get_chain(), and the resulting
+handle is cached for the life of the process. If web3 is missing or the node
+is unreachable, get_chain() raises BlockchainUnavailable and the next call
+tries again, so the app starts and serves everything else without a node.
+health() probes the node for monitoring.
+"""
 import os
 import json
-from web3 import Web3
-
-# Connect to a blockchain node (for testing, use Ganache or Infura)
-BLOCKCHAIN_URL = os.getenv("BLOCKCHAIN_URL", "http://127.0.0.1:7545")  # Default Ganache
-web3 = Web3(Web3.HTTPProvider(BLOCKCHAIN_URL))
-if not web3.isConnected():
-    raise Exception("Blockchain node not connected.")
+import threading
+from typing import NamedTuple, Optional
 
-# Load contract ABI
-with open("contracts/TaskManagerABI.json") as f:
-    contract_abi = json.load(f)
+from application.chain_jobs import ChainUnavailable, NonceManager
 
+# Blockchain node (for testing, use Ganache or Infura)
+BLOCKCHAIN_URL = os.getenv("BLOCKCHAIN_URL", "http://127.0.0.1:7545")  # Default Ganache
+BLOCKCHAIN_TIMEOUT = float(os.getenv("BLOCKCHAIN_TIMEOUT", "10"))  # Seconds per node request
 # Set contract address from environment variable or directly here
 CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS", "0xYourContractAddressHere")
-contract = web3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi)
+CONTRACT_ABI_PATH = os.getenv("CONTRACT_ABI_PATH", "contracts/TaskManagerABI.json")
 
-def create_list_on_chain(owner_private_key: str, name: str, description: str):
+
+class BlockchainUnavailable(ChainUnavailable):
+    """Raised when web3 is not installed or the node cannot be reached."""
+
+
+class Chain(NamedTuple):
+    web3: object
+    contract: object
+
+
+_chain: Optional[Chain] = None
+_chain_lock = threading.Lock()
+
+
+def get_chain() -> Chain:
+    """The connected web3 instance and contract, created on first use."""
+    global _chain
+    if _chain is not None:
+        return _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = _connect()
+    return _chain
+
+
+def _connect() -> Chain:
+    try:
+        from web3 import Web3
+    except ImportError as e:
+        raise BlockchainUnavailable("web3 is not installed") from e
+    web3 = Web3(Web3.HTTPProvider(BLOCKCHAIN_URL, request_kwargs={"timeout": BLOCKCHAIN_TIMEOUT}))
+    if not web3.isConnected():
+        raise BlockchainUnavailable(f"Blockchain node not connected at {BLOCKCHAIN_URL}")
+    with open(CONTRACT_ABI_PATH) as f:
+        contract_abi = json.load(f)
+    return Chain(web3, web3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi))
+
+
+def reset_chain():
+    """Drop the cached handle, e.g. after the node moved; the next call reconnects."""
+    global _chain
+    with _chain_lock:
+        _chain = None
+
+
+def health() -> dict:
+    """Probe the node without raising: {"status": "ok", "block": n} or {"status": "unavailable", "detail": ...}."""
+    try:
+        return {"status": "ok", "block": get_chain().web3.eth.block_number}
+    except Exception as e:
+        return {"status": "unavailable", "detail": str(e)}
+
+
+# One counter per account for every transaction sent from this process
+nonce_manager = NonceManager(lambda address: get_chain().web3.eth.getTransactionCount(address, "pending"))
+
+
+def _send(owner_private_key: str, function) -> str:
+    """Sign and send a contract call without waiting for it to be mined; returns the tx hash."""
+    web3 = get_chain().web3
     account = web3.eth.account.privateKeyToAccount(owner_private_key)
-    nonce = web3.eth.getTransactionCount(account.address)
-    txn = contract.functions.createList(name, description).buildTransaction({
+    nonce = nonce_manager.next(account.address)
+    txn = function.buildTransaction({
         'chainId': web3.eth.chain_id,
         'gas': 3000000,
         'gasPrice': web3.toWei('20', 'gwei'),
         'nonce': nonce
     })
     signed_txn = account.signTransaction(txn)
-    tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
-    receipt = web3.eth.waitForTransactionReceipt(tx_hash)
-    return receipt
+    try:
+        tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
+    except Exception as e:
+        # The node may not have taken the nonce; resync before the next send
+        nonce_manager.reset(account.address)
+        if _is_connection_error(e):
+            raise BlockchainUnavailable(f"Blockchain node request failed: {e}") from e
+        raise
+    return tx_hash.hex()
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Timeouts and refused connections from the HTTP provider."""
+    import requests
+
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                              TimeoutError, ConnectionError))
+
+
+def create_list_on_chain(owner_private_key: str, name: str, description: str):
+    """Blocks until the transaction is mined; request handlers queue lists through application.chain_jobs instead."""
+    chain = get_chain()
+    tx_hash = _send(owner_private_key, chain.contract.functions.createList(name, description))
+    return chain.web3.eth.waitForTransactionReceipt(tx_hash)
 
 def add_task_on_chain(owner_private_key: str, list_id: int, title: str, description: str):
-    account = web3.eth.account.privateKeyToAccount(owner_private_key)
-    nonce = web3.eth.getTransactionCount(account.address)
-    txn = contract.functions.addTask(list_id, title, description).buildTransaction({
-        'chainId': web3.eth.chain_id,
-        'gas': 3000000,
-        'gasPrice': web3.toWei('20', 'gwei'),
-        'nonce': nonce
-    })
-    signed_txn = account.signTransaction(txn)
-    tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
-    receipt = web3.eth.waitForTransactionReceipt(tx_hash)
-    return receipt
+    chain = get_chain()
+    tx_hash = _send(owner_private_key, chain.contract.functions.addTask(list_id, title, description))
+    return chain.web3.eth.waitForTransactionReceipt(tx_hash)
+
+
+class Web3ChainClient:
+    """The operations application.chain_jobs needs, on the cached connection."""
+
+    def send_create_list(self, owner_private_key: str, name: str, description: str) -> str:
+        return _send(owner_private_key, get_chain().contract.functions.createList(name, description))
+
+    def reset_nonces(self):
+        nonce_manager.reset()
+
+    def receipt_status(self, tx_hash: str) -> Optional[int]:
+        web3 = get_chain().web3
+        from web3.exceptions import TransactionNotFound
+
+        try:
+            receipt = web3.eth.getTransactionReceipt(tx_hash)
+        except TransactionNotFound:
+            return None
+        return None if receipt is None else receipt["status"]
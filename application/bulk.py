@@ -0,0 +1,219 @@
+"""
+Bulk task operations for POST /tasks/bulk.
+
+Scripted imports and "complete all" actions send hundreds of operations in
+one request:
+
+    {"create": [{"title": ..., "list_id": ..., "client_id": ...}, ...],
+     "complete": [task_id, ...],
+     "move": [{"task_id": ..., "list_id": ... or null}, ...]}
+
+All of them run in one transaction as set-based statements: one multi-row
+INSERT for the creates (shared with /sync_tasks), one UPDATE per task owner
+for the completions and one UPDATE per owner and target list for the moves,
+after one lookup of the tasks involved and one access check per list. Change
+sequences are kept per owner, hence the split; in the usual case all tasks
+are the caller's own and it is one statement each. Every item gets a result,
+as in application.sync.
+
+Core statements bypass the ORM events, so the change sequence, row versions
+and page-cache counters are maintained here.
+"""
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from application import analytics, changes, page_cache, permissions
+from application.models import Task
+from application.sync import insert_tasks
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+# Per-item result statuses
+CREATED = "created"
+DUPLICATE = "duplicate"  # a task with this client_id already exists
+COMPLETED = "completed"
+UNCHANGED = "unchanged"  # already completed
+MOVED = "moved"
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+FAILED = "failed"  # storage error; safe to retry
+
+OK = (CREATED, DUPLICATE, COMPLETED, UNCHANGED, MOVED)
+
+OPS = ("create", "complete", "move")
+
+
+def count_items(ops) -> int:
+    return len(ops.create) + len(ops.complete) + len(ops.move)
+
+
+def _result(op: str, index: int, status: str, task_id: int = None, client_id: str = None) -> dict:
+    result = {"op": op, "index": index, "status": status}
+    if task_id is not None:
+        result["task_id"] = task_id
+    if client_id is not None:
+        result["client_id"] = client_id
+    return result
+
+
+def _list_problem(lists: dict, list_id: int) -> Optional[str]:
+    access = lists[list_id]
+    if not access.allows(permissions.READ):
+        return NOT_FOUND
+    return None if access.allows(permissions.WRITE) else FORBIDDEN
+
+
+def _task_problem(task, user_id: int, lists: dict) -> Optional[str]:
+    """Owners can change their tasks; others need write access to the task's list."""
+    if task is None:
+        return NOT_FOUND
+    if task.user_id == user_id:
+        return None
+    if task.list_id is None:
+        return NOT_FOUND
+    return _list_problem(lists, task.list_id)
+
+
+def run(db, user, ops, request=None) -> dict:
+    """Apply a BulkTaskOps in one transaction and return per-item results."""
+    now = datetime.utcnow()
+    table = Task.__table__
+
+    task_ids = set(ops.complete) | {move.task_id for move in ops.move}
+    tasks = {}
+    if task_ids:
+        rows = db.execute(
+            select(table.c.id, table.c.user_id, table.c.list_id, table.c.completed)
+            .where(table.c.id.in_(task_ids))
+        ).all()
+        tasks = {row.id: row for row in rows}
+    list_ids = ({item.list_id for item in ops.create} | {move.list_id for move in ops.move}
+                | {task.list_id for task in tasks.values()}) - {None}
+    lists = {list_id: permissions.get_list_access(db, list_id, user, request) for list_id in list_ids}
+
+    results = []
+    touched_users, touched_lists = set(), set()
+    try:
+        # Creates: one INSERT
+        rows, pending = {}, []
+        for index, item in enumerate(ops.create):
+            problem = _list_problem(lists, item.list_id) if item.list_id is not None else None
+            if problem:
+                results.append(_result("create", index, problem, client_id=item.client_id))
+                continue
+            client_id = item.client_id or uuid.uuid4().hex
+            pending.append((index, client_id, client_id in rows))
+            if client_id not in rows:
+                rows[client_id] = {
+                    "user_id": user.id,
+                    "client_id": client_id,
+                    "list_id": item.list_id,
+                    "title": item.title,
+                    "description": item.description,
+                    "completed": item.completed,
+                    "completed_at": now if item.completed else None,
+                    "created_at": now,
+                }
+        inserted, existing = insert_tasks(db, user.id, rows) if rows else ({}, {})
+        for index, client_id, repeated in pending:
+            if client_id in inserted and not repeated:
+                results.append(_result("create", index, CREATED, inserted[client_id], client_id))
+            else:
+                task_id = inserted.get(client_id) or existing.get(client_id)
+                results.append(_result("create", index, DUPLICATE, task_id, client_id))
+        analytics.record_events(db, user.id, analytics.TASK_CREATED, [(task_id, now) for task_id in inserted.values()])
+        analytics.record_events(db, user.id, analytics.TASK_COMPLETED,
+                                [(inserted[cid], now) for cid in inserted if rows[cid]["completed"]])
+        if inserted:
+            touched_users.add(user.id)
+            touched_lists.update(rows[cid]["list_id"] for cid in inserted)
+
+        # Completions: one UPDATE per owner
+        allowed = []
+        for index, task_id in enumerate(ops.complete):
+            problem = _task_problem(tasks.get(task_id), user.id, lists)
+            if problem:
+                results.append(_result("complete", index, problem, task_id))
+            else:
+                allowed.append((index, task_id))
+        to_complete = defaultdict(set)
+        for _, task_id in allowed:
+            to_complete[tasks[task_id].user_id].add(task_id)
+        done = set()
+        for owner_id, ids in to_complete.items():
+            done.update(db.scalars(
+                update(table)
+                .where(table.c.id.in_(ids), table.c.completed.isnot(True))
+                .values(completed=True, completed_at=now, change_seq=changes.reserve_change_seqs(db, owner_id),
+                        version=table.c.version + 1, updated_at=now)
+                .returning(table.c.id)
+            ))
+        reported = set()
+        for index, task_id in allowed:
+            status = COMPLETED if task_id in done and task_id not in reported else UNCHANGED
+            reported.add(task_id)
+            results.append(_result("complete", index, status, task_id))
+        by_owner = defaultdict(list)
+        for task_id in done:
+            by_owner[tasks[task_id].user_id].append((task_id, now))
+            touched_lists.add(tasks[task_id].list_id)
+        for owner_id, events in by_owner.items():
+            analytics.record_events(db, owner_id, analytics.TASK_COMPLETED, events)
+        touched_users.update(by_owner)
+
+        # Moves: one UPDATE per owner and target list
+        targets = defaultdict(lambda: defaultdict(set))
+        for index, move in enumerate(ops.move):
+            task = tasks.get(move.task_id)
+            problem = _task_problem(task, user.id, lists)
+            if not problem and move.list_id is not None:
+                problem = _list_problem(lists, move.list_id)
+            if problem:
+                results.append(_result("move", index, problem, move.task_id))
+                continue
+            targets[task.user_id][move.list_id].add(move.task_id)
+            touched_users.add(task.user_id)
+            touched_lists.update((task.list_id, move.list_id))
+            results.append(_result("move", index, MOVED, move.task_id))
+        for owner_id, by_list in targets.items():
+            change_seq = changes.reserve_change_seqs(db, owner_id)
+            for list_id, ids in by_list.items():
+                db.execute(
+                    update(table)
+                    .where(table.c.id.in_(ids))
+                    .values(list_id=list_id, change_seq=change_seq, version=table.c.version + 1, updated_at=now)
+                )
+
+        page_cache.bump_versions(db, user_ids=touched_users, list_ids=touched_lists)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Bulk task operations failed for user %s", user.id)
+        problems = {(result["op"], result["index"]): result for result in results if result["status"] not in OK}
+        results = [
+            problems.get((op, index)) or _result(op, index, FAILED)
+            for op, items in zip(OPS, (ops.create, ops.complete, ops.move))
+            for index in range(len(items))
+        ]
+
+    results.sort(key=lambda result: (OPS.index(result["op"]), result["index"]))
+
+    counts = defaultdict(int)
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "status": "success" if all(result["status"] in OK for result in results) else "partial",
+        "created": counts[CREATED],
+        "completed": counts[COMPLETED],
+        "moved": counts[MOVED],
+        "results": results,
+    }
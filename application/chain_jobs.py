@@ -0,0 +1,233 @@
+"""
+Background pipeline for on-chain writes.
+
+POST /lists/dapp saves the list with chain_status "queued" and returns; a
+"chain.sync" background job (application.job_handlers) sends the transaction
+and later records the receipt on the same row, so the request never waits for
+a block. The row carries the state: queued lists are picked up again after a
+restart, and GET /lists/{id}/chain reports it.
+
+    queued -> sending -> pending (tx_hash set) -> confirmed | failed
+
+A list stuck in "sending" for CHAIN_SEND_LEASE seconds (its worker died
+mid-send) goes back to "queued". Only errors the node gives for the
+transaction itself mark a list failed; timeouts, connection errors and nonce
+conflicts leave it queued for the next pass.
+
+Clients take nonces from a local NonceManager instead of a node round trip
+per transaction, so several transactions from one account can be in flight
+at once (up to CHAIN_MAX_IN_FLIGHT). The counter lives in the process and
+any worker process may take the next "chain.sync" job, so each pass resyncs
+it from the node's pending transaction count before sending; the jobs run
+one at a time across all workers.
+
+This module does not import web3; the default client is created from
+application.blockchain on first use, and tests pass an in-process fake.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+
+from application.models import TaskList
+from infrastructure.database import SessionLocal
+
+CHAIN_POLL_INTERVAL = float(os.getenv("CHAIN_POLL_INTERVAL", "2"))  # Seconds between receipt checks
+CHAIN_MAX_IN_FLIGHT = int(os.getenv("CHAIN_MAX_IN_FLIGHT", "16"))  # Pending transactions per worker
+CHAIN_SEND_LEASE = float(os.getenv("CHAIN_SEND_LEASE", "120"))  # Seconds before an unfinished send is retried
+
+QUEUED = "queued"
+SENDING = "sending"
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class ChainUnavailable(Exception):
+    """Raised by a client that cannot reach the chain; queued lists stay queued."""
+
+
+# Node answers that depend on timing or nonce bookkeeping rather than on the
+# transaction, so sending again later can succeed
+_TRANSIENT_MESSAGES = ("nonce too low", "nonce too high", "replacement transaction underpriced",
+                       "already known", "timed out", "timeout")
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (ChainUnavailable, TimeoutError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _TRANSIENT_MESSAGES)
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces per account. The first nonce of an account
+    comes from `fetch(address)` (its pending transaction count); reset() drops
+    the counter so the next call resyncs, e.g. after a rejected transaction.
+    """
+
+    def __init__(self, fetch: Callable[[str], int]):
+        self.fetch = fetch
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def next(self, address: str) -> int:
+        with self._lock:
+            if address not in self._next:
+                self._next[address] = self.fetch(address)
+            nonce = self._next[address]
+            self._next[address] = nonce + 1
+            return nonce
+
+    def reset(self, address: Optional[str] = None):
+        """Forget the counter of `address`, or of every account."""
+        with self._lock:
+            if address is None:
+                self._next.clear()
+            else:
+                self._next.pop(address, None)
+
+
+def default_client():
+    from application.blockchain import Web3ChainClient
+    return Web3ChainClient()
+
+
+class ChainJobQueue:
+    """
+    Sends queued list transactions and records their receipts. The client
+    provides send_create_list(key, name, description) -> tx hash, returning
+    once the transaction is sent, receipt_status(tx_hash) -> 1, 0 or None
+    while unmined, and reset_nonces() to drop its cached nonces.
+    """
+
+    def __init__(self, client_factory: Callable = default_client, session_factory=SessionLocal,
+                 private_key: Optional[str] = None, poll_interval: float = CHAIN_POLL_INTERVAL,
+                 max_in_flight: int = CHAIN_MAX_IN_FLIGHT):
+        self.client_factory = client_factory
+        self.session_factory = session_factory
+        self._private_key = private_key
+        self.poll_interval = poll_interval
+        self.max_in_flight = max_in_flight
+        self._client = None
+
+    @property
+    def private_key(self) -> Optional[str]:
+        # Assume the key is provided securely (for demo, from the environment)
+        return self._private_key or os.getenv("USER_PRIVATE_KEY")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.private_key)
+
+    def client(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def run_once(self) -> int:
+        """Send queued transactions and check pending ones; returns how many lists changed state."""
+        db = self.session_factory()
+        try:
+            return self._check_pending(db) + self._requeue_expired(db) + self._send_queued(db)
+        finally:
+            db.close()
+
+    def outstanding(self, db) -> int:
+        """Lists still waiting to be sent or mined."""
+        return db.scalar(
+            select(func.count()).where(TaskList.chain_status.in_([QUEUED, SENDING, PENDING]))
+        )
+
+    def _requeue_expired(self, db, now: Optional[datetime] = None) -> int:
+        """Put lists whose send outlived its lease back in the queue."""
+        now = now or datetime.utcnow()
+        table = TaskList.__table__
+        requeued = db.execute(
+            update(table)
+            .where(table.c.chain_status == SENDING,
+                   table.c.chain_claimed_at < now - timedelta(seconds=CHAIN_SEND_LEASE))
+            .values(chain_status=QUEUED, chain_claimed_at=None, version=table.c.version + 1)
+        ).rowcount
+        db.commit()
+        if requeued:
+            logger.warning("Requeued %d list(s) left sending by a lost worker", requeued)
+        return requeued
+
+    def _send_queued(self, db) -> int:
+        key = self.private_key
+        if not key:
+            return 0
+        in_flight = db.scalar(select(func.count()).where(TaskList.chain_status == PENDING))
+        room = self.max_in_flight - in_flight
+        if room <= 0:
+            return 0
+        list_ids = db.scalars(
+            select(TaskList.id).where(TaskList.chain_status == QUEUED).order_by(TaskList.id).limit(room)
+        ).all()
+        if not list_ids:
+            return 0
+        client = self.client()
+        # Another process may have sent from this account since this one last did
+        client.reset_nonces()
+        sent = 0
+        for list_id in list_ids:
+            # Claim the row so a second worker cannot send the same list
+            claimed = db.execute(
+                update(TaskList.__table__)
+                .where(TaskList.__table__.c.id == list_id, TaskList.__table__.c.chain_status == QUEUED)
+                .values(chain_status=SENDING, chain_claimed_at=datetime.utcnow(),
+                        version=TaskList.__table__.c.version + 1)
+            )
+            db.commit()
+            if claimed.rowcount != 1:
+                continue
+            task_list = db.get(TaskList, list_id)
+            try:
+                tx_hash = client.send_create_list(key, task_list.name, task_list.description or "")
+            except Exception as e:
+                if is_transient(e):
+                    # Try again on a later pass, with nonces resynced
+                    logger.warning("Chain send for list %s will be retried: %s", list_id, e)
+                    task_list.chain_status, task_list.chain_claimed_at = QUEUED, None
+                    db.commit()
+                    break
+                task_list.chain_status, task_list.chain_error = FAILED, str(e)
+            else:
+                task_list.chain_status, task_list.chain_tx_hash = PENDING, tx_hash
+            task_list.chain_claimed_at = None
+            db.commit()
+            sent += 1
+        return sent
+
+    def _check_pending(self, db) -> int:
+        pending = db.scalars(
+            select(TaskList).where(TaskList.chain_status == PENDING).order_by(TaskList.id)
+        ).all()
+        if not pending:
+            return 0
+        client = self.client()
+        done = 0
+        for task_list in pending:
+            try:
+                status = client.receipt_status(task_list.chain_tx_hash)
+            except ChainUnavailable as e:
+                logger.warning("Chain unavailable, receipts not checked: %s", e)
+                break
+            if status is None:
+                continue
+            task_list.chain_status = CONFIRMED if status == 1 else FAILED
+            if status != 1:
+                task_list.chain_error = "Transaction reverted"
+            done += 1
+        db.commit()
+        return done
+
+
+chain_jobs = ChainJobQueue()
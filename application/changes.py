@@ -0,0 +1,141 @@
+"""
+Delta sync for tasks.
+
+Every task insert and update takes the next value of its owner's change
+sequence into tasks.change_seq, and every delete leaves a tombstone with its
+own sequence value. A client that remembers the cursor of the last change it
+applied asks for everything after it (GET /tasks/changes?since=<cursor>) and
+receives changed tasks and deleted ids in sequence order, a page at a time.
+
+Cursors are "<change_seq>.<task_id>"; the id breaks ties between rows that
+predate the sequence and all have change_seq 0. Omit `since` for a full sync.
+
+Each user has their own sequence row in change_sequences ("tasks:<user_id>"),
+so writes for different users never wait on each other. Taking a value locks
+the user's row until the transaction ends, so a second writer for the same
+user only gets its value once the first has committed or rolled back: values
+become visible in order, and a reader holding a cursor never skips a change
+that commits later. A user's sequence starts after the value of the single
+"tasks" sequence used before, so existing cursors stay valid.
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.orm import object_session
+
+from application.models import ChangeSequence, Task, TaskTombstone
+from application.pagination import MAX_PAGE_SIZE, clamp_page_size
+from infrastructure.database import dialect_insert
+
+TASKS_SEQUENCE = "tasks"  # the shared sequence all users had before; new values start above it
+
+
+def sequence_name(user_id: Optional[int]) -> str:
+    return f"{TASKS_SEQUENCE}:{user_id if user_id is not None else ''}"
+
+
+def reserve_change_seqs(db, user_id: Optional[int], count: int = 1) -> int:
+    """
+    Advance the change sequence of `user_id`'s tasks by `count` in one
+    statement and return the first reserved value. `db` may be a Session or
+    a Connection.
+    """
+    table = ChangeSequence.__table__
+    legacy = select(func.coalesce(func.max(table.c.value), 0)).where(table.c.name == TASKS_SEQUENCE)
+    stmt = (
+        dialect_insert(db, table)
+        .values(name=sequence_name(user_id), value=legacy.scalar_subquery() + count)
+        .on_conflict_do_update(index_elements=["name"], set_={"value": table.c.value + count})
+        .returning(table.c.value)
+    )
+    return db.execute(stmt).scalar_one() - count + 1
+
+
+@event.listens_for(Task, "before_insert")
+def _stamp_insert(mapper, connection, target):
+    target.change_seq = reserve_change_seqs(connection, target.user_id)
+
+
+@event.listens_for(Task, "before_update")
+def _stamp_update(mapper, connection, target):
+    # before_update also fires for objects whose only change is in a collection
+    if object_session(target).is_modified(target, include_collections=False):
+        target.change_seq = reserve_change_seqs(connection, target.user_id)
+
+
+@event.listens_for(Task, "after_delete")
+def _record_tombstone(mapper, connection, target):
+    connection.execute(TaskTombstone.__table__.insert().values(
+        task_id=target.id,
+        user_id=target.user_id,
+        change_seq=reserve_change_seqs(connection, target.user_id),
+    ))
+
+
+def encode_change_cursor(change_seq: int, task_id: int = 0) -> str:
+    return f"{change_seq}.{task_id}"
+
+
+def decode_change_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    """Raises ValueError for a malformed cursor."""
+    if not cursor:
+        return 0, 0
+    try:
+        change_seq, task_id = cursor.split(".")
+        return int(change_seq), int(task_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def changed_tasks_statement(user_id: int, change_seq: int, task_id: int, limit: int):
+    return (
+        select(Task)
+        .where(
+            Task.user_id == user_id,
+            or_(
+                Task.change_seq > change_seq,
+                and_(Task.change_seq == change_seq, Task.id > task_id),
+            ),
+        )
+        .order_by(Task.change_seq, Task.id)
+        .limit(limit + 1)
+    )
+
+
+def tombstones_statement(user_id: int, change_seq: int, limit: int):
+    return (
+        select(TaskTombstone.task_id, TaskTombstone.change_seq)
+        .where(TaskTombstone.user_id == user_id, TaskTombstone.change_seq > change_seq)
+        .order_by(TaskTombstone.change_seq)
+        .limit(limit + 1)
+    )
+
+
+def merge_changes(tasks, tombstones, cursor: Tuple[int, int], limit: int) -> dict:
+    """
+    Interleave changed tasks and tombstones by sequence and cut the first
+    `limit` changes. Each input holds at most limit + 1 rows, which is enough
+    to know whether more changes follow.
+    """
+    changes = [(task.change_seq, task.id, "task", task) for task in tasks]
+    # Tombstone sequence values are unique, so they never tie with a task
+    changes += [(change_seq, 0, "deleted", task_id) for task_id, change_seq in tombstones]
+    changes.sort(key=lambda change: change[:2])
+    page = changes[:limit]
+    if page:
+        cursor = page[-1][:2]
+    return {
+        "tasks": [payload for _, _, kind, payload in page if kind == "task"],
+        "deleted": [payload for _, _, kind, payload in page if kind == "deleted"],
+        "cursor": encode_change_cursor(*cursor),
+        "has_more": len(changes) > limit,
+    }
+
+
+async def changes_since_async(db, user_id: int, since: Optional[str] = None, limit: Optional[int] = None) -> dict:
+    """Changed tasks and deleted task ids after `since`, for an AsyncSession."""
+    limit = clamp_page_size(limit or MAX_PAGE_SIZE)
+    change_seq, task_id = decode_change_cursor(since)
+    tasks = (await db.scalars(changed_tasks_statement(user_id, change_seq, task_id, limit))).all()
+    tombstones = (await db.execute(tombstones_statement(user_id, change_seq, limit))).all()
+    return merge_changes(tasks, tombstones, (change_seq, task_id), limit)
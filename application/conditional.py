@@ -0,0 +1,69 @@
+"""
+Conditional GET helpers.
+
+Resources carry a row version (User/TaskList/Task.version, maintained by the
+ORM's version_id_col) and updated_at. ETags are derived from versions, so a
+route can compare them with If-None-Match and answer 304 before building or
+serializing its response body.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def strong_etag(*parts) -> str:
+    """A strong ETag for a representation fully determined by `parts`."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    """If-Modified-Since check; only consulted when the request has no If-None-Match."""
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None or request.headers.get("if-none-match"):
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional(request: Request, response: Response, etag: str,
+                last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Set validators on `response`. Returns a 304 response if the client's copy
+    is current, otherwise None and the route goes on to build its body.
+    """
+    headers = validator_headers(etag, last_modified)
+    if etag_matches(request, etag) or not_modified_since(request, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,216 @@
+"""
+Vectorized habit statistics.
+
+Completion logs are loaded as flat int32 arrays (row of the user, day offset
+from the start of the window) and scattered into users x days count matrices
+with one bincount; habit start days become a second "due" matrix the same way.
+Heatmaps, rolling 7/30-day completion rates and weekday patterns are then
+cumulative sums and a matrix product over those, with no per-day or per-user
+Python loops, so the same code serves one user's dashboard and the nightly
+batch over every user (rebuild_habit_stats, `python manage.py habitstats`).
+
+A rate is completions over habit-days due: a habit is due every day from its
+start day on. Days are offsets from `origin`, a proleptic ordinal
+(date.toordinal(); ordinal 1 is a Monday).
+"""
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from application.models import Habit, HabitCheckIn, HabitStatsRollup
+from infrastructure.database import dialect_insert
+
+ROLLING_WINDOWS = (7, 30)
+DEFAULT_DAYS = 365
+DEFAULT_BATCH_USERS = 5000  # users per matrix in the nightly batch
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Rolling rates on the first day shown need this many days before it
+_LEAD = max(ROLLING_WINDOWS) - 1
+
+
+def daily_matrices(n_users: int, days: int, checkin_rows: np.ndarray, checkin_offsets: np.ndarray,
+                   habit_rows: np.ndarray, habit_start_offsets: np.ndarray):
+    """
+    (done, due) int32 matrices of shape (n_users, days): check-ins per user and
+    day, and how many of the user's habits had started by that day.
+    Check-ins outside 0 .. days - 1 are ignored.
+    """
+    keep = (checkin_offsets >= 0) & (checkin_offsets < days)
+    cells = checkin_rows[keep].astype(np.int64) * days + checkin_offsets[keep]
+    done = np.bincount(cells, minlength=n_users * days).astype(np.int32).reshape(n_users, days)
+    # A habit started before the window is due from its first day; one started later never is
+    starts = np.clip(habit_start_offsets, 0, days)
+    cells = habit_rows.astype(np.int64) * (days + 1) + starts
+    started = np.bincount(cells, minlength=n_users * (days + 1)).reshape(n_users, days + 1)
+    due = started[:, :days].cumsum(axis=1, dtype=np.int32)
+    return done, due
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of each row over the last `window` days up to and including each day."""
+    totals = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(values, axis=1, out=totals[:, 1:])
+    lower = np.maximum(np.arange(1, values.shape[1] + 1) - window, 0)
+    return totals[:, 1:] - totals[:, lower]
+
+
+def rates(done: np.ndarray, due: np.ndarray) -> np.ndarray:
+    """done / due, 0 where nothing was due."""
+    return np.divide(done, due, out=np.zeros(done.shape, dtype=np.float64), where=due > 0)
+
+
+def weekday_totals(values: np.ndarray, origin: int) -> np.ndarray:
+    """Row totals per weekday, shape (n_users, 7), Monday first."""
+    weekdays = (origin + np.arange(values.shape[1]) - 1) % 7
+    return values.astype(np.int64) @ (weekdays[:, None] == np.arange(7)).astype(np.int64)
+
+
+def compute(n_users: int, days: int, origin: int, checkin_rows, checkin_offsets,
+            habit_rows, habit_start_offsets) -> dict:
+    """
+    Every metric for `n_users` users over `days` days starting at ordinal
+    `origin` + _LEAD; the check-in and habit offsets count from `origin`, so
+    the first _LEAD days only feed the rolling windows.
+    """
+    done, due = daily_matrices(n_users, days + _LEAD, checkin_rows, checkin_offsets,
+                               habit_rows, habit_start_offsets)
+    stats = {}
+    for window in ROLLING_WINDOWS:
+        stats[f"rate_{window}d"] = rates(rolling_sum(done, window), rolling_sum(due, window))[:, _LEAD:]
+        stats[f"completions_{window}d"] = done[:, -window:].sum(axis=1)
+    done, due = done[:, _LEAD:], due[:, _LEAD:]
+    first = origin + _LEAD
+    stats["done"], stats["due"] = done, due
+    stats["weekday_done"] = weekday_totals(done, first)
+    stats["weekday_due"] = weekday_totals(due, first)
+    stats["weekday_rates"] = rates(stats["weekday_done"], stats["weekday_due"])
+    return stats
+
+
+def _ordinals(values, count: int) -> np.ndarray:
+    return np.fromiter((value.toordinal() for value in values), dtype=np.int64, count=count)
+
+
+def _offsets(days, count: int, origin: int) -> np.ndarray:
+    return (_ordinals(days, count) - origin).astype(np.int32)
+
+
+def _window(days: int, end: date):
+    return end - timedelta(days=days - 1), end.toordinal() - days + 1 - _LEAD
+
+
+# ----------------------------
+# One user
+# ----------------------------
+
+def user_stats(db, user_id: int, days: int = DEFAULT_DAYS, end: date = None) -> dict:
+    """Heatmap, rolling rates and weekday pattern across all of a user's habits."""
+    end = end or datetime.utcnow().date()
+    start, origin = _window(days, end)
+    starts = db.scalars(select(Habit.start_day).where(Habit.user_id == user_id)).all()
+    checkins = db.scalars(
+        select(HabitCheckIn.day).where(
+            HabitCheckIn.user_id == user_id,
+            HabitCheckIn.day >= date.fromordinal(origin),
+            HabitCheckIn.day <= end,
+        )
+    ).all()
+    stats = compute(
+        1, days, origin,
+        np.zeros(len(checkins), dtype=np.int32), _offsets(checkins, len(checkins), origin),
+        np.zeros(len(starts), dtype=np.int32), _offsets(starts, len(starts), origin),
+    )
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "habits": len(starts),
+        "heatmap": stats["done"][0].tolist(),
+        "due": stats["due"][0].tolist(),
+        **{
+            f"rate_{window}d": np.round(stats[f"rate_{window}d"][0], 4).tolist()
+            for window in ROLLING_WINDOWS
+        },
+        "weekdays": [
+            {"weekday": name, "completed": int(done), "due": int(due), "rate": round(float(rate), 4)}
+            for name, done, due, rate in zip(
+                WEEKDAYS, stats["weekday_done"][0], stats["weekday_due"][0], stats["weekday_rates"][0]
+            )
+        ],
+    }
+
+
+# ----------------------------
+# Nightly batch
+# ----------------------------
+
+def _load_habits(db, batch_size: int):
+    """(user_ids, start ordinals) of every habit, ordered by user."""
+    user_ids, start_days = [], []
+    for partition in db.execute(
+        select(Habit.user_id, Habit.start_day).order_by(Habit.user_id)
+        .execution_options(yield_per=batch_size)
+    ).partitions():
+        user_ids.append(np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition)))
+        start_days.append(_ordinals((row[1] for row in partition), len(partition)))
+    if not user_ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(user_ids), np.concatenate(start_days)
+
+
+def rebuild_habit_stats(db, days: int = DEFAULT_DAYS, end: date = None,
+                        batch_size: int = DEFAULT_BATCH_USERS, commit: bool = True) -> int:
+    """
+    Recompute habit_stats_rollups for every user with habits, `batch_size`
+    users per vectorized pass, committing after each pass. Returns the number
+    of users written. With commit=False (the habits.stats job) every pass is
+    left in the caller's transaction.
+    """
+    end = end or datetime.utcnow().date()
+    _, origin = _window(days, end)
+    habit_users, habit_starts = _load_habits(db, batch_size)
+    users = np.unique(habit_users)
+    written = 0
+    for lo in range(0, len(users), batch_size):
+        chunk = users[lo:lo + batch_size]
+        in_chunk = (habit_users >= chunk[0]) & (habit_users <= chunk[-1])
+        checkins = db.execute(
+            select(HabitCheckIn.user_id, HabitCheckIn.day).where(
+                HabitCheckIn.user_id.between(int(chunk[0]), int(chunk[-1])),
+                HabitCheckIn.day >= date.fromordinal(origin),
+                HabitCheckIn.day <= end,
+            )
+        ).all()
+        checkin_users = np.fromiter((row[0] for row in checkins), dtype=np.int64, count=len(checkins))
+        stats = compute(
+            len(chunk), days, origin,
+            np.searchsorted(chunk, checkin_users).astype(np.int32),
+            _offsets((row[1] for row in checkins), len(checkins), origin),
+            np.searchsorted(chunk, habit_users[in_chunk]).astype(np.int32),
+            (habit_starts[in_chunk] - origin).astype(np.int32),
+        )
+        habit_counts = np.bincount(np.searchsorted(chunk, habit_users[in_chunk]), minlength=len(chunk))
+        rows = [
+            {
+                "user_id": int(user_id),
+                "computed_for": end,
+                "habits": int(habit_counts[i]),
+                "completions_30d": int(stats["completions_30d"][i]),
+                "rate_7d": round(float(stats["rate_7d"][i, -1]), 4),
+                "rate_30d": round(float(stats["rate_30d"][i, -1]), 4),
+                "weekday_rates": json.dumps(np.round(stats["weekday_rates"][i], 4).tolist()),
+            }
+            for i, user_id in enumerate(chunk)
+        ]
+        stmt = dialect_insert(db, HabitStatsRollup.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "user_id"},
+        )
+        db.execute(stmt, rows)
+        if commit:
+            db.commit()
+        written += len(rows)
+    return written
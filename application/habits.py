@@ -0,0 +1,187 @@
+"""
+Habit streaks.
+
+Each check-in appends a row to `habit_checkins` (the log) and updates the
+habit's own summary columns and completion bitset in the same transaction,
+so reads never go back to the log:
+
+- current_streak is the length of the run of done days ending on
+  last_completed_day. Checking in the day after extends it, any later day
+  starts a new run of 1: constant work, whatever the history.
+- longest_streak only ever grows, so max() keeps it.
+- completion rate is total_completions over the days since start_day.
+- completion_bits has bit i set when the habit was done on start_day + i,
+  least significant bit first: a year costs 46 bytes and a calendar or heatmap
+  is a slice of it.
+
+A check-in for an earlier day (up to HABIT_BACKFILL_DAYS back, e.g. a missed
+check-in from yesterday) can join two runs; the merged run is measured on
+the bitset, a byte at a time.
+"""
+import base64
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from application.models import Habit, HabitCheckIn
+
+HABIT_BACKFILL_DAYS = int(os.getenv("HABIT_BACKFILL_DAYS", "1"))  # How far back a check-in may be dated
+HABIT_CALENDAR_MAX_DAYS = 3 * 366
+
+
+def today() -> date:
+    return datetime.utcnow().date()
+
+
+# ----------------------------
+# Bitset
+# ----------------------------
+
+def has_bit(bits: bytes, i: int) -> bool:
+    return 0 <= i < len(bits) * 8 and bool(bits[i >> 3] & (1 << (i & 7)))
+
+
+def set_bit(bits: bytes, i: int) -> bytes:
+    buf = bytearray(bits)
+    if len(buf) <= i >> 3:
+        buf.extend(bytes((i >> 3) + 1 - len(buf)))
+    buf[i >> 3] |= 1 << (i & 7)
+    return bytes(buf)
+
+
+def run_before(bits: bytes, i: int) -> int:
+    """Number of consecutive set bits just below bit i."""
+    count = 0
+    while i > 0 and i & 7 and has_bit(bits, i - 1):
+        i -= 1
+        count += 1
+    if i & 7:
+        return count
+    # Whole bytes of done days
+    while i >= 8 and bits[(i >> 3) - 1] == 0xFF:
+        i -= 8
+        count += 8
+    while i > 0 and has_bit(bits, i - 1):
+        i -= 1
+        count += 1
+    return count
+
+
+def run_after(bits: bytes, i: int) -> int:
+    """Number of consecutive set bits just above bit i."""
+    count = 0
+    i += 1
+    while i & 7 and has_bit(bits, i):
+        i += 1
+        count += 1
+    if i & 7:
+        return count
+    while (i >> 3) < len(bits) and bits[i >> 3] == 0xFF:
+        i += 8
+        count += 8
+    while has_bit(bits, i):
+        i += 1
+        count += 1
+    return count
+
+
+def slice_bits(bits: bytes, start: int, days: int) -> bytes:
+    """Bits start .. start + days - 1 as their own bitset (bit 0 = start); days outside the set are 0."""
+    value = int.from_bytes(bits, "little")
+    if start >= 0:
+        value >>= start
+    else:
+        value <<= -start
+    value &= (1 << days) - 1
+    return value.to_bytes((days + 7) // 8, "little")
+
+
+# ----------------------------
+# Check-ins
+# ----------------------------
+
+def validate_day(habit: Habit, day: date, on: Optional[date] = None):
+    """Raises ValueError unless `day` can be checked in on date `on` (default today)."""
+    on = on or today()
+    if day > on:
+        raise ValueError("Cannot check in a future day")
+    if day < habit.start_day:
+        raise ValueError("Cannot check in before the habit started")
+    if (on - day).days > HABIT_BACKFILL_DAYS:
+        raise ValueError(f"Check-ins can be backdated at most {HABIT_BACKFILL_DAYS} day(s)")
+
+
+def check_in(db, habit: Habit, day: date) -> bool:
+    """
+    Mark `day` done: logs it and updates the summary and bitset. Returns False,
+    changing nothing, if the day was already done. Works with a Session or an
+    AsyncSession; the caller validates the day and commits.
+    """
+    offset = (day - habit.start_day).days
+    bits = habit.completion_bits or b""
+    if has_bit(bits, offset):
+        return False
+    bits = habit.completion_bits = set_bit(bits, offset)
+    habit.total_completions = (habit.total_completions or 0) + 1
+    last = habit.last_completed_day
+    if last is None or day > last:
+        if last is not None and day == last + timedelta(days=1):
+            habit.current_streak = (habit.current_streak or 0) + 1
+        else:
+            habit.current_streak = 1
+        habit.last_completed_day = day
+        run = habit.current_streak
+    else:
+        # Backfill: the day may join the run before it to the one after it
+        after = run_after(bits, offset)
+        run = run_before(bits, offset) + 1 + after
+        if offset + after == (last - habit.start_day).days:
+            habit.current_streak = run
+    habit.longest_streak = max(habit.longest_streak or 0, run)
+    db.add(HabitCheckIn(habit_id=habit.id, user_id=habit.user_id, day=day))
+    return True
+
+
+# ----------------------------
+# Reads
+# ----------------------------
+
+def summary(habit: Habit, on: Optional[date] = None) -> dict:
+    """Streaks and completion rate as of date `on` (default today), from the habit row alone."""
+    on = on or today()
+    last = habit.last_completed_day
+    # A streak survives until the end of the day after its last check-in
+    alive = last is not None and (on - last).days <= 1
+    days = max((on - habit.start_day).days + 1, 1)
+    return {
+        "id": habit.id,
+        "name": habit.name,
+        "description": habit.description,
+        "start_day": habit.start_day,
+        "current_streak": habit.current_streak if alive else 0,
+        "longest_streak": habit.longest_streak,
+        "total_completions": habit.total_completions,
+        "completion_rate": round(habit.total_completions / days, 4),
+        "last_completed_day": last,
+        "done_today": last == on,
+    }
+
+
+def calendar(habit: Habit, start: date, end: date) -> dict:
+    """
+    Done days from `start` to `end` inclusive as a base64 bitset (bit 0 = start,
+    least significant bit first). Raises ValueError for an empty or too long range.
+    """
+    days = (end - start).days + 1
+    if days < 1:
+        raise ValueError("end must not be before start")
+    if days > HABIT_CALENDAR_MAX_DAYS:
+        raise ValueError(f"At most {HABIT_CALENDAR_MAX_DAYS} days per calendar")
+    bits = slice_bits(habit.completion_bits or b"", (start - habit.start_day).days, days)
+    return {
+        "habit_id": habit.id,
+        "start": start,
+        "end": end,
+        "days": days,
+        "bits": base64.b64encode(bits).decode(),
+    }
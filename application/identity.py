@@ -0,0 +1,159 @@
+"""
+Authenticated user identity.
+
+Routes depend on get_current_user() (or get_current_user_async() for routes
+on the async session), which resolves the session's user_id to a
+small immutable CurrentUser. Resolution goes through a process-wide LRU cache
+with a short TTL, so authenticated traffic normally costs no User query, and
+the result is memoised on request.state for the rest of the request.
+
+ORM updates and deletes of a User evict its cache entry; the TTL bounds how
+long other worker processes (or bulk Core updates) can serve a stale copy.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from application.models import User
+from infrastructure.database import get_async_db, get_db
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    email: str
+    is_admin: bool
+    is_verified: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_admin=bool(user.is_admin),
+            is_verified=bool(user.is_verified),
+            created_at=user.created_at,
+        )
+
+
+class UserCache:
+    """Thread-safe LRU of CurrentUser keyed by user id, with per-entry expiry."""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def set(self, identity: CurrentUser):
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+def _cached_identity(request: Request):
+    """Return (identity, user_id); identity is None when the DB must be asked."""
+    identity = getattr(request.state, "user", None)
+    if identity is not None:
+        return identity, identity.id
+    user_id = request.session.get("user_id")
+    if not user_id:
+        return None, None
+    identity = user_cache.get(user_id)
+    if identity is not None:
+        request.state.user = identity
+    return identity, user_id
+
+
+def _remember(request: Request, user: Optional[User]) -> Optional[CurrentUser]:
+    if user is None:
+        return None
+    identity = CurrentUser.from_user(user)
+    user_cache.set(identity)
+    request.state.user = identity
+    return identity
+
+
+def load_current_user(request: Request, db: Session) -> Optional[CurrentUser]:
+    """
+    Resolve the logged-in user, or None if there is no session or the user
+    no longer exists.
+    """
+    identity, user_id = _cached_identity(request)
+    if identity is not None or not user_id:
+        return identity
+    return _remember(request, db.get(User, user_id))
+
+
+async def load_current_user_async(request: Request, db: AsyncSession) -> Optional[CurrentUser]:
+    """load_current_user() for an AsyncSession."""
+    identity, user_id = _cached_identity(request)
+    if identity is not None or not user_id:
+        return identity
+    return _remember(request, await db.get(User, user_id))
+
+
+# Utility function to get current user from session
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> CurrentUser:
+    if not request.session.get("user_id"):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user = load_current_user(request, db)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
+    if not request.session.get("user_id"):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user = await load_current_user_async(request, db)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
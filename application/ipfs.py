@@ -0,0 +1,144 @@
+"""
+Async IPFS client.
+
+One httpx.AsyncClient is shared by every call, so requests reuse keep-alive
+connections to the IPFS HTTP API instead of opening one per task. Each request
+has a timeout, at most IPFS_MAX_CONCURRENCY run at once, and connection
+errors, timeouts, 429s and 5xx answers are retried with jittered exponential
+backoff. Retrying an add is safe: content addressing gives the same hash.
+
+add_many() pins a batch of tasks with a single directory add rather than one
+request per task. Objects read or written go through the local content cache
+(application.ipfs_cache), since a CID always names the same bytes.
+"""
+import asyncio
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from application.ipfs_cache import ContentCache, content_cache
+
+IPFS_API_URL = os.getenv("IPFS_API_URL", "http://127.0.0.1:5001/api/v0")
+IPFS_TIMEOUT = float(os.getenv("IPFS_TIMEOUT", "10"))
+IPFS_RETRIES = int(os.getenv("IPFS_RETRIES", "3"))
+IPFS_BACKOFF = float(os.getenv("IPFS_BACKOFF", "0.2"))  # Seconds; doubles per attempt
+IPFS_MAX_CONCURRENCY = int(os.getenv("IPFS_MAX_CONCURRENCY", "8"))
+IPFS_BATCH_SIZE = int(os.getenv("IPFS_BATCH_SIZE", "100"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class IpfsError(Exception):
+    """Raised when the IPFS API fails after all retries."""
+
+
+class IpfsClient:
+    def __init__(self, base_url: str = IPFS_API_URL, timeout: float = IPFS_TIMEOUT,
+                 retries: int = IPFS_RETRIES, backoff: float = IPFS_BACKOFF,
+                 max_concurrency: int = IPFS_MAX_CONCURRENCY, batch_size: int = IPFS_BATCH_SIZE,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache: Optional[ContentCache] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.transport = transport
+        self.cache = cache
+        self._client = None
+        self._semaphore = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created on first use, inside the event loop that will run the requests
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = self._semaphore = None
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        http = self._http()
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                async with self._semaphore:
+                    response = await http.post(path, **kwargs)
+                if response.status_code not in RETRY_STATUSES or last:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError as e:
+                if last:
+                    raise IpfsError(f"IPFS {path} failed: {e}") from e
+            except httpx.HTTPStatusError as e:
+                raise IpfsError(f"IPFS {path} failed: {e}") from e
+            # Full jitter, so clients retrying together spread out
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def add_json(self, data: Any) -> str:
+        """Pin one JSON document and return its hash."""
+        return (await self.add_many([data]))[0]
+
+    async def add_many(self, items: List[Any]) -> List[str]:
+        """Pin JSON documents with one directory add per batch; hashes are returned in order."""
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        results = await asyncio.gather(*(self._add_batch(batch) for batch in batches))
+        return [ipfs_hash for batch in results for ipfs_hash in batch]
+
+    async def _add_batch(self, items: List[Any]) -> List[str]:
+        names = [f"{i}.json" for i in range(len(items))]
+        contents = [json.dumps(item).encode() for item in items]
+        files = [("file", (name, content, "application/json")) for name, content in zip(names, contents)]
+        response = await self._post("/add", params={"pin": "true", "wrap-with-directory": "true"}, files=files)
+        # One JSON object per added file, plus one for the wrapping directory
+        hashes: Dict[str, str] = {}
+        for line in response.text.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                hashes[entry.get("Name", "")] = entry["Hash"]
+        try:
+            result = [hashes[name] for name in names]
+        except KeyError as e:
+            raise IpfsError(f"IPFS add did not return a hash for {e}") from e
+        if self.cache is not None:
+            await asyncio.to_thread(self._cache_added, zip(result, contents))
+        return result
+
+    def _cache_added(self, added):
+        for ipfs_hash, content in added:
+            self.cache.put(ipfs_hash, content)
+
+    async def cat(self, ipfs_hash: str) -> bytes:
+        if self.cache is None:
+            return await self._cat(ipfs_hash)
+        return await self.cache.get_or_fetch_async(ipfs_hash, lambda: self._cat(ipfs_hash))
+
+    async def _cat(self, ipfs_hash: str) -> bytes:
+        return (await self._post("/cat", params={"arg": ipfs_hash})).content
+
+    async def cat_json(self, ipfs_hash: str) -> Any:
+        content = await self.cat(ipfs_hash)
+        try:
+            return json.loads(content)
+        except ValueError as e:
+            raise IpfsError(f"IPFS object {ipfs_hash} is not JSON") from e
+
+    async def cat_many(self, hashes: List[str]) -> List[Any]:
+        """Fetch JSON documents concurrently, bounded by max_concurrency."""
+        return list(await asyncio.gather(*(self.cat_json(ipfs_hash) for ipfs_hash in hashes)))
+
+
+ipfs_client = IpfsClient(cache=content_cache)
@@ -0,0 +1,269 @@
+"""
+Local cache for IPFS content.
+
+A CID names immutable content, so anything fetched once can be served locally
+for as long as there is room for it. Two tiers sit in front of the daemon: an
+in-memory LRU of small objects, and an on-disk store under IPFS_CACHE_DIR
+with one file per CID, evicted least recently used once it grows past
+IPFS_CACHE_DISK_BYTES. The disk tier survives restarts.
+
+The lock only guards the in-memory index and LRU order; files are read,
+written and removed outside it, so a slow disk never holds up other lookups.
+
+Concurrent misses for the same CID share one fetch, so a burst of requests
+for a popular task costs a single round trip to the daemon.
+
+Several worker processes may share the directory: files are written
+atomically and a file removed by another process is treated as a miss. Each
+process only counts the bytes it knows about when evicting.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+IPFS_CACHE_DIR = os.getenv("IPFS_CACHE_DIR", "./ipfs_cache")
+IPFS_CACHE_DISK_BYTES = int(os.getenv("IPFS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+IPFS_CACHE_MEMORY_BYTES = int(os.getenv("IPFS_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+IPFS_CACHE_MEMORY_ENTRY_BYTES = int(os.getenv("IPFS_CACHE_MEMORY_ENTRY_BYTES", str(256 * 1024)))
+
+# CIDv0 is base58 and CIDv1 defaults to base32; anything else is not cached,
+# which also keeps CIDs from escaping the cache directory
+_CID = re.compile(r"^[A-Za-z0-9]{8,128}$")
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Runs fn() once for concurrent callers passing the same key (threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            call.set_result(fn())
+        except BaseException as e:
+            call.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines sharing one event loop."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[bytes]]) -> bytes:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = asyncio.ensure_future(fn())
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        # A cancelled caller must not cancel the fetch other callers wait on
+        return await asyncio.shield(call)
+
+
+class ContentCache:
+    """Two-tier (memory, then files) cache of IPFS objects by CID."""
+
+    def __init__(self, directory: str = IPFS_CACHE_DIR, disk_bytes: int = IPFS_CACHE_DISK_BYTES,
+                 memory_bytes: int = IPFS_CACHE_MEMORY_BYTES,
+                 memory_entry_bytes: int = IPFS_CACHE_MEMORY_ENTRY_BYTES):
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.memory_bytes = memory_bytes
+        self.memory_entry_bytes = memory_entry_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None  # CID -> size in LRU order; scanned from the directory on first use
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._async_flights = AsyncSingleFlight()
+
+    # Memory tier; callers hold the lock
+
+    def _remember(self, cid: str, content: bytes):
+        if len(content) > self.memory_entry_bytes:
+            return
+        old = self._memory.pop(cid, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[cid] = content
+        self._memory_size += len(content)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _from_memory(self, cid: str) -> Optional[bytes]:
+        content = self._memory.get(cid)
+        if content is not None:
+            self._memory.move_to_end(cid)
+            self.memory_hits += 1
+        return content
+
+    # Disk tier; the index is read and changed under the lock, files outside it
+
+    def _path(self, cid: str) -> str:
+        # CIDv0 all start with "Qm", so shard on the tail
+        return os.path.join(self.directory, cid[-2:], cid)
+
+    def _scan(self) -> OrderedDict:
+        found = []
+        if os.path.isdir(self.directory):
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and _CID.match(entry.name):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name, stat.st_size))
+        found.sort()
+        return OrderedDict((cid, size) for _, cid, size in found)
+
+    def _load_index(self):
+        """Scan the directory on first use; call without the lock."""
+        if self._disk is not None:
+            return
+        found = self._scan()
+        with self._lock:
+            if self._disk is None:
+                self._disk = found
+                self._disk_size = sum(found.values())
+
+    def _read(self, cid: str) -> Optional[bytes]:
+        try:
+            with open(self._path(cid), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, cid: str, content: bytes) -> bool:
+        path = self._path(cid)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except OSError as e:
+            # The disk tier is best effort
+            logger.warning("IPFS cache write failed for %s: %s", cid, e)
+            return False
+        return True
+
+    def _remove(self, cids):
+        for cid in cids:
+            try:
+                os.remove(self._path(cid))
+            except FileNotFoundError:
+                pass
+
+    # Public API
+
+    def get(self, cid: str) -> Optional[bytes]:
+        if not _CID.match(cid):
+            return None
+        with self._lock:
+            content = self._from_memory(cid)
+        if content is not None:
+            return content
+        self._load_index()
+        with self._lock:
+            on_disk = cid in self._disk
+        content = self._read(cid) if on_disk else None
+        with self._lock:
+            if content is None:
+                size = self._disk.pop(cid, None)
+                if size is not None:
+                    self._disk_size -= size
+                self.misses += 1
+                return None
+            if cid in self._disk:
+                self._disk.move_to_end(cid)
+            self.disk_hits += 1
+            self._remember(cid, content)
+        return content
+
+    def put(self, cid: str, content: bytes):
+        if not _CID.match(cid):
+            return
+        self._load_index()
+        with self._lock:
+            self._remember(cid, content)
+            if cid in self._disk:
+                self._disk.move_to_end(cid)
+                return
+        if len(content) > self.disk_bytes or not self._write(cid, content):
+            return
+        evicted = []
+        with self._lock:
+            if cid not in self._disk:
+                self._disk[cid] = len(content)
+                self._disk_size += len(content)
+            while self._disk_size > self.disk_bytes:
+                old, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old)
+        self._remove(evicted)
+
+    def get_or_fetch(self, cid: str, fetch: Callable[[], bytes]) -> bytes:
+        """Cached content for `cid`, calling fetch() once across concurrent misses."""
+        content = self.get(cid)
+        if content is not None:
+            return content
+
+        def fetch_and_store():
+            content = fetch()
+            self.put(cid, content)
+            return content
+
+        return self._flights.do(cid, fetch_and_store)
+
+    async def get_or_fetch_async(self, cid: str, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        """get_or_fetch() for an async fetch; disk access runs in a worker thread."""
+        # The lock is never held across I/O, so taking it here does not stall the loop
+        with self._lock:
+            content = self._from_memory(cid)
+        if content is None:
+            content = await asyncio.to_thread(self.get, cid)
+        if content is not None:
+            return content
+
+        async def fetch_and_store():
+            content = await fetch()
+            await asyncio.to_thread(self.put, cid, content)
+            return content
+
+        return await self._async_flights.do(cid, fetch_and_store)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self._disk = OrderedDict()
+            self._disk_size = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+content_cache = ContentCache()
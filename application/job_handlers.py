@@ -0,0 +1,52 @@
+"""
+Job types run by the background workers (see application.jobs).
+
+- chain.sync: send queued on-chain lists and record receipts, then check
+  again after CHAIN_POLL_INTERVAL while any are outstanding. One at a time,
+  since nonces are counted in the worker process.
+- habits.stats: the nightly habit statistics batch; schedules its next run
+  for HABIT_STATS_HOUR (UTC) the following day.
+"""
+import os
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from application import habit_stats
+from application.chain_jobs import CHAIN_POLL_INTERVAL, chain_jobs
+from application.jobs import enqueue, job_type
+
+HABIT_STATS_HOUR = int(os.getenv("HABIT_STATS_HOUR", "2"))
+
+
+@job_type("chain.sync", concurrency=1, priority=10)
+def sync_chain(db) -> dict:
+    changed = chain_jobs.run_once()
+    if chain_jobs.enabled and chain_jobs.outstanding(db):
+        enqueue(db, "chain.sync", delay=CHAIN_POLL_INTERVAL, dedupe_key="chain.sync")
+    return {"changed": changed}
+
+
+def next_habit_stats_run(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.utcnow()
+    run_at = datetime.combine(now.date(), time(HABIT_STATS_HOUR))
+    return run_at if run_at > now else run_at + timedelta(days=1)
+
+
+@job_type("habits.stats", concurrency=1, max_attempts=3, lease=3600)
+def rebuild_habit_stats(db) -> dict:
+    users = habit_stats.rebuild_habit_stats(db, commit=False)
+    now = datetime.utcnow()
+    enqueue(db, "habits.stats", delay=(next_habit_stats_run(now) - now).total_seconds(),
+            dedupe_key="habits.stats")
+    return {"users": users}
+
+
+def schedule_recurring(db):
+    """Queue the standing jobs if they are not queued yet; run when a worker starts."""
+    now = datetime.utcnow()
+    enqueue(db, "habits.stats", delay=(next_habit_stats_run(now) - now).total_seconds(),
+            dedupe_key="habits.stats")
+    if chain_jobs.enabled:
+        # Resumes lists left queued or pending by a previous run
+        enqueue(db, "chain.sync", dedupe_key="chain.sync")
+    db.commit()
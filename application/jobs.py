@@ -0,0 +1,344 @@
+"""
+Background jobs, queued in the app database.
+
+Request handlers enqueue() a job in their own transaction, so the job exists
+exactly when the data it refers to was committed, and return. Workers poll
+the `jobs` table and claim rows with a conditional UPDATE; no broker is
+needed, and any number of worker threads and processes can share the table:
+
+- in each app process, a JobWorker thread (JOBS_WORKER=1, the default);
+- standalone, `python manage.py worker [processes]`.
+
+Job types are registered with @job_type (see application.job_handlers) and
+carry their own settings: a cap on how many jobs of the type run at once
+across all workers, how often to try, a priority and a lease. A failing job
+is retried with exponential backoff until max_attempts; a job still running
+when its lease ends (e.g. its worker died) is requeued.
+
+    queued -> running -> succeeded | queued (retry) | failed
+
+Handlers run in a worker thread with a fresh session as their first argument
+and the payload as keyword arguments. The runner commits that session together
+with the job's success, so writes made through it are kept only if the
+handler completes (habits.stats passes commit=False down for this). A handler
+may also commit as it goes, as chain.sync does in its own sessions to record
+each send; what it committed stays when it fails. Either way handlers must be
+idempotent, since a job can run again after a failure, a crash or an expired
+lease.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import func, select, update
+
+from application.models import Job
+from infrastructure.database import SessionLocal
+
+JOBS_WORKER = os.getenv("JOBS_WORKER", "1") == "1"  # Run a worker thread in each app process
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))  # Jobs run at once per worker
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))  # Seconds between polls when idle
+JOBS_BACKOFF = float(os.getenv("JOBS_BACKOFF", "5"))  # Seconds before the first retry; doubles per attempt
+JOBS_MAX_BACKOFF = float(os.getenv("JOBS_MAX_BACKOFF", "3600"))
+JOBS_LEASE = float(os.getenv("JOBS_LEASE", "600"))  # Seconds a job may run before it is presumed lost
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class JobType(NamedTuple):
+    name: str
+    handler: Callable
+    concurrency: int
+    max_attempts: int
+    priority: int
+    lease: float
+
+
+_registry: Dict[str, JobType] = {}
+
+
+def job_type(name: str, concurrency: int = 1, max_attempts: int = 5, priority: int = 0,
+             lease: float = JOBS_LEASE):
+    """Register the decorated function as the handler for jobs of type `name`."""
+    def register(handler):
+        _registry[name] = JobType(name, handler, concurrency, max_attempts, priority, lease)
+        return handler
+    return register
+
+
+def registry() -> Dict[str, JobType]:
+    # The handlers import most of the application; load them on first use
+    import application.job_handlers  # noqa: F401
+    return _registry
+
+
+def backoff(attempts: int, base: float = JOBS_BACKOFF, cap: float = JOBS_MAX_BACKOFF) -> float:
+    """Seconds before retrying after `attempts` tries: half fixed, half jitter, so retries spread out."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def enqueue(db, name: str, priority: Optional[int] = None, delay: float = 0,
+            dedupe_key: Optional[str] = None, **payload) -> Optional[Job]:
+    """
+    Add a job to the caller's transaction; the caller commits. With a
+    dedupe_key, a job already queued under that key is reused instead (its
+    run_at moved earlier if needed) and None is returned.
+
+    Only queued jobs are deduplicated: a job with the same key that is
+    already running may have passed the work this one is for, so a new job
+    is queued behind it. Types that must not overlap set concurrency=1.
+    Raises ValueError for an unknown job type.
+    """
+    kind = registry().get(name)
+    if kind is None:
+        raise ValueError(f"Unknown job type: {name}")
+    run_at = datetime.utcnow() + timedelta(seconds=delay)
+    if dedupe_key is not None:
+        queued = db.scalars(
+            select(Job).where(Job.dedupe_key == dedupe_key, Job.status == QUEUED).limit(1)
+        ).first()
+        if queued is not None:
+            queued.run_at = min(queued.run_at, run_at)
+            return None
+    job = Job(
+        job_type=name,
+        payload=json.dumps(payload),
+        priority=kind.priority if priority is None else priority,
+        max_attempts=kind.max_attempts,
+        run_at=run_at,
+        dedupe_key=dedupe_key,
+        status=QUEUED,
+    )
+    db.add(job)
+    return job
+
+
+def _lock_job_type(db, name: str):
+    """Block until no other transaction is claiming a job of this type (Postgres only)."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"jobs:{name}"))))
+
+
+def requeue_expired(db, now: Optional[datetime] = None) -> int:
+    """Put jobs whose lease ran out back in the queue, or fail them if out of attempts."""
+    now = now or datetime.utcnow()
+    expired = (Job.status == RUNNING, Job.locked_until < now)
+    failed = db.execute(
+        update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, last_error="Lease expired", finished_at=now, locked_by=None)
+    ).rowcount
+    retried = db.execute(
+        update(Job).where(*expired).values(status=QUEUED, run_at=now, locked_by=None)
+    ).rowcount
+    db.commit()
+    return failed + retried
+
+
+class JobWorker:
+    """
+    Claims due jobs, highest priority first, and runs up to `concurrency` of
+    them at once in a thread pool. `types` limits the worker to some job types.
+    """
+
+    def __init__(self, session_factory=SessionLocal, concurrency: int = JOBS_CONCURRENCY,
+                 poll_interval: float = JOBS_POLL_INTERVAL, types: Optional[List[str]] = None,
+                 name: Optional[str] = None):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.types = types
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+
+    def start(self):
+        """Run in a background thread of this process."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        """Stop claiming jobs and wait up to `timeout` seconds for running ones."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def notify(self):
+        """Wake the worker for newly enqueued jobs."""
+        self._wake.set()
+
+    def run(self):
+        """Poll and dispatch until stop(); blocks the calling thread."""
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job")
+        try:
+            while not self._stop.is_set():
+                try:
+                    claimed = self.dispatch()
+                except Exception:
+                    logger.exception("Job dispatch failed")
+                    claimed = 0
+                if not claimed:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def dispatch(self) -> int:
+        """Claim as many jobs as there are free slots and hand them to the pool."""
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free <= 0:
+            return 0
+        job_ids = self.claim(free)
+        for job_id in job_ids:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._run_job, job_id)
+        return len(job_ids)
+
+    def _run_job(self, job_id: int):
+        try:
+            self.execute(job_id)
+        except Exception:
+            logger.exception("Job %s could not be recorded", job_id)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    # ----------------------------
+    # Claiming and running
+    # ----------------------------
+
+    def claim(self, limit: int, now: Optional[datetime] = None) -> List[int]:
+        """Mark up to `limit` due jobs as running by this worker; returns their ids."""
+        kinds = registry()
+        now = now or datetime.utcnow()
+        db = self.session_factory()
+        try:
+            requeue_expired(db, now)
+            types = [name for name in kinds if self.types is None or name in self.types]
+            candidates = db.execute(
+                select(Job.id, Job.job_type)
+                .where(Job.status == QUEUED, Job.run_at <= now, Job.job_type.in_(types))
+                .order_by(Job.priority.desc(), Job.run_at, Job.id)
+                .limit(limit * 4)  # some may be capped by their type's concurrency
+            ).all()
+            running = Job.__table__.alias("running")
+            claimed = []
+            for job_id, name in candidates:
+                if len(claimed) == limit:
+                    break
+                kind = kinds[name]
+                # The concurrency check is part of the UPDATE. SQLite runs one
+                # writer at a time, so that alone stops two workers taking the
+                # last slot of a type; on Postgres (READ COMMITTED) the count
+                # would miss another worker's uncommitted claim, so claims of a
+                # type are serialized with a transaction-scoped advisory lock
+                _lock_job_type(db, name)
+                busy = (
+                    select(func.count()).select_from(running)
+                    .where(running.c.job_type == name, running.c.status == RUNNING)
+                    .scalar_subquery()
+                )
+                result = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == QUEUED, busy < kind.concurrency)
+                    .values(status=RUNNING, attempts=Job.attempts + 1, locked_by=self.name,
+                            locked_until=now + timedelta(seconds=kind.lease))
+                )
+                db.commit()
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            return claimed
+        finally:
+            db.close()
+
+    def execute(self, job_id: int) -> str:
+        """Run a claimed job and record the outcome; returns the job's new status."""
+        db = self.session_factory()
+        try:
+            job = db.get(Job, job_id)
+            kind = registry()[job.job_type]
+            attempts, max_attempts = job.attempts, job.max_attempts
+            mine = (Job.id == job_id, Job.status == RUNNING, Job.locked_by == self.name)
+            try:
+                result = kind.handler(db, **json.loads(job.payload or "{}"))
+            except Exception as e:
+                db.rollback()
+                logger.warning("Job %s (%s) failed on attempt %d: %s", job_id, kind.name, attempts, e)
+                if attempts >= max_attempts:
+                    values = {"status": FAILED, "finished_at": datetime.utcnow()}
+                else:
+                    values = {"status": QUEUED,
+                              "run_at": datetime.utcnow() + timedelta(seconds=backoff(attempts))}
+                db.execute(update(Job).where(*mine).values(last_error=str(e)[:2000], locked_by=None, **values))
+                db.commit()
+                return values["status"]
+            done = db.execute(
+                update(Job).where(*mine).values(
+                    status=SUCCEEDED, result=json.dumps(result), finished_at=datetime.utcnow(),
+                    locked_by=None, last_error=None,
+                )
+            )
+            if done.rowcount != 1:
+                # The lease ran out and the job was requeued; let that run win
+                db.rollback()
+                return QUEUED
+            db.commit()
+            return SUCCEEDED
+        finally:
+            db.close()
+
+    def run_until_idle(self, max_jobs: int = 1000) -> int:
+        """Run due jobs one at a time in the calling thread until none are left; returns how many ran."""
+        ran = 0
+        while ran < max_jobs:
+            job_ids = self.claim(1)
+            if not job_ids:
+                break
+            self.execute(job_ids[0])
+            ran += 1
+        return ran
+
+
+job_worker = JobWorker()
+
+
+def run_worker(types: Optional[List[str]] = None):
+    """Entry point of a standalone worker process; stops cleanly on SIGTERM or Ctrl-C."""
+    from monitoring.logging_config import setup_logging
+
+    setup_logging()
+    worker = JobWorker(types=types)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    logger.info("Job worker %s started", worker.name)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,13 @@
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 from application.routes import router as api_router
+from application.passwords import password_service
+from application.realtime import hub
+from application.ipfs import ipfs_client
+from application.jobs import JOBS_WORKER, job_worker
 from monitoring.logging_config import setup_logging
 import os
-from infrastructure.database import Base, engine
+from infrastructure.database import Base, SessionLocal, async_engine, engine
 from starlette.staticfiles import StaticFiles
 app = FastAPI(
     title="Task & Habit Tracker",
@@ -15,7 +19,32 @@ app = FastAPI(
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
-    
+
+@app.on_event("startup")
+async def start_realtime_hub():
+    await hub.start()
+
+@app.on_event("startup")
+def start_job_worker():
+    # Background jobs run in this process too unless JOBS_WORKER=0 (e.g. with `manage.py worker`)
+    if JOBS_WORKER:
+        from application.job_handlers import schedule_recurring
+
+        db = SessionLocal()
+        try:
+            schedule_recurring(db)
+        finally:
+            db.close()
+        job_worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_service.shutdown()
+    job_worker.stop()
+    await hub.stop()
+    await async_engine.dispose()
+    await ipfs_client.aclose()
+
 # Initialize logging
 setup_logging()
 
@@ -1,15 +1,20 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Float, ForeignKey, LargeBinary, Table, Index, UniqueConstraint, event, func, select
+from sqlalchemy.orm import column_property, joinedload, raiseload, relationship, selectinload, undefer
 from datetime import datetime
+from functools import lru_cache
+import sqlite3
 from infrastructure.database import Base
 
 # Association table for shared lists with roles
 list_shares = Table(
     "list_shares",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("list_id", Integer, ForeignKey("task_lists.id")),
-    Column("role", String, default="read")  # Roles: read, write, admin
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("list_id", Integer, ForeignKey("task_lists.id"), nullable=False),
+    Column("role", String, default="read", nullable=False),  # Roles: read, write, admin
+    # One share per (list, user); also the index behind permission checks
+    UniqueConstraint("list_id", "user_id", name="uq_list_shares_list_user"),
+    Index("ix_list_shares_user_id", "user_id"),
 )
 
 class User(Base):
@@ -21,11 +26,18 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_admin = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)  # for email verification flow
+    # Bumped whenever the user's dashboard would render differently (see application.page_cache)
+    content_version = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Row version: incremented by every ORM update, used for ETags (see application.conditional)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
 
     tasks = relationship("Task", back_populates="user")
     task_lists = relationship("TaskList", back_populates="owner")
     shared_lists = relationship("TaskList", secondary=list_shares, back_populates="shared_users")
 
+    __mapper_args__ = {"version_id_col": version}
+
 class TaskList(Base):
     __tablename__ = "task_lists"
 
@@ -34,10 +46,23 @@ class TaskList(Base):
     description = Column(String, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever the list page would render differently (see application.page_cache)
+    content_version = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    # On-chain copy of the list, written in the background (see application.chain_jobs)
+    chain_status = Column(String(16), nullable=True, index=True)
+    chain_tx_hash = Column(String(66), nullable=True)
+    chain_error = Column(String, nullable=True)
+    chain_claimed_at = Column(DateTime, nullable=True)  # when a worker started sending; a lease
 
-    tasks = relationship("Task", back_populates="task_list")
+    # Relationships stay lazy for single-object access (e.g. permission checks);
+    # pages that render many lists use the loader options defined below Task.
+    tasks = relationship("Task", back_populates="task_list", order_by="Task.id")
     owner = relationship("User", back_populates="task_lists")
-    shared_users = relationship("User", secondary=list_shares, back_populates="shared_lists")
+    shared_users = relationship("User", secondary=list_shares, back_populates="shared_lists", order_by="User.email")
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Task(Base):
@@ -47,9 +72,286 @@ class Task(Base):
     title = Column(String, index=True)
     description = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
+    completed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
-    list_id = Column(Integer, ForeignKey("task_lists.id"), nullable=True)
+    list_id = Column(Integer, ForeignKey("task_lists.id"), nullable=True, index=True)
+    client_id = Column(String(64), nullable=True)  # idempotency key for tasks created offline
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    # Position in the owner's change sequence ("tasks:<user_id>"), set on every insert and update.
+    # Kept per user so task writes by different users never contend (see application.changes)
+    change_seq = Column(Integer, default=0, server_default="0", nullable=False)
 
     user = relationship("User", back_populates="tasks")
     task_list = relationship("TaskList", back_populates="tasks")
+
+    __table_args__ = (
+        # Keyset pagination of a user's tasks walks (user_id, created_at, id)
+        Index("ix_tasks_user_created_id", "user_id", "created_at", "id"),
+        # Re-sent offline tasks are deduplicated on this key (see application.sync)
+        UniqueConstraint("user_id", "client_id", name="uq_tasks_user_client_id"),
+        # Delta sync walks a user's tasks by (change_seq, id)
+        Index("ix_tasks_user_change_seq", "user_id", "change_seq", "id"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+
+class TaskTombstone(Base):
+    """A deleted task, kept so delta sync clients learn about the deletion."""
+    __tablename__ = "task_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_task_tombstones_user_change_seq", "user_id", "change_seq"),
+    )
+
+
+class ChangeSequence(Base):
+    """Named monotonically increasing counters (one row per sequence)."""
+    __tablename__ = "change_sequences"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+
+# Number of tasks in a list, as a correlated subquery. Deferred so it is only
+# computed where a page asks for it (see list_summary_options).
+TaskList.task_count = column_property(
+    select(func.count(Task.id)).where(Task.list_id == TaskList.id).correlate_except(Task).scalar_subquery(),
+    deferred=True,
+)
+
+
+def list_summary_options():
+    """
+    Loader options for pages showing many lists: owner and task count come
+    back in the same query, and any other lazy load raises instead of
+    silently issuing one query per list.
+    """
+    return (joinedload(TaskList.owner), undefer(TaskList.task_count), raiseload("*"))
+
+
+def list_detail_options():
+    """Loader options for a single list page with its owner, members and tasks."""
+    return (
+        joinedload(TaskList.owner),
+        selectinload(TaskList.shared_users),
+        selectinload(TaskList.tasks),
+        raiseload("*"),
+    )
+
+
+# ----------------------------
+# Full-text search index over tasks (see application.search)
+# ----------------------------
+
+# SQLite: an external-content FTS5 table kept in step with tasks by triggers,
+# so Core writes (bulk operations, offline sync) are indexed as well. The
+# scope column holds "u<user_id> l<list_id>" so searches can be narrowed to
+# what a user may see inside the full-text query itself.
+_SQLITE_SCOPE = "'u' || {row}.user_id || coalesce(' l' || {row}.list_id, '')"
+SQLITE_SEARCH_DDL = (
+    "CREATE VIEW IF NOT EXISTS tasks_fts_source AS "
+    f"SELECT id, title, description, {_SQLITE_SCOPE.format(row='tasks')} AS scope FROM tasks",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, scope, "
+    "content='tasks_fts_source', content_rowid='id', tokenize='porter unicode61', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description, scope) "
+    f"VALUES (new.id, new.title, new.description, {_SQLITE_SCOPE.format(row='new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, scope) "
+    f"VALUES ('delete', old.id, old.title, old.description, {_SQLITE_SCOPE.format(row='old')}); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id, list_id ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, scope) "
+    f"VALUES ('delete', old.id, old.title, old.description, {_SQLITE_SCOPE.format(row='old')}); "
+    "INSERT INTO tasks_fts(rowid, title, description, scope) "
+    f"VALUES (new.id, new.title, new.description, {_SQLITE_SCOPE.format(row='new')}); END",
+)
+
+# Postgres: a generated tsvector column, title weighted above description
+POSTGRES_SEARCH_DDL = (
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+)
+
+
+@lru_cache(maxsize=None)
+def sqlite_has_fts5() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    # Runs on every create_all and is idempotent, so existing databases get
+    # the index (filled from current rows) on their next startup
+    if connection.dialect.name == "sqlite" and sqlite_has_fts5():
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").first()
+        for ddl in SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+    elif connection.dialect.name == "postgresql":
+        for ddl in POSTGRES_SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
+
+
+# ----------------------------
+# Habits
+# ----------------------------
+
+class Habit(Base):
+    """
+    A recurring daily habit. The summary columns and the completion bitset are
+    updated on each check-in (see application.habits) so reading a habit's
+    streaks or calendar never touches its check-in history.
+    """
+    __tablename__ = "habits"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    start_day = Column(Date, nullable=False)  # day 0 of the bitset
+    # Summary, maintained incrementally
+    current_streak = Column(Integer, default=0, server_default="0", nullable=False)  # run ending on last_completed_day
+    longest_streak = Column(Integer, default=0, server_default="0", nullable=False)
+    total_completions = Column(Integer, default=0, server_default="0", nullable=False)
+    last_completed_day = Column(Date, nullable=True)
+    # Bit i (least significant bit first) is set if the habit was done on start_day + i
+    completion_bits = Column(LargeBinary, default=b"", nullable=False)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class HabitCheckIn(Base):
+    """Completion log: one row per habit and day done."""
+    __tablename__ = "habit_checkins"
+
+    id = Column(Integer, primary_key=True)
+    habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("habit_id", "day", name="uq_habit_checkins_habit_day"),
+        Index("ix_habit_checkins_user_day", "user_id", "day"),
+    )
+
+
+# ----------------------------
+# Analytics
+# ----------------------------
+
+class ActivityEvent(Base):
+    """
+    Append-only log of user activity. Rollup tables below are derived from it
+    and can always be rebuilt (see application.analytics.rebuild_rollups).
+    """
+    __tablename__ = "activity_events"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    event_type = Column(String, nullable=False)  # signup, login, task_created, task_completed
+    subject_id = Column(Integer, nullable=True)  # e.g. the task id for task events
+    occurred_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_activity_events_user_type", "user_id", "event_type"),
+    )
+
+
+class UserActivityDay(Base):
+    """One row per (user, day) with any activity; used to count each user once per day."""
+    __tablename__ = "user_activity_days"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    active_users = Column(Integer, default=0, nullable=False)
+    signups = Column(Integer, default=0, nullable=False)
+    tasks_created = Column(Integer, default=0, nullable=False)
+    tasks_completed = Column(Integer, default=0, nullable=False)
+
+
+class RetentionRollup(Base):
+    """
+    Users from the signup cohort starting on `cohort_week` (a Monday) who were
+    active `week_offset` weeks later. Offset 0 is the cohort size.
+    """
+    __tablename__ = "retention_rollups"
+
+    cohort_week = Column(Date, primary_key=True)
+    week_offset = Column(Integer, primary_key=True)
+    active_users = Column(Integer, default=0, nullable=False)
+
+
+class HabitStatsRollup(Base):
+    """
+    Per-user habit trends as of `computed_for`, written by the nightly batch in
+    application.habit_stats. Rates are completions over habit-days due.
+    """
+    __tablename__ = "habit_stats_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    computed_for = Column(Date, nullable=False)
+    habits = Column(Integer, default=0, nullable=False)
+    completions_30d = Column(Integer, default=0, nullable=False)
+    rate_7d = Column(Float, default=0.0, nullable=False)
+    rate_30d = Column(Float, default=0.0, nullable=False)
+    weekday_rates = Column(String, nullable=False)  # JSON list of 7 rates, Monday first
+
+
+# ----------------------------
+# Background jobs
+# ----------------------------
+
+class Job(Base):
+    """
+    One unit of deferred work for application.jobs. The row is the queue
+    entry: workers claim it with a conditional UPDATE, so no broker is needed.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String(64), nullable=False)
+    payload = Column(String, nullable=True)  # JSON keyword arguments for the handler
+    result = Column(String, nullable=True)  # JSON return value of the handler
+    priority = Column(Integer, default=0, nullable=False)  # higher runs first
+    status = Column(String(16), default="queued", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # not before
+    dedupe_key = Column(String(128), nullable=True, index=True)
+    locked_by = Column(String(128), nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # lease; the job is retried if it runs past it
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "priority", "run_at"),
+        Index("ix_jobs_type_status", "job_type", "status"),
+    )
@@ -0,0 +1,173 @@
+"""
+Rendered-page cache for the dashboard and list pages.
+
+Pages are cached as rendered bytes under a key that includes a version
+counter: users.content_version for a user's dashboard and
+task_lists.content_version for a list page. Writes that change what a page
+shows bump the counter, so a stale page is never looked up again and simply
+ages out of the LRU. Checking the counter costs one primary-key read (none for
+list pages, whose permission check already loads the list).
+
+Task inserts, updates and deletes bump the counters from ORM events; code
+that writes tasks or shares with Core statements calls bump_versions().
+
+Responses carry an ETag derived from the body, and a matching If-None-Match
+gets an empty 304.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+from sqlalchemy import event, inspect, update
+
+from application.conditional import etag_matches, validator_headers
+from application.models import Task, TaskList, User
+
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "5000"))
+PAGE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("PAGE_CACHE_MAX_ENTRY_BYTES", str(512 * 1024)))
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class PageCache:
+    """Thread-safe LRU of rendered pages bounded by entry count and total bytes."""
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES, max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+                 max_entry_bytes: int = PAGE_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def set(self, key: Hashable, body: bytes) -> CachedPage:
+        page = CachedPage(body, etag_for(body))
+        if len(body) > self.max_entry_bytes:
+            return page
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._entries[key] = page
+            self.size += len(body)
+            while self._entries and (self.size > self.max_bytes or len(self._entries) > self.max_entries):
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+page_cache = PageCache()
+
+
+# ----------------------------
+# Version counters
+# ----------------------------
+
+def _bump(connection, user_ids: Iterable[int] = (), list_ids: Iterable[int] = ()):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    list_ids = {list_id for list_id in list_ids if list_id is not None}
+    if user_ids:
+        connection.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id.in_(user_ids))
+            # updated_at is kept: the user row itself did not change
+            .values(content_version=User.__table__.c.content_version + 1, updated_at=User.__table__.c.updated_at)
+        )
+    if list_ids:
+        connection.execute(
+            update(TaskList.__table__)
+            .where(TaskList.__table__.c.id.in_(list_ids))
+            .values(
+                content_version=TaskList.__table__.c.content_version + 1,
+                updated_at=TaskList.__table__.c.updated_at,
+            )
+        )
+
+
+def bump_versions(db, user_ids: Iterable[int] = (), list_ids: Iterable[int] = ()):
+    """Invalidate cached pages of these users and lists, in the caller's transaction."""
+    _bump(db, user_ids, list_ids)
+
+
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+@event.listens_for(Task, "after_delete")
+def _task_changed(mapper, connection, target):
+    # A task moved to another list changes the old list's page too
+    moved_from = inspect(target).attrs.list_id.history.deleted or ()
+    _bump(connection, [target.user_id], [target.list_id, *moved_from])
+
+
+# What the list pages render of the list itself; other columns (the chain
+# status and receipt, leases, timestamps) change without changing the pages
+_RENDERED_LIST_ATTRS = ("name", "description", "owner_id", "shared_users")
+
+
+@event.listens_for(TaskList, "before_update")
+def _list_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _RENDERED_LIST_ATTRS):
+        # A SQL expression rather than a Python increment, so a copy loaded before
+        # a task event bumped the counter cannot move it backwards
+        target.content_version = TaskList.content_version + 1
+
+
+# ----------------------------
+# Responses
+# ----------------------------
+
+def page_response(request: Request, page: CachedPage) -> Response:
+    # private: pages are per user; no-cache: browsers revalidate with If-None-Match
+    headers = validator_headers(page.etag)
+    if etag_matches(request, page.etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
+
+
+def serve(request: Request, key: Hashable, render: Callable[[], str]) -> Response:
+    """Respond with the cached page for `key`, rendering it with `render()` on a miss."""
+    page = page_cache.get(key)
+    if page is None:
+        page = page_cache.set(key, render().encode())
+    return page_response(request, page)
+
+
+async def serve_async(request: Request, key: Hashable, render) -> Response:
+    """serve() for an async `render` coroutine function."""
+    page = page_cache.get(key)
+    if page is None:
+        page = page_cache.set(key, (await render()).encode())
+    return page_response(request, page)
@@ -0,0 +1,83 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from application.models import Task
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(task: Task) -> str:
+    """
+    Encode the keyset position of a task as an opaque, URL-safe cursor.
+    """
+    raw = f"{task.created_at.isoformat()}|{task.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor().
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def task_page_statement(user_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Build the keyset query for one page of a user's tasks, ordered by
+    (created_at, id) so it is served by ix_tasks_user_created_id.
+    One extra row is fetched to know whether a next page exists.
+    """
+    stmt = select(Task).where(Task.user_id == user_id)
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                Task.created_at > created_at,
+                and_(Task.created_at == created_at, Task.id > task_id),
+            )
+        )
+    return stmt.order_by(Task.created_at, Task.id).limit(limit + 1)
+
+
+def split_page(rows: List[Task], limit: int) -> Tuple[List[Task], Optional[str]]:
+    """
+    Trim the look-ahead row and return (page, next_cursor).
+    """
+    if len(rows) > limit:
+        page = rows[:limit]
+        return page, encode_cursor(page[-1])
+    return rows, None
+
+
+def paginate_tasks(db, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Return (tasks, next_cursor) for one page of a user's tasks.
+    """
+    limit = clamp_page_size(limit)
+    rows = db.scalars(task_page_statement(user_id, cursor, limit)).all()
+    return split_page(list(rows), limit)
+
+
+async def paginate_tasks_async(db, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    paginate_tasks() for an AsyncSession.
+    """
+    limit = clamp_page_size(limit)
+    rows = (await db.scalars(task_page_statement(user_id, cursor, limit))).all()
+    return split_page(list(rows), limit)
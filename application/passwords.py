@@ -0,0 +1,112 @@
+"""
+Password hashing service.
+
+bcrypt is deliberately slow, so hashing and verification run on a dedicated,
+size-limited executor instead of the threadpool FastAPI shares with every sync
+route. Once `max_pending` operations are queued or running, further calls fail
+fast with PasswordServiceBusy and the auth routes answer 429.
+
+The bcrypt cost comes from BCRYPT_ROUNDS. Hashes made with a different cost are
+flagged by verify_and_update(), which returns a replacement hash so logins
+transparently upgrade (or downgrade) stored passwords.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread or process
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+@lru_cache(maxsize=None)
+def context_for(rounds: int) -> CryptContext:
+    # min/max are pinned to the configured cost so needs_update() flags any other cost
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# Module-level so they can be sent to a process pool
+def _hash(password: str, rounds: int) -> str:
+    return context_for(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int):
+    try:
+        return context_for(rounds).verify_and_update(password, hashed)
+    except ValueError:
+        # Not a hash passlib recognises (e.g. a legacy plaintext value)
+        return False, None
+
+
+class PasswordService:
+    def __init__(self,
+                 rounds: int = BCRYPT_ROUNDS,
+                 workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 executor: str = PASSWORD_HASH_EXECUTOR):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    async def _submit(self, fn, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordServiceBusy("Password hashing queue is full")
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        """
+        Returns (valid, new_hash). new_hash is None unless the stored hash
+        should be replaced because the configured cost changed.
+        """
+        return await self._submit(_verify_and_update, password, hashed, self.rounds)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+password_service = PasswordService()
@@ -0,0 +1,134 @@
+"""
+List authorization.
+
+"Can user X read/write list Y" is answered by one indexed probe: the list by
+primary key, outer-joined to list_shares on its unique (list_id, user_id) key.
+The same row carries the TaskList itself, so routes do not need a second query
+to load it. Answers are memoised per request on request.state.
+
+Roles, weakest first: read < write < admin < owner. `owner` is implied by
+task_lists.owner_id and never stored in list_shares.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy import and_, select
+
+from application.models import TaskList, list_shares
+
+READ = "read"
+WRITE = "write"
+ADMIN = "admin"
+OWNER = "owner"
+
+# Roles that can be granted through sharing
+ROLES = (READ, WRITE, ADMIN)
+_RANK = {READ: 1, WRITE: 2, ADMIN: 3, OWNER: 4}
+
+
+@dataclass(frozen=True)
+class ListAccess:
+    list_id: int
+    task_list: Optional[TaskList]
+    role: Optional[str]
+
+    @property
+    def exists(self) -> bool:
+        return self.task_list is not None
+
+    def allows(self, needed: str) -> bool:
+        return self.role is not None and _RANK[self.role] >= _RANK[needed]
+
+
+def list_access_statement(list_id: int, user_id: int):
+    return (
+        select(TaskList, list_shares.c.role)
+        .outerjoin(list_shares, and_(list_shares.c.list_id == TaskList.id, list_shares.c.user_id == user_id))
+        .where(TaskList.id == list_id)
+    )
+
+
+def access_from_row(list_id: int, user_id: int, row) -> ListAccess:
+    if row is None:
+        return ListAccess(list_id, None, None)
+    task_list, role = row
+    if task_list.owner_id == user_id:
+        role = OWNER
+    elif role is not None and role not in _RANK:
+        # Legacy free-text roles get the least privilege
+        role = READ
+    return ListAccess(list_id, task_list, role)
+
+
+def _access_cache(request: Optional[Request]):
+    if request is None:
+        return None
+    cache = getattr(request.state, "list_access", None)
+    if cache is None:
+        cache = request.state.list_access = {}
+    return cache
+
+
+def get_list_access(db, list_id: int, user, request: Request = None) -> ListAccess:
+    cache = _access_cache(request)
+    if cache is not None and (list_id, user.id) in cache:
+        return cache[(list_id, user.id)]
+    row = db.execute(list_access_statement(list_id, user.id)).first()
+    access = access_from_row(list_id, user.id, row)
+    if cache is not None:
+        cache[(list_id, user.id)] = access
+    return access
+
+
+async def get_list_access_async(db, list_id: int, user, request: Request = None) -> ListAccess:
+    """get_list_access() for an AsyncSession."""
+    cache = _access_cache(request)
+    if cache is not None and (list_id, user.id) in cache:
+        return cache[(list_id, user.id)]
+    row = (await db.execute(list_access_statement(list_id, user.id))).first()
+    access = access_from_row(list_id, user.id, row)
+    if cache is not None:
+        cache[(list_id, user.id)] = access
+    return access
+
+
+def can_read(db, list_id: int, user, request: Request = None) -> bool:
+    return get_list_access(db, list_id, user, request).allows(READ)
+
+
+def can_write(db, list_id: int, user, request: Request = None) -> bool:
+    return get_list_access(db, list_id, user, request).allows(WRITE)
+
+
+def require_list_access(db, list_id: int, user, needed: str, request: Request = None,
+                        detail: str = "Not authorized", allow_site_admin: bool = False) -> ListAccess:
+    """
+    Return the ListAccess or raise 404 if the list does not exist and 403 if
+    the user's role is below `needed`.
+    """
+    return check_list_access(get_list_access(db, list_id, user, request), user, needed, detail, allow_site_admin)
+
+
+async def require_list_access_async(db, list_id: int, user, needed: str, request: Request = None,
+                                    detail: str = "Not authorized", allow_site_admin: bool = False) -> ListAccess:
+    """require_list_access() for an AsyncSession."""
+    access = await get_list_access_async(db, list_id, user, request)
+    return check_list_access(access, user, needed, detail, allow_site_admin)
+
+
+def check_list_access(access: ListAccess, user, needed: str, detail: str = "Not authorized",
+                      allow_site_admin: bool = False) -> ListAccess:
+    if not access.exists:
+        raise HTTPException(status_code=404, detail="List not found")
+    if not access.allows(needed) and not (allow_site_admin and user.is_admin):
+        raise HTTPException(status_code=403, detail=detail)
+    return access
+
+
+def forget_list_access(request: Request, list_id: int):
+    """Drop memoised answers for a list after its shares change."""
+    cache = getattr(request.state, "list_access", None)
+    if cache:
+        for key in [key for key in cache if key[0] == list_id]:
+            del cache[key]
@@ -0,0 +1,449 @@
+"""
+Real-time fan-out for list collaboration sockets.
+
+Each socket gets a bounded send queue drained by its own task, so publishing
+to a room is just a non-blocking enqueue per peer: one slow client can no longer
+stall the room. A client whose queue fills up is evicted (closed with 1013).
+
+Messages travel through a backplane before being delivered to local sockets:
+
+- InProcessBackplane delivers straight back to this process (single worker).
+- BrokerBackplane connects to a small TCP pub/sub broker (`python manage.py
+  broker`), a stand-in for Redis pub/sub, so rooms span uvicorn workers.
+
+Set WS_BACKPLANE_URL=tcp://host:port to use the broker.
+
+Clients speak a small operation protocol (task.add / task.complete /
+task.edit, see schemas.ListOp). Ops for a room are held for WS_COALESCE_MS,
+superseded ops for the same task are merged away, and the survivors go out
+as one {"type": "batch"} frame. Each client first receives a
+{"type": "hello"} frame with its connection_id, so it can recognise its own
+ops (tagged "by") in batches. Large frames are compressed on the wire by
+permessage-deflate, which uvicorn negotiates (see `manage.py run`).
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from pydantic import ValidationError
+
+from application.schemas import ListOp
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+WS_BACKPLANE_URL = os.getenv("WS_BACKPLANE_URL", "")
+WS_COALESCE_MS = float(os.getenv("WS_COALESCE_MS", "50"))
+WS_MAX_BATCH_OPS = int(os.getenv("WS_MAX_BATCH_OPS", "200"))
+# Longest line the broker and its clients read; a full batch of maximal ops fits well within
+WS_BROKER_FRAME_LIMIT = int(os.getenv("WS_BROKER_FRAME_LIMIT", str(4 * 1024 * 1024)))
+
+# Close code for evicted slow consumers ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Connection:
+    """A websocket plus its bounded outbound queue and sender task."""
+
+    def __init__(self, websocket, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self._sender = None
+
+    def start(self):
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def offer(self, message: str) -> bool:
+        """Enqueue without waiting; False if the client is gone or too far behind."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _send_loop(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("WebSocket send failed, dropping connection: %s", e)
+        finally:
+            self.closed = True
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+        if self._sender is not None:
+            self._sender.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+# ----------------------------
+# Operations
+# ----------------------------
+
+def parse_op(data: str) -> dict:
+    """Validate a client frame; raises ValueError with a readable message."""
+    try:
+        op = ListOp.model_validate_json(data)
+    except ValidationError as e:
+        raise ValueError(str(e)) from e
+    return op.model_dump(exclude_none=True)
+
+
+def _op_key(op: dict):
+    if "task_id" in op:
+        return ("task", op["task_id"])
+    return ("client", op["client_id"])
+
+
+def _completes(op: dict) -> bool:
+    return op["op"] == "task.complete" or bool(op.get("completed"))
+
+
+def merge_ops(previous: dict, op: dict) -> dict:
+    """
+    Fold `op` into an earlier pending op for the same task, so only one op per
+    task survives in a batch. An add absorbs later edits and completion, later
+    fields win, and completion is never undone by a later edit.
+    """
+    merged = {**previous, **op}
+    if previous["op"] == "task.add":
+        merged["op"] = "task.add"
+    elif previous["op"] != op["op"]:
+        merged["op"] = "task.edit"
+    if merged["op"] != "task.complete" and (_completes(previous) or _completes(op)):
+        merged["completed"] = True
+    return merged
+
+
+class Coalescer:
+    """
+    Collect ops per room and flush them as one batch frame per window.
+    A room is flushed early once it holds `max_ops` distinct tasks.
+    """
+
+    def __init__(self, flush, window: float = WS_COALESCE_MS / 1000, max_ops: int = WS_MAX_BATCH_OPS):
+        self._flush = flush
+        self.window = window
+        self.max_ops = max_ops
+        self.pending: Dict[object, OrderedDict] = {}
+        self.superseded = 0
+        self._timers = {}
+        self._flushing = set()
+
+    def add(self, room, op: dict):
+        ops = self.pending.setdefault(room, OrderedDict())
+        key = _op_key(op)
+        if key in ops:
+            ops[key] = merge_ops(ops[key], op)
+            self.superseded += 1
+        else:
+            ops[key] = op
+        if len(ops) >= self.max_ops:
+            self._cancel_timer(room)
+            self._spawn_flush(room)
+        elif room not in self._timers:
+            self._timers[room] = asyncio.get_running_loop().call_later(self.window, self._spawn_flush, room)
+
+    def _spawn_flush(self, room):
+        task = asyncio.create_task(self.flush(room))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    def _cancel_timer(self, room):
+        timer = self._timers.pop(room, None)
+        if timer is not None:
+            timer.cancel()
+
+    async def flush(self, room):
+        self._cancel_timer(room)
+        ops = self.pending.pop(room, None)
+        if ops:
+            await self._flush(room, json.dumps({"type": "batch", "ops": list(ops.values())}))
+
+    async def flush_all(self):
+        for room in list(self.pending):
+            await self.flush(room)
+
+
+# ----------------------------
+# Broker frames
+# ----------------------------
+
+async def read_frame(reader) -> Optional[bytes]:
+    """
+    The next newline-terminated frame from `reader`, b"" at end of stream, or
+    None for a frame longer than the reader's limit, which is read past and
+    dropped so the connection stays usable.
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    # readuntil leaves an overrun in the buffer; discard it up to the newline
+    try:
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return None
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+    except asyncio.IncompleteReadError:
+        return b""
+
+
+# ----------------------------
+# Backplanes
+# ----------------------------
+
+Deliver = Callable[[object, str, Optional[str]], None]
+
+
+class InProcessBackplane:
+    """Deliver published messages back to this process only."""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, room, message: str, sender_id: Optional[str] = None):
+        self._deliver(room, message, sender_id)
+
+    async def stop(self):
+        pass
+
+
+class BrokerBackplane:
+    """
+    Relay messages through a TCP broker as newline-delimited JSON, so every
+    worker connected to the broker delivers them to its local sockets.
+    If the broker is unreachable, messages are still delivered locally, as are
+    messages longer than `frame_limit`, which the broker would drop.
+    """
+
+    def __init__(self, host: str, port: int, reconnect_delay: float = 1.0,
+                 frame_limit: int = WS_BROKER_FRAME_LIMIT):
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self.frame_limit = frame_limit
+        self._deliver = None
+        self._writer = None
+        self._connected = asyncio.Event()
+        self._task = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=self.reconnect_delay)
+        except asyncio.TimeoutError:
+            logger.warning("WebSocket broker %s:%s not reachable yet", self.host, self.port)
+
+    async def _run(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=self.frame_limit)
+                self._connected.set()
+                while True:
+                    line = await read_frame(reader)
+                    if line is None:
+                        logger.warning("Dropped a WebSocket broker frame over %d bytes", self.frame_limit)
+                        continue
+                    if not line:
+                        break
+                    try:
+                        frame = json.loads(line)
+                        self._deliver(frame["room"], frame["message"], frame.get("sender"))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning("Ignoring malformed WebSocket broker frame: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError) as e:
+                logger.warning("WebSocket broker connection error: %s", e)
+            finally:
+                self._connected.clear()
+                self._writer = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def publish(self, room, message: str, sender_id: Optional[str] = None):
+        writer = self._writer
+        if writer is None:
+            self._deliver(room, message, sender_id)
+            return
+        frame = json.dumps({"room": room, "message": message, "sender": sender_id}).encode()
+        if len(frame) >= self.frame_limit:
+            logger.warning("WebSocket message of %d bytes is too large for the broker; delivered locally only", len(frame))
+            self._deliver(room, message, sender_id)
+            return
+        writer.write(frame + b"\n")
+        await writer.drain()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def backplane_from_url(url: str):
+    if not url:
+        return InProcessBackplane()
+    parsed = urlparse(url)
+    if parsed.scheme != "tcp":
+        raise ValueError(f"Unsupported WS_BACKPLANE_URL: {url}")
+    return BrokerBackplane(parsed.hostname, parsed.port)
+
+
+# ----------------------------
+# Hub
+# ----------------------------
+
+class BroadcastHub:
+    def __init__(self, backplane=None, queue_size: int = WS_SEND_QUEUE_SIZE, coalesce_window: float = WS_COALESCE_MS / 1000):
+        self.backplane = backplane or InProcessBackplane()
+        self.queue_size = queue_size
+        self.coalescer = Coalescer(self.publish, window=coalesce_window)
+        self.rooms: Dict[object, Dict[str, Connection]] = {}
+        self.evicted = 0
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            self._started = True
+            await self.backplane.start(self._deliver)
+
+    async def stop(self):
+        await self.coalescer.flush_all()
+        if self._started:
+            self._started = False
+            await self.backplane.stop()
+        for room in list(self.rooms):
+            for connection in list(self.rooms.pop(room).values()):
+                await connection.close(code=1001)
+
+    async def join(self, room, websocket) -> Connection:
+        await self.start()
+        connection = Connection(websocket, self.queue_size)
+        connection.start()
+        connection.offer(json.dumps({"type": "hello", "connection_id": connection.id}))
+        self.rooms.setdefault(room, {})[connection.id] = connection
+        return connection
+
+    async def leave(self, room, connection: Connection):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.pop(connection.id, None)
+            if not members:
+                del self.rooms[room]
+        await connection.close()
+
+    async def publish(self, room, message: str, sender: Connection = None):
+        await self.backplane.publish(room, message, sender.id if sender else None)
+
+    def submit(self, room, op: dict, sender: Connection = None):
+        """Queue a validated op for the room's next batch frame (sent to everyone, sender included)."""
+        if sender is not None:
+            op = {**op, "by": sender.id}
+        self.coalescer.add(room, op)
+
+    def _deliver(self, room, message: str, sender_id: Optional[str] = None):
+        for connection in list(self.rooms.get(room, {}).values()):
+            if connection.id == sender_id:
+                continue
+            if not connection.offer(message):
+                self._evict(room, connection)
+
+    def _evict(self, room, connection: Connection):
+        members = self.rooms.get(room)
+        if members is not None and members.pop(connection.id, None) is not None:
+            self.evicted += 1
+            logger.warning("Evicting slow WebSocket consumer from room %s", room)
+            if not members:
+                del self.rooms[room]
+            asyncio.create_task(connection.close(code=SLOW_CONSUMER_CLOSE_CODE))
+
+
+hub = BroadcastHub(backplane_from_url(WS_BACKPLANE_URL))
+
+
+# ----------------------------
+# Broker
+# ----------------------------
+
+class Broker:
+    """
+    Minimal pub/sub relay: every line received from one subscriber is written
+    to all subscribers. Subscribers that stop reading are disconnected once
+    their transport buffer exceeds `max_buffer` bytes. Lines longer than
+    `frame_limit` are dropped; the sender stays connected.
+    """
+
+    def __init__(self, max_buffer: int = 4 * 1024 * 1024, frame_limit: int = WS_BROKER_FRAME_LIMIT):
+        self.max_buffer = max_buffer
+        self.frame_limit = frame_limit
+        self.subscribers = set()
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self._handle, host, port, limit=self.frame_limit)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        self.subscribers.add(writer)
+        try:
+            while True:
+                line = await read_frame(reader)
+                if line is None:
+                    logger.warning("Dropped a broker frame over %d bytes", self.frame_limit)
+                    continue
+                if not line:
+                    break
+                for subscriber in list(self.subscribers):
+                    if subscriber.transport.get_write_buffer_size() > self.max_buffer:
+                        self._drop(subscriber)
+                    else:
+                        subscriber.write(line)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._drop(writer)
+
+    def _drop(self, writer):
+        if writer in self.subscribers:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def stop(self):
+        for writer in list(self.subscribers):
+            self._drop(writer)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+async def serve_broker(host: str = "127.0.0.1", port: int = 7800):
+    broker = Broker()
+    port = await broker.start(host, port)
+    logger.info("WebSocket broker listening on %s:%s", host, port)
+    await asyncio.Event().wait()
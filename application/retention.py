@@ -0,0 +1,111 @@
+"""
+Vectorized cohort retention.
+
+Every user is one row of a users x weeks boolean bitmap: bit k is set when the
+user was active k weeks after the week they signed up in. Activity rows are
+streamed from `user_activity_days` in batches and scattered into the bitmap
+with fancy indexing, and the per-cohort counts are a handful of bincounts, so
+there are no per-user Python loops and no per-cohort queries.
+
+Days are represented as proleptic ordinals (date.toordinal()). Ordinal 1 is a
+Monday, so (ordinal - 1) // 7 numbers Monday-based weeks.
+"""
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+
+from application.models import User, UserActivityDay
+
+DEFAULT_BATCH_SIZE = 100_000
+
+
+def week_index(day_ordinals: np.ndarray) -> np.ndarray:
+    return (day_ordinals - 1) // 7
+
+
+def week_date(week: int) -> date:
+    """Monday of a week produced by week_index()."""
+    return date.fromordinal(int(week) * 7 + 1)
+
+
+def new_bitmap(n_users: int, weeks: int) -> np.ndarray:
+    bitmap = np.zeros((n_users, weeks + 1), dtype=bool)
+    # Signing up counts as activity in week 0, so column 0 is the cohort size
+    bitmap[:, 0] = True
+    return bitmap
+
+
+def mark_activity(bitmap: np.ndarray, signup_weeks: np.ndarray,
+                  user_rows: np.ndarray, activity_days: np.ndarray):
+    """
+    Set the bits for a batch of (user row, day ordinal) activity pairs.
+    Activity before signup or beyond the tracked window is ignored.
+    """
+    offsets = week_index(activity_days) - signup_weeks[user_rows]
+    keep = (offsets >= 0) & (offsets < bitmap.shape[1])
+    bitmap[user_rows[keep], offsets[keep]] = True
+
+
+def reduce_cohorts(bitmap: np.ndarray, signup_weeks: np.ndarray):
+    """
+    Collapse the bitmap into (cohort_weeks, counts), where counts[c, k] is the
+    number of users in cohort c active k weeks after signing up.
+    """
+    cohort_weeks, cohort_rows = np.unique(signup_weeks, return_inverse=True)
+    counts = np.empty((len(cohort_weeks), bitmap.shape[1]), dtype=np.int64)
+    for offset in range(bitmap.shape[1]):
+        counts[:, offset] = np.bincount(cohort_rows, weights=bitmap[:, offset], minlength=len(cohort_weeks))
+    return cohort_weeks, counts
+
+
+def cohort_matrix(signup_days: np.ndarray, user_rows: np.ndarray,
+                  activity_days: np.ndarray, weeks: int = 4):
+    """
+    Compute the cohort retention matrix from in-memory arrays.
+
+    signup_days:   day ordinal of each user's signup, shape (n_users,)
+    user_rows:     row into signup_days for each activity record
+    activity_days: day ordinal of each activity record
+    """
+    signup_weeks = week_index(np.asarray(signup_days, dtype=np.int64))
+    bitmap = new_bitmap(len(signup_weeks), weeks)
+    mark_activity(bitmap, signup_weeks, np.asarray(user_rows), np.asarray(activity_days, dtype=np.int64))
+    return reduce_cohorts(bitmap, signup_weeks)
+
+
+def _ordinals(values, count: int) -> np.ndarray:
+    return np.fromiter((value.toordinal() for value in values), dtype=np.int64, count=count)
+
+
+def load_cohort_matrix(db, weeks: int = 4, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Build the cohort matrix straight from the database.
+    Users are loaded once as two arrays; activity days are streamed
+    `batch_size` rows at a time, so memory is O(users) rather than O(activity).
+    """
+    user_ids = []
+    signup_days = []
+    for partition in db.execute(
+        select(User.id, User.created_at).where(User.created_at.isnot(None)).order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    ).partitions():
+        user_ids.append(np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition)))
+        signup_days.append(_ordinals((row[1] for row in partition), len(partition)))
+    if not user_ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, weeks + 1), dtype=np.int64)
+    user_ids = np.concatenate(user_ids)
+    signup_weeks = week_index(np.concatenate(signup_days))
+    bitmap = new_bitmap(len(user_ids), weeks)
+
+    for partition in db.execute(
+        select(UserActivityDay.user_id, UserActivityDay.day)
+        .execution_options(yield_per=batch_size)
+    ).partitions():
+        ids = np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition))
+        days = _ordinals((row[1] for row in partition), len(partition))
+        rows = np.minimum(np.searchsorted(user_ids, ids), len(user_ids) - 1)
+        known = user_ids[rows] == ids
+        mark_activity(bitmap, signup_weeks, rows[known], days[known])
+
+    return reduce_cohorts(bitmap, signup_weeks)
@@ -1,19 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, WebSocket
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from pydantic import ValidationError
-from application.schemas import UserCreate, UserOut, TaskCreate, TaskOut
-from application.models import User, Task, TaskList, list_shares
+from application.schemas import UserCreate, UserOut, TaskCreate, TaskOut, TaskChanges, ChainStatus, BulkTaskOps, TaskSearchPage
+from application.schemas import HabitCreate, HabitCheckInCreate, HabitOut, HabitCalendar
+from application.models import User, Task, TaskList, Habit, list_shares, list_detail_options, list_summary_options
 from application.schemas import RegisterForm, LoginForm
-from application.utils import generate_referral_link, hash_password, verify_password
-from infrastructure.database import get_db
-from typing import List
+from application.utils import generate_referral_link
+from application.passwords import password_service, PasswordServiceBusy
+from application.identity import CurrentUser, get_current_user, get_current_user_async, load_current_user
+from application.pagination import decode_cursor, paginate_tasks, paginate_tasks_async
+from application.conditional import conditional, strong_etag
+from application import analytics, blockchain, bulk, changes, habit_stats, habits, jobs, page_cache, permissions, search, sync
+from application.realtime import hub, parse_op
+from application.chain_jobs import QUEUED, chain_jobs
+from infrastructure.database import (
+    SessionLocal,
+    dialect_insert,
+    get_async_db,
+    get_async_read_db,
+    get_db,
+    get_read_db,
+)
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+import json
+import logging
 import os
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+# Users, lists and tasks carry a version_id_col: a commit that updates or
+# deletes a row another request changed since it was loaded raises
+# StaleDataError. Write routes answer 409 so the client can reload and retry.
+
+def _commit_or_conflict(db: Session, detail: str):
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+async def _commit_or_conflict_async(db: AsyncSession, detail: str):
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
 @router.get("/", response_class=HTMLResponse, include_in_schema=False)
 def landing_page(request: Request):
     """
@@ -36,11 +76,23 @@ def register_form(request: Request):
         {"request": request}
     )
 
+def _auth_busy(request: Request, template: str):
+    return templates.TemplateResponse(
+        request,
+        template,
+        {
+            "request": request,
+            "error": "Too many sign-in attempts right now. Please try again in a moment."
+        },
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/register", response_class=HTMLResponse, include_in_schema=False)
-def register_user(request: Request,
+async def register_user(request: Request,
                   email: str = Form(...),
                   password: str = Form(...),
-                  db: Session = Depends(get_db)):
+                  db: AsyncSession = Depends(get_async_db)):
     # 1) Use Pydantic for validation
     try:
         data = RegisterForm(email=email, password=password)
@@ -56,7 +108,7 @@ def register_user(request: Request,
         )
 
     # 2) Check if email is already registered
-    existing_user = db.query(User).filter(User.email == data.email).first()
+    existing_user = (await db.scalars(select(User).where(User.email == data.email).limit(1))).first()
     if existing_user:
         return templates.TemplateResponse(
             request,
@@ -68,14 +120,18 @@ def register_user(request: Request,
             status_code=400
         )
 
-    # 3) Hash password
-    hashed = hash_password(data.password)
+    # 3) Hash password on the bounded bcrypt pool
+    try:
+        hashed = await password_service.hash(data.password)
+    except PasswordServiceBusy:
+        return _auth_busy(request, "register.html")
 
     # 4) Create user
     new_user = User(email=data.email, password=hashed)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
+    await db.run_sync(analytics.record_event, new_user.id, analytics.SIGNUP, occurred_at=new_user.created_at)
+    await db.commit()
 
     # 5) Log user in
     request.session["user_id"] = new_user.id
@@ -90,10 +146,10 @@ def login_form(request: Request):
     return templates.TemplateResponse(request, "login.html", {"request": request})
 
 @router.post("/login", response_class=HTMLResponse, include_in_schema=False)
-def login_user(request: Request,
+async def login_user(request: Request,
                email: str = Form(...),
                password: str = Form(...),
-               db: Session = Depends(get_db)):
+               db: AsyncSession = Depends(get_async_db)):
     # 1) Use Pydantic for validation
     try:
         data = LoginForm(email=email, password=password)
@@ -109,7 +165,7 @@ def login_user(request: Request,
         )
 
     # 2) Find user in DB
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.scalars(select(User).where(User.email == data.email).limit(1))).first()
     if not user:
         return templates.TemplateResponse(
             request,
@@ -121,8 +177,12 @@ def login_user(request: Request,
             status_code=400
         )
 
-    # 3) Check password
-    if not verify_password(data.password, user.password):
+    # 3) Check password on the bounded bcrypt pool
+    try:
+        valid, new_hash = await password_service.verify_and_update(data.password, user.password)
+    except PasswordServiceBusy:
+        return _auth_busy(request, "login.html")
+    if not valid:
         return templates.TemplateResponse(
             request,
             "login.html",
@@ -142,7 +202,11 @@ def login_user(request: Request,
     #         status_code=403
     #     )
 
-    # 4) Successful login
+    # 4) Successful login; upgrade the stored hash if BCRYPT_ROUNDS changed
+    if new_hash:
+        user.password = new_hash
+    await db.run_sync(analytics.record_event, user.id, analytics.LOGIN)
+    await db.commit()
     request.session["user_id"] = user.id
     return RedirectResponse(url="/dashboard", status_code=302)
 
@@ -152,23 +216,32 @@ def logout(request: Request):
     return RedirectResponse(url="/", status_code=302)
 
 @router.get("/dashboard", response_class=HTMLResponse, include_in_schema=False)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse(url="/login", status_code=302)
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_current_user(request, db)
     if not user:
         request.session.clear()
         return RedirectResponse(url="/login", status_code=302)
 
-    tasks = db.query(Task).filter(Task.user_id == user_id).all()
+    def render():
+        # Only one keyset page of tasks is loaded; the template links to the next one
+        tasks, next_cursor = paginate_tasks(db, user_id, cursor)
+        return templates.get_template("dashboard.html").render(
+            {"request": request, "user": user, "tasks": tasks, "next_cursor": next_cursor}
+        )
 
-    return templates.TemplateResponse(
-        request,
-        "dashboard.html",
-        {"request": request, "user": user, "tasks": tasks}
-    )
+    # Keyed by the decoded position, so arbitrary cursor strings are rejected
+    # instead of each taking a slot in the shared cache
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Served from the page cache until one of the user's tasks changes
+    version = db.scalar(select(User.content_version).where(User.id == user.id))
+    return page_cache.serve(request, ("dashboard", user.id, position, version), render)
 
 @router.post("/create_task", response_class=HTMLResponse, include_in_schema=False)
 def create_task_view(request: Request,
@@ -181,6 +254,8 @@ def create_task_view(request: Request,
 
     new_task = Task(title=title, description=description, user_id=user_id)
     db.add(new_task)
+    db.flush()
+    analytics.record_event(db, user_id, analytics.TASK_CREATED, subject_id=new_task.id)
     db.commit()
     return RedirectResponse(url="/dashboard", status_code=302)
 
@@ -191,22 +266,24 @@ def complete_task_ui(task_id: int, request: Request, db: Session = Depends(get_d
         return RedirectResponse(url="/login", status_code=302)
 
     task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
-    if task:
+    if task and not task.completed:
         task.completed = True
-        db.commit()
+        task.completed_at = datetime.utcnow()
+        analytics.record_event(db, user_id, analytics.TASK_COMPLETED, subject_id=task.id)
+        _commit_or_conflict(db, "Task was updated concurrently")
 
     return RedirectResponse(url="/dashboard", status_code=302)
 
 @router.get("/admin", response_class=HTMLResponse, include_in_schema=False)
-def admin_dashboard(request: Request, admin_key: str, db: Session = Depends(get_db)):
+def admin_dashboard(request: Request, admin_key: str, db: Session = Depends(get_read_db)):
     # same as before
     required_key = os.getenv("ADMIN_KEY", "")
     if admin_key != required_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin key")
 
-    dau = {"DAU": 123}
-    tasks_per_day = {"tasks_completed_per_day": 45}
-    retention = {"4_week_retention_percentage": 32.5}
+    dau = analytics.daily_active_users(db)
+    tasks_per_day = analytics.tasks_completed_per_day(db)
+    retention = analytics.four_week_retention(db)
 
     return templates.TemplateResponse(
         request,
@@ -219,18 +296,25 @@ def admin_dashboard(request: Request, admin_key: str, db: Session = Depends(get_
         }
     )
 
-# Existing JSON endpoints can remain the same...
+# Analytics endpoints read the precomputed rollups maintained by application.analytics
 @router.get("/analytics/dau", operation_id="get_dau_metrics")
-async def get_dau():
-    return {"message": "DAU Analytics"}
+def get_dau(days: int = 30, db: Session = Depends(get_read_db)):
+    return analytics.daily_active_users(db, days=max(1, min(days, 365)))
 
 @router.get("/analytics/tasks_per_day", operation_id="get_tasks_completed_metrics")
-async def get_tasks_completed_per_day():
-    return {"message": "Tasks per Day Analytics"}
+def get_tasks_completed_per_day(days: int = 30, db: Session = Depends(get_read_db)):
+    return analytics.tasks_completed_per_day(db, days=max(1, min(days, 365)))
 
 @router.get("/analytics/retention", operation_id="get_retention_metrics")
-async def get_4_week_retention():
-    return {"message": "4-Week Retention Analytics"}
+def get_4_week_retention(cohorts: int = 8, db: Session = Depends(get_read_db)):
+    return analytics.four_week_retention(db, cohorts=max(1, min(cohorts, 52)))
+
+@router.get("/analytics/habits", include_in_schema=False)
+def get_habit_stats(days: int = 365,
+                    db: Session = Depends(get_read_db),
+                    user: CurrentUser = Depends(get_current_user)):
+    """The current user's habit heatmap, rolling 7/30-day rates and weekday pattern (application.habit_stats)."""
+    return habit_stats.user_stats(db, user.id, days=max(7, min(days, 366)))
 
 @router.get("/referral/{user_id}", operation_id="generate_user_referral")
 async def generate_referral(user_id: int):
@@ -253,21 +337,28 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    analytics.record_event(db, new_user.id, analytics.SIGNUP, occurred_at=new_user.created_at)
+    db.commit()
     return new_user
 
 @router.get("/users/{user_id}", response_model=UserOut, include_in_schema=False)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_user(request: Request, response: Response, user_id: int,
+                   db: AsyncSession = Depends(get_async_read_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    etag = strong_etag("user", user.id, user.version)
+    not_modified = conditional(request, response, etag, user.updated_at or user.created_at)
+    if not_modified:
+        return not_modified
     return user
 
 @router.post("/users/{user_id}/tasks", response_model=TaskOut, include_in_schema=False)
-def create_task_for_user(user_id: int, task: TaskCreate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def create_task_for_user(user_id: int, task: TaskCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -275,31 +366,120 @@ def create_task_for_user(user_id: int, task: TaskCreate, db: Session = Depends(g
         )
     new_task = Task(**task.dict(), user_id=user.id)
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.flush()
+    await db.run_sync(analytics.record_event, user.id, analytics.TASK_CREATED, new_task.id)
+    await db.commit()
+    await db.refresh(new_task)
     return new_task
 
 @router.get("/users/{user_id}/tasks", response_model=List[TaskOut], include_in_schema=False)
-def get_tasks_for_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_tasks_for_user(request: Request,
+                       response: Response,
+                       user_id: int,
+                       cursor: Optional[str] = None,
+                       limit: Optional[int] = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    """
+    Return one keyset page of a user's tasks.
+    The cursor for the next page is sent in the X-Next-Cursor and Link headers.
+    """
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return user.tasks
+    try:
+        tasks, next_cursor = await paginate_tasks_async(db, user_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    # The page is identified by its tasks' ids and row versions, checked before serializing.
+    # No Last-Modified: a deleted or moved task leaves no newer updated_at behind
+    etag = strong_etag("tasks", user_id, [(task.id, task.version) for task in tasks], next_cursor)
+    not_modified = conditional(request, response, etag)
+    if not_modified:
+        not_modified.headers.update({k: v for k, v in response.headers.items() if k in ("x-next-cursor", "link")})
+        return not_modified
+    return tasks
+
+@router.post("/tasks/bulk", include_in_schema=False)
+def bulk_tasks(request: Request,
+               ops: BulkTaskOps,
+               db: Session = Depends(get_db),
+               user: CurrentUser = Depends(get_current_user)):
+    """
+    Create, complete and move many tasks in one transaction.
+    Returns a result per item; see application.bulk.
+    """
+    if bulk.count_items(ops) > bulk.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {bulk.BULK_MAX_ITEMS} operations per request"
+        )
+    return bulk.run(db, user, ops, request)
+
+@router.get("/tasks/search", response_model=TaskSearchPage, include_in_schema=False)
+async def search_tasks(q: str,
+                       cursor: Optional[str] = None,
+                       limit: Optional[int] = None,
+                       db: AsyncSession = Depends(get_async_read_db),
+                       user: CurrentUser = Depends(get_current_user_async)):
+    """
+    Ranked full-text search over the titles and descriptions of tasks the user
+    owns or can see through lists. Pass next_cursor as `cursor` for more.
+    """
+    try:
+        return await search.search_tasks_async(db, user.id, q, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/tasks/changes", response_model=TaskChanges, include_in_schema=False)
+async def get_task_changes(since: Optional[str] = None,
+                           limit: Optional[int] = None,
+                           db: AsyncSession = Depends(get_async_db),
+                           user: CurrentUser = Depends(get_current_user_async)):
+    """
+    Delta sync: the current user's tasks changed and deleted after cursor `since`.
+    Pass the returned cursor as `since` next time; keep going while has_more is true.
+    """
+    try:
+        return await changes.changes_since_async(db, user.id, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT, include_in_schema=False)
+async def delete_task(task_id: int,
+                      db: AsyncSession = Depends(get_async_db),
+                      user: CurrentUser = Depends(get_current_user_async)):
+    task = await db.get(Task, task_id)
+    if not task or task.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    # Leaves a tombstone for delta sync clients (see application.changes)
+    await db.delete(task)
+    await _commit_or_conflict_async(db, "Task was updated concurrently")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.patch("/tasks/{task_id}", response_model=TaskOut, include_in_schema=False)
-def complete_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
+async def complete_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
-    task.completed = True
-    db.commit()
-    db.refresh(task)
+    if not task.completed:
+        task.completed = True
+        task.completed_at = datetime.utcnow()
+        await db.run_sync(analytics.record_event, task.user_id, analytics.TASK_COMPLETED, task.id)
+        await _commit_or_conflict_async(db, "Task was updated concurrently")
+        await db.refresh(task)
     return task
 
 
@@ -316,42 +496,123 @@ def create_task(
 
     new_task = Task(title=title, description=description, user_id=user_id)
     db.add(new_task)
+    db.flush()
+    analytics.record_event(db, user_id, analytics.TASK_CREATED, subject_id=new_task.id)
     db.commit()
     db.refresh(new_task)
 
     return RedirectResponse(url="/dashboard", status_code=302)
 
 @router.post("/sync_tasks")
-def sync_tasks(data: dict, db: Session = Depends(get_db)):
-    tasks = data.get('tasks', [])
-    # For demonstration purposes, log the received tasks.
-    import logging
-    logging.info(f"Received offline tasks to sync: {tasks}")
-    
-    # In a full implementation, iterate through tasks and add/update them in the database.
-    # Here we simply return a success response.
-    return {"status": "success", "synced": len(tasks)}
-
+async def sync_tasks(request: Request, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
+    """
+    Ingest tasks created offline, as JSON {"tasks": [...]} or as an NDJSON stream.
+    Returns a result per item; see application.sync.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in sync.NDJSON_TYPES:
+        source = sync.iter_ndjson(request.stream())
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body")
+        tasks = data.get("tasks") if isinstance(data, dict) else None
+        if not isinstance(tasks, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected {\"tasks\": [...]}")
+        source = sync.iter_json_tasks(tasks)
+    try:
+        return await sync.ingest(db, user.id, source)
+    except sync.SyncBodyError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
 
+# ----------------------------
+# Habit Endpoints
+# ----------------------------
 
-# Utility function to get current user from session
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    user_id = request.session.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+async def _own_habit(db: AsyncSession, habit_id: int, user: CurrentUser) -> Habit:
+    habit = await db.get(Habit, habit_id)
+    if not habit or habit.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Habit not found")
+    return habit
+
+@router.post("/habits", response_model=HabitOut, status_code=status.HTTP_201_CREATED, include_in_schema=False)
+async def create_habit(habit_in: HabitCreate,
+                       db: AsyncSession = Depends(get_async_db),
+                       user: CurrentUser = Depends(get_current_user_async)):
+    habit = Habit(name=habit_in.name, description=habit_in.description, user_id=user.id,
+                  start_day=habits.today(), current_streak=0, longest_streak=0, total_completions=0)
+    db.add(habit)
+    await db.commit()
+    return habits.summary(habit)
+
+@router.get("/habits", response_model=List[HabitOut], include_in_schema=False)
+async def list_habits(db: AsyncSession = Depends(get_async_read_db),
+                      user: CurrentUser = Depends(get_current_user_async)):
+    """Every habit with its streaks, read from the summary columns only."""
+    rows = (await db.scalars(select(Habit).where(Habit.user_id == user.id).order_by(Habit.id))).all()
+    on = habits.today()
+    return [habits.summary(habit, on) for habit in rows]
+
+@router.post("/habits/{habit_id}/checkins", response_model=HabitOut, include_in_schema=False)
+async def check_in_habit(habit_id: int,
+                         checkin: Optional[HabitCheckInCreate] = None,
+                         db: AsyncSession = Depends(get_async_db),
+                         user: CurrentUser = Depends(get_current_user_async)):
+    """Mark today (or a recent `day`) done. Checking in a day twice is a no-op."""
+    habit = await _own_habit(db, habit_id, user)
+    day = (checkin.day if checkin else None) or habits.today()
+    try:
+        habits.validate_day(habit, day)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if habits.check_in(db, habit, day):
+        await db.run_sync(analytics.record_event, user.id, analytics.HABIT_CHECKED_IN, habit.id)
+        try:
+            await db.commit()
+        except (IntegrityError, StaleDataError):
+            # A concurrent check-in for the same habit won; the client can retry
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Habit was updated concurrently")
+    return habits.summary(habit)
+
+@router.get("/habits/{habit_id}/calendar", response_model=HabitCalendar, include_in_schema=False)
+async def get_habit_calendar(habit_id: int,
+                             start: Optional[date] = None,
+                             end: Optional[date] = None,
+                             db: AsyncSession = Depends(get_async_read_db),
+                             user: CurrentUser = Depends(get_current_user_async)):
+    """Done days as a bitset, by default the last 365 days, for calendar and heatmap views."""
+    habit = await _own_habit(db, habit_id, user)
+    end = end or habits.today()
+    start = start or end - timedelta(days=364)
+    try:
+        return habits.calendar(habit, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 # ----------------------------
 # Task List Endpoints
 # ----------------------------
 
 @router.get("/lists", response_class=HTMLResponse)
-def get_lists(request: Request, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    owned_lists = db.query(TaskList).filter(TaskList.owner_id == user.id).all()
-    shared_lists = user.shared_lists
+async def get_lists(request: Request,
+                    db: AsyncSession = Depends(get_async_read_db),
+                    user: CurrentUser = Depends(get_current_user_async)):
+    # Two queries in total, however many lists there are (see list_summary_options)
+    owned_lists = (await db.scalars(
+        select(TaskList)
+        .options(*list_summary_options())
+        .where(TaskList.owner_id == user.id)
+        .order_by(TaskList.id)
+    )).all()
+    shared_lists = (await db.scalars(
+        select(TaskList)
+        .options(*list_summary_options())
+        .join(list_shares, list_shares.c.list_id == TaskList.id)
+        .where(list_shares.c.user_id == user.id)
+        .order_by(TaskList.id)
+    )).all()
     return templates.TemplateResponse(request, "lists.html", {
         "request": request,
         "owned_lists": owned_lists,
@@ -364,35 +625,48 @@ def create_list(request: Request,
                 name: str = Form(...),
                 description: str = Form(""),
                 db: Session = Depends(get_db),
-                user: User = Depends(get_current_user)):
+                user: CurrentUser = Depends(get_current_user)):
     new_list = TaskList(name=name, description=description, owner_id=user.id)
     db.add(new_list)
     db.commit()
     db.refresh(new_list)
     return RedirectResponse(url="/lists", status_code=302)
 
-from application.blockchain import create_list_on_chain
-
 @router.post("/lists/dapp", response_class=HTMLResponse)
 def create_list_dapp(request: Request,
                      name: str = Form(...),
                      description: str = Form(""),
                      db: Session = Depends(get_db),
-                     user: User = Depends(get_current_user)):
+                     user: CurrentUser = Depends(get_current_user)):
     # Create the list off-chain first
     new_list = TaskList(name=name, description=description, owner_id=user.id)
+    # Optionally, record the list on-chain: queued here and sent in the background,
+    # see GET /lists/{list_id}/chain for progress
+    if chain_jobs.enabled:
+        new_list.chain_status = QUEUED
+        jobs.enqueue(db, "chain.sync", dedupe_key="chain.sync")
     db.add(new_list)
     db.commit()
-    db.refresh(new_list)
-    
-    # Optionally, record the list on-chain
-    # Assume user's private key is stored securely (for demo, use environment or a secure vault)
-    owner_private_key = os.getenv("USER_PRIVATE_KEY")
-    if owner_private_key:
-        receipt = create_list_on_chain(owner_private_key, name, description)
-        # You can store receipt.transactionHash or receipt details with the list in your DB if needed.
+    jobs.job_worker.notify()
     return RedirectResponse(url="/lists", status_code=302)
 
+@router.get("/health/blockchain", include_in_schema=False)
+def blockchain_health():
+    """Node reachability for monitoring; 503 while the optional chain integration is down."""
+    probe = blockchain.health()
+    return JSONResponse(probe, status_code=200 if probe["status"] == "ok" else 503)
+
+@router.get("/lists/{list_id}/chain", response_model=ChainStatus, include_in_schema=False)
+async def get_list_chain_status(request: Request,
+                                list_id: int,
+                                db: AsyncSession = Depends(get_async_db),
+                                user: CurrentUser = Depends(get_current_user_async)):
+    task_list = (await permissions.require_list_access_async(
+        db, list_id, user, permissions.READ, request, detail="Not authorized to view this list"
+    )).task_list
+    return ChainStatus(list_id=task_list.id, status=task_list.chain_status,
+                       tx_hash=task_list.chain_tx_hash, error=task_list.chain_error)
+
 
 @router.put("/lists/{list_id}", response_class=HTMLResponse)
 def update_list(request: Request,
@@ -400,29 +674,25 @@ def update_list(request: Request,
                 name: str = Form(...),
                 description: str = Form(""),
                 db: Session = Depends(get_db),
-                user: User = Depends(get_current_user)):
-    task_list = db.query(TaskList).filter(TaskList.id == list_id).first()
-    if not task_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    if task_list.owner_id != user.id and not user.is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
+                user: CurrentUser = Depends(get_current_user)):
+    task_list = permissions.require_list_access(
+        db, list_id, user, permissions.ADMIN, request, allow_site_admin=True
+    ).task_list
     task_list.name = name
     task_list.description = description
-    db.commit()
+    _commit_or_conflict(db, "List was updated concurrently")
     return RedirectResponse(url="/lists", status_code=302)
 
 @router.delete("/lists/{list_id}", response_class=HTMLResponse)
 def delete_list(request: Request,
                 list_id: int,
                 db: Session = Depends(get_db),
-                user: User = Depends(get_current_user)):
-    task_list = db.query(TaskList).filter(TaskList.id == list_id).first()
-    if not task_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    if task_list.owner_id != user.id and not user.is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
+                user: CurrentUser = Depends(get_current_user)):
+    task_list = permissions.require_list_access(
+        db, list_id, user, permissions.OWNER, request, allow_site_admin=True
+    ).task_list
     db.delete(task_list)
-    db.commit()
+    _commit_or_conflict(db, "List was updated concurrently")
     return RedirectResponse(url="/lists", status_code=302)
 
 @router.post("/lists/{list_id}/share", response_class=HTMLResponse)
@@ -431,37 +701,53 @@ def share_list(request: Request,
                email: str = Form(...),
                role: str = Form(...),
                db: Session = Depends(get_db),
-               user: User = Depends(get_current_user)):
-    task_list = db.query(TaskList).filter(TaskList.id == list_id).first()
-    if not task_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    if task_list.owner_id != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to share this list")
+               user: CurrentUser = Depends(get_current_user)):
+    task_list = permissions.require_list_access(
+        db, list_id, user, permissions.ADMIN, request, detail="Not authorized to share this list"
+    ).task_list
+    if role not in permissions.ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(permissions.ROLES)}")
     share_user = db.query(User).filter(User.email == email).first()
     if not share_user:
         return templates.TemplateResponse(request, "lists.html", {"request": request, "error": "User not found"}, status_code=404)
-    # Append share_user to shared_users. Role is stored in association table (advanced: update association if needed)
-    task_list.shared_users.append(share_user)
+    if share_user.id == task_list.owner_id:
+        raise HTTPException(status_code=400, detail="The owner already has full access")
+    # One row per (list, user): re-sharing updates the role
+    stmt = dialect_insert(db, list_shares).values(list_id=list_id, user_id=share_user.id, role=role)
+    db.execute(stmt.on_conflict_do_update(index_elements=["list_id", "user_id"], set_={"role": role}))
+    page_cache.bump_versions(db, list_ids=[list_id])
     db.commit()
+    permissions.forget_list_access(request, list_id)
     return RedirectResponse(url="/lists", status_code=302)
 
 @router.get("/lists/{list_id}", response_class=HTMLResponse)
-def get_list_details(request: Request,
-                     list_id: int,
-                     db: Session = Depends(get_db),
-                     user: User = Depends(get_current_user)):
-    task_list = db.query(TaskList).filter(TaskList.id == list_id).first()
-    if not task_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    if task_list.owner_id != user.id and user not in task_list.shared_users:
-        raise HTTPException(status_code=403, detail="Not authorized to view this list")
-    tasks = db.query(Task).filter(Task.list_id == list_id).all()
-    return templates.TemplateResponse(request, "list_details.html", {
-        "request": request,
-        "task_list": task_list,
-        "tasks": tasks,
-        "user": user
-    })
+async def get_list_details(request: Request,
+                           list_id: int,
+                           db: AsyncSession = Depends(get_async_read_db),
+                           user: CurrentUser = Depends(get_current_user_async)):
+    access = await permissions.require_list_access_async(
+        db, list_id, user, permissions.READ, request, detail="Not authorized to view this list"
+    )
+
+    async def render():
+        # Reload with owner, members and tasks eagerly loaded: a fixed number of queries per page
+        task_list = (await db.scalars(
+            select(TaskList)
+            .options(*list_detail_options())
+            .where(TaskList.id == access.list_id)
+            .execution_options(populate_existing=True)
+        )).one()
+        return templates.get_template("list_details.html").render({
+            "request": request,
+            "task_list": task_list,
+            "tasks": task_list.tasks,
+            "role": access.role,
+            "user": user
+        })
+
+    # The permission check already loaded the list's version, so cache hits cost no extra query
+    key = ("list", list_id, user.id, access.role, access.task_list.content_version)
+    return await page_cache.serve_async(request, key, render)
 
 @router.post("/lists/{list_id}/tasks", response_class=HTMLResponse)
 def create_task_in_list(request: Request,
@@ -469,14 +755,12 @@ def create_task_in_list(request: Request,
                         title: str = Form(...),
                         description: str = Form(""),
                         db: Session = Depends(get_db),
-                        user: User = Depends(get_current_user)):
-    task_list = db.query(TaskList).filter(TaskList.id == list_id).first()
-    if not task_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    if task_list.owner_id != user.id and user not in task_list.shared_users:
-        raise HTTPException(status_code=403, detail="Not authorized")
+                        user: CurrentUser = Depends(get_current_user)):
+    permissions.require_list_access(db, list_id, user, permissions.WRITE, request)
     new_task = Task(title=title, description=description, user_id=user.id, list_id=list_id)
     db.add(new_task)
+    db.flush()
+    analytics.record_event(db, user.id, analytics.TASK_CREATED, subject_id=new_task.id)
     db.commit()
     return RedirectResponse(url=f"/lists/{list_id}", status_code=302)
 
@@ -484,25 +768,41 @@ def create_task_in_list(request: Request,
 # WebSocket for Real-Time Collaboration
 # ----------------------------
 
-# Global dictionary to store WebSocket connections for each list
-list_connections = {}
-
 @router.websocket("/ws/list/{list_id}")
-async def list_collaboration_ws(websocket: WebSocket, list_id: int, db: Session = Depends(get_db)):
-    # For simplicity, we use a query parameter "user_id" (in production use proper authentication)
+async def list_collaboration_ws(websocket: WebSocket, list_id: int):
+    # Authorize from the login session with a short-lived DB session, so the
+    # socket does not hold a connection for its whole lifetime
+    db = SessionLocal()
+    try:
+        user = load_current_user(websocket, db)
+        access = permissions.get_list_access(db, list_id, user) if user is not None else None
+        allowed = access is not None and access.allows(permissions.READ)
+        # Every op changes tasks; read-only members only receive
+        can_edit = allowed and access.allows(permissions.WRITE)
+    finally:
+        db.close()
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
     await websocket.accept()
-    if list_id not in list_connections:
-        list_connections[list_id] = set()
-    list_connections[list_id].add(websocket)
+    connection = await hub.join(list_id, websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            # Broadcast the message to all other connections in this list's room
-            for connection in list_connections[list_id]:
-                if connection != websocket:
-                    await connection.send_text(data)
+            try:
+                op = parse_op(data)
+            except ValueError as e:
+                connection.offer(json.dumps({"type": "error", "detail": str(e)}))
+                continue
+            if not can_edit:
+                connection.offer(json.dumps({"type": "error", "detail": "Read-only access to this list"}))
+                continue
+            # Coalesced with other ops for this list and fanned out as one batch frame
+            hub.submit(list_id, op, sender=connection)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        print("WebSocket error:", e)
+        logging.getLogger(__name__).warning("WebSocket error: %s", e)
     finally:
-        list_connections[list_id].remove(websocket)
-
+        await hub.leave(list_id, connection)
@@ -1,8 +1,8 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
 from typing import Optional, List
-from datetime import datetime
-from pydantic import BaseModel, Field
-from typing import Annotated
+from datetime import date, datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Literal
 
 ConstrainedStr = Annotated[str, Field(min_length=6, max_length=100)]
 
@@ -44,3 +44,101 @@ class TaskOut(TaskBase):
     user_id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# One page of GET /tasks/changes (see application.changes)
+class TaskChanges(BaseModel):
+    tasks: List[TaskOut]
+    deleted: List[int]
+    cursor: str
+    has_more: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChainStatus(BaseModel):
+    list_id: int
+    status: Optional[str] = None
+    tx_hash: Optional[str] = None
+    error: Optional[str] = None
+
+
+# One page of GET /tasks/search (see application.search)
+class TaskSearchPage(BaseModel):
+    results: List[TaskOut]
+    next_cursor: Optional[str] = None
+
+
+# Collaboration socket operations (see application.realtime)
+class ListOp(BaseModel):
+    op: Literal["task.add", "task.complete", "task.edit"]
+    task_id: Optional[int] = None
+    client_id: Optional[str] = Field(default=None, max_length=64)  # for tasks not saved yet
+    title: Optional[str] = Field(default=None, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.task_id is None and self.client_id is None:
+            raise ValueError("task_id or client_id is required")
+        return self
+
+
+# Offline tasks uploaded to /sync_tasks (see application.sync)
+class SyncTask(BaseModel):
+    client_id: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    title: str = Field(min_length=1, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+    completed: bool = False
+    created_at: Optional[datetime] = None
+
+
+# Bulk operations for POST /tasks/bulk (see application.bulk)
+class BulkCreate(BaseModel):
+    client_id: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    title: str = Field(min_length=1, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+    list_id: Optional[int] = None
+    completed: bool = False
+
+
+class BulkMove(BaseModel):
+    task_id: int
+    list_id: Optional[int] = None  # None takes the task out of its list
+
+
+class BulkTaskOps(BaseModel):
+    create: List[BulkCreate] = []
+    complete: List[int] = []
+    move: List[BulkMove] = []
+
+
+# Habits (see application.habits)
+class HabitCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+
+
+class HabitCheckInCreate(BaseModel):
+    day: Optional[date] = None  # today if omitted
+
+
+class HabitOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    start_day: date
+    current_streak: int
+    longest_streak: int
+    total_completions: int
+    completion_rate: float
+    last_completed_day: Optional[date] = None
+    done_today: bool
+
+
+class HabitCalendar(BaseModel):
+    habit_id: int
+    start: date
+    end: date
+    days: int
+    bits: str  # base64, bit 0 = start, least significant bit first
@@ -0,0 +1,144 @@
+"""
+Full-text search over task titles and descriptions for GET /tasks/search.
+
+SQLite uses the tasks_fts FTS5 table ranked by bm25 and Postgres the
+tasks.search_vector column ranked by ts_rank; both are created with the
+schema (see the search section of application.models). Other databases, or
+SQLite builds without FTS5, fall back to unranked LIKE matching.
+
+Queries are reduced to word tokens, all required and the last one matched
+as a prefix (search as you type), so user input can never be a syntax error
+in FTS5 or tsquery.
+Results cover tasks the user owns plus tasks in lists they own or that are
+shared with them. With FTS5 that filter is also part of the MATCH (the scope
+column), so a common word is ranked among the user's tasks rather than the
+whole table. Ranked results are paged by offset: a cursor is the offset of
+the next page.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import Column, Integer, MetaData, Table, and_, func, literal_column, or_, select
+
+from application.models import Task, TaskList, list_shares, sqlite_has_fts5
+from application.pagination import MAX_PAGE_SIZE, clamp_page_size
+
+SEARCH_MAX_TOKENS = 8
+SEARCH_MAX_SCOPE_LISTS = 200  # beyond this, visibility is only checked in SQL
+SEARCH_MAX_OFFSET = 10 * MAX_PAGE_SIZE  # deep offsets rescan every match; refine the query instead
+
+# Title matches count ten times as much as description matches in bm25;
+# the scope column only filters
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+SCOPE_WEIGHT = 0.0
+
+# Not part of Base.metadata: created by the FTS5 DDL, not by create_all
+tasks_fts = Table("tasks_fts", MetaData(), Column("rowid", Integer))
+
+FTS5 = "fts5"
+TSVECTOR = "tsvector"
+LIKE = "like"
+
+
+def backend_for(dialect_name: str) -> str:
+    if dialect_name == "sqlite" and sqlite_has_fts5():
+        return FTS5
+    if dialect_name == "postgresql":
+        return TSVECTOR
+    return LIKE
+
+
+def parse_query(q: str) -> List[str]:
+    """Lower-cased word tokens of a search box query; raises ValueError if there are none."""
+    tokens = re.findall(r"\w+", (q or "").lower())[:SEARCH_MAX_TOKENS]
+    if not tokens:
+        raise ValueError("Search query has no words")
+    return tokens
+
+
+def decode_search_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not 0 <= offset <= SEARCH_MAX_OFFSET:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def visible_lists_statement(user_id: int):
+    """Ids of the lists a user owns or has been shared."""
+    owned_lists = select(TaskList.id).where(TaskList.owner_id == user_id)
+    shared_lists = select(list_shares.c.list_id).where(list_shares.c.user_id == user_id)
+    return owned_lists.union(shared_lists)
+
+
+def visible_to(user_id: int):
+    """Tasks the user owns or can read through a list."""
+    return or_(Task.user_id == user_id, Task.list_id.in_(visible_lists_statement(user_id)))
+
+
+def fts5_match(user_id: int, tokens: List[str], list_ids: Optional[List[int]] = None) -> str:
+    phrases = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+    words = "{title description} : (" + " ".join(phrases) + ")"
+    if list_ids is None or len(list_ids) > SEARCH_MAX_SCOPE_LISTS:
+        return words
+    scope = " OR ".join([f"u{user_id}", *(f"l{list_id}" for list_id in list_ids)])
+    return f"scope : ({scope}) AND {words}"
+
+
+def search_statement(backend: str, user_id: int, tokens: List[str], offset: int, limit: int,
+                     list_ids: Optional[List[int]] = None):
+    """
+    One page of matches, best first, with one look-ahead row. For FTS5, pass
+    the user's visible list ids (visible_lists_statement) to filter inside the index.
+    """
+    if backend == FTS5:
+        match = fts5_match(user_id, tokens, list_ids)
+        rank = func.bm25(literal_column("tasks_fts"), TITLE_WEIGHT, DESCRIPTION_WEIGHT, SCOPE_WEIGHT)
+        stmt = (
+            select(Task)
+            .join(tasks_fts, tasks_fts.c.rowid == Task.id)
+            .where(literal_column("tasks_fts").op("MATCH")(match))
+            .order_by(rank, Task.id)
+        )
+    elif backend == TSVECTOR:
+        query = func.to_tsquery("english", " & ".join(tokens[:-1] + [f"{tokens[-1]}:*"]))
+        vector = literal_column("tasks.search_vector")
+        stmt = (
+            select(Task)
+            .where(vector.op("@@")(query))
+            .order_by(func.ts_rank(vector, query).desc(), Task.id)
+        )
+    else:
+        patterns = [f"%{token.replace('_', '/_')}%" for token in tokens]
+        stmt = (
+            select(Task)
+            .where(and_(*(
+                or_(Task.title.ilike(pattern, escape="/"), Task.description.ilike(pattern, escape="/"))
+                for pattern in patterns
+            )))
+            .order_by(Task.id.desc())
+        )
+    return stmt.where(visible_to(user_id)).offset(offset).limit(limit + 1)
+
+
+async def search_tasks_async(db, user_id: int, q: str, cursor: Optional[str] = None,
+                             limit: Optional[int] = None) -> dict:
+    """
+    {"results": [...], "next_cursor": ...} for an AsyncSession.
+    Raises ValueError for an empty query or a bad cursor.
+    """
+    tokens = parse_query(q)
+    offset = decode_search_cursor(cursor)
+    limit = clamp_page_size(limit)
+    backend = backend_for(db.get_bind().dialect.name)
+    list_ids = None
+    if backend == FTS5:
+        list_ids = (await db.scalars(visible_lists_statement(user_id))).all()
+    rows = (await db.scalars(search_statement(backend, user_id, tokens, offset, limit, list_ids))).all()
+    has_more = len(rows) > limit and offset + limit <= SEARCH_MAX_OFFSET
+    return {"results": rows[:limit], "next_cursor": str(offset + limit) if has_more else None}
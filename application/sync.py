@@ -0,0 +1,224 @@
+"""
+Offline task ingestion for /sync_tasks.
+
+The PWA queues tasks while offline, each tagged with a client-generated
+client_id, and uploads the backlog either as JSON ({"tasks": [...]}) or, for
+large backlogs, as NDJSON (one task per line) which is read and written chunk
+by chunk without holding the whole body in memory.
+
+Each chunk is written with a single multi-row INSERT ... ON CONFLICT DO NOTHING.
+The unique (user_id, client_id) key makes re-sending a task harmless: it is
+reported as a duplicate with the id of the task already stored. Every item
+gets a result, so the client only needs to retry the ones that failed.
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from application import analytics, changes, page_cache
+from application.models import Task
+from application.schemas import SyncTask
+from infrastructure.database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "500"))
+SYNC_MAX_LINE_BYTES = int(os.getenv("SYNC_MAX_LINE_BYTES", "65536"))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Per-item result statuses
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"  # will never succeed; the client should drop it
+FAILED = "failed"  # storage error; safe to retry
+
+
+class SyncBodyError(ValueError):
+    """The request body as a whole cannot be read."""
+
+
+def _result(index: int, client_id, status: str, task_id: int = None, error: str = None) -> dict:
+    result = {"index": index, "client_id": client_id, "status": status}
+    if task_id is not None:
+        result["task_id"] = task_id
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+def _as_utc(value, now: datetime) -> datetime:
+    """Naive UTC like the rest of the schema, and never in the future."""
+    if value is None:
+        return now
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now)
+
+
+def validate_item(index: int, raw):
+    """Return (SyncTask, None) or (None, invalid result)."""
+    client_id = raw.get("client_id") if isinstance(raw, dict) else None
+    try:
+        item = SyncTask.model_validate(raw)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'item'}: {err['msg']}" for err in e.errors())
+        return None, _result(index, client_id, INVALID, error=errors)
+    if item.client_id is None:
+        # Without a key the item cannot be deduplicated on retry, but it still
+        # needs one to be matched back to its inserted row.
+        item.client_id = uuid.uuid4().hex
+    return item, None
+
+
+def insert_tasks(db, user_id: int, rows: dict):
+    """
+    Insert task rows keyed by client_id with one multi-row INSERT, skipping
+    client_ids the user already has. Returns ({client_id: new task id},
+    {client_id: id of the existing task}). The caller records analytics,
+    bumps page versions and commits.
+    """
+    table = Task.__table__
+    # One block of change sequence values for all rows (see application.changes)
+    first_seq = changes.reserve_change_seqs(db, user_id, len(rows))
+    for offset, row in enumerate(rows.values()):
+        row["change_seq"] = first_seq + offset
+    stmt = (
+        dialect_insert(db, table)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=["user_id", "client_id"])
+        .returning(table.c.id, table.c.client_id)
+    )
+    inserted = {client_id: task_id for task_id, client_id in db.execute(stmt)}
+    existing = {}
+    missing = [client_id for client_id in rows if client_id not in inserted]
+    if missing:
+        existing = dict(db.execute(
+            select(table.c.client_id, table.c.id)
+            .where(table.c.user_id == user_id, table.c.client_id.in_(missing))
+        ).all())
+    return inserted, existing
+
+
+def ingest_chunk(db, user_id: int, items) -> list:
+    """
+    Store a chunk of (index, SyncTask) pairs in one statement and commit.
+    Returns one result per item, in input order.
+    """
+    now = datetime.utcnow()
+    results = {}
+    rows = {}
+    for index, item in items:
+        if item.client_id in rows:
+            results[index] = (item.client_id, DUPLICATE)
+            continue
+        created_at = _as_utc(item.created_at, now)
+        rows[item.client_id] = {
+            "user_id": user_id,
+            "client_id": item.client_id,
+            "title": item.title,
+            "description": item.description,
+            "completed": item.completed,
+            "completed_at": now if item.completed else None,
+            "created_at": created_at,
+        }
+        results[index] = (item.client_id, None)
+
+    try:
+        inserted, existing = insert_tasks(db, user_id, rows)
+        created = [(inserted[cid], rows[cid]["created_at"]) for cid in inserted]
+        completed = [(inserted[cid], now) for cid in inserted if rows[cid]["completed"]]
+        analytics.record_events(db, user_id, analytics.TASK_CREATED, created)
+        analytics.record_events(db, user_id, analytics.TASK_COMPLETED, completed)
+        if inserted:
+            page_cache.bump_versions(db, user_ids=[user_id])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.exception("Failed to sync %d offline tasks for user %s", len(rows), user_id)
+        return [_result(index, cid, FAILED, error=type(e).__name__) for index, (cid, _) in results.items()]
+
+    out = []
+    for index, (client_id, status) in results.items():
+        if client_id in inserted and status is None:
+            out.append(_result(index, client_id, CREATED, inserted[client_id]))
+        else:
+            out.append(_result(index, client_id, DUPLICATE, inserted.get(client_id) or existing.get(client_id)))
+    return out
+
+
+async def iter_json_tasks(tasks):
+    for raw in tasks:
+        yield raw
+
+
+async def iter_ndjson(stream):
+    """
+    Yield one decoded value per non-empty line of a byte stream.
+    Lines that are not valid JSON are yielded as the ValueError raised for them.
+    """
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > SYNC_MAX_LINE_BYTES:
+            raise SyncBodyError(f"NDJSON line longer than {SYNC_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+
+async def ingest(db, user_id: int, source, chunk_size: int = None) -> dict:
+    """
+    Validate and store tasks from an async iterator of decoded items,
+    `chunk_size` (default SYNC_CHUNK_SIZE) at a time. Database work runs in the threadpool.
+    """
+    chunk_size = chunk_size or SYNC_CHUNK_SIZE
+    results = []
+    chunk = []
+    index = 0
+    async for raw in source:
+        if isinstance(raw, ValueError):
+            results.append(_result(index, None, INVALID, error=f"invalid JSON: {raw}"))
+        else:
+            item, invalid = validate_item(index, raw)
+            if invalid:
+                results.append(invalid)
+            else:
+                chunk.append((index, item))
+        index += 1
+        if len(chunk) >= chunk_size:
+            results.extend(await run_in_threadpool(ingest_chunk, db, user_id, chunk))
+            chunk = []
+    if chunk:
+        results.extend(await run_in_threadpool(ingest_chunk, db, user_id, chunk))
+
+    results.sort(key=lambda result: result["index"])
+    counts = {status: 0 for status in (CREATED, DUPLICATE, INVALID, FAILED)}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "status": "success" if not counts[INVALID] and not counts[FAILED] else "partial",
+        "synced": counts[CREATED] + counts[DUPLICATE],
+        "created": counts[CREATED],
+        "duplicates": counts[DUPLICATE],
+        "invalid": counts[INVALID],
+        "failed": counts[FAILED],
+        "results": results,
+    }
@@ -1,7 +1,8 @@
 import uuid
-from passlib.context import CryptContext
+from application.passwords import BCRYPT_ROUNDS, context_for
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Synchronous helpers; request handlers should use application.passwords.password_service
+pwd_context = context_for(BCRYPT_ROUNDS)
 
 def hash_password(plain_password: str) -> str:
     return pwd_context.hash(plain_password)
@@ -21,29 +22,36 @@ def generate_referral_link(user_id: int) -> str:
 import json
 import requests
 
-IPFS_API_URL = "http://127.0.0.1:5001/api/v0"
+from application.ipfs import IPFS_API_URL, IPFS_TIMEOUT
+from application.ipfs_cache import content_cache
 
 
 def store_task_on_ipfs(task_data):
-    """Store a task on IPFS and return the hash."""
+    """Store a task on IPFS and return the hash. Async code should use application.ipfs.ipfs_client."""
     file_content = json.dumps(task_data).encode()
     files = {"file": file_content}
 
     try:
-        response = requests.post(f"{IPFS_API_URL}/add", files=files)
+        response = requests.post(f"{IPFS_API_URL}/add", files=files, timeout=IPFS_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("Hash", "")
+        ipfs_hash = response.json().get("Hash", "")
+        if ipfs_hash:
+            content_cache.put(ipfs_hash, file_content)
+        return ipfs_hash
     except requests.exceptions.RequestException as e:
         print(f"IPFS Error: {e}")
         return ""
 
 
 def retrieve_task_from_ipfs(ipfs_hash):
-    """Retrieve task data from IPFS using the given hash."""
-    try:
-        response = requests.get(f"{IPFS_API_URL}/cat?arg={ipfs_hash}")
+    """Retrieve task data from IPFS using the given hash, served from the local cache when possible."""
+    def fetch():
+        response = requests.get(f"{IPFS_API_URL}/cat?arg={ipfs_hash}", timeout=IPFS_TIMEOUT)
         response.raise_for_status()
-        return json.loads(response.text)
+        return response.text.encode()
+
+    try:
+        return json.loads(content_cache.get_or_fetch(ipfs_hash, fetch))
     except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
         print(f"IPFS Retrieval Error: {e}")
         return None
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Benchmark the vectorized habit statistics on synthetic data.
+
+    python benchmarks/habit_stats_benchmark.py [n_users] [habits_per_user] [days]
+
+Generates users with habits started over the window, each done on about
+half of its days, and times application.habit_stats.compute for one nightly
+batch of n_users on a single core.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from application.habit_stats import compute  # noqa: E402
+
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+    rng = np.random.default_rng(42)
+
+    span = days + 29  # rolling windows look back 29 days before the first day
+    habit_rows = np.repeat(np.arange(n_users, dtype=np.int32), per_user)
+    habit_starts = rng.integers(0, span, size=len(habit_rows)).astype(np.int32)
+    lengths = span - habit_starts
+    checkins = rng.random(size=(len(habit_rows), span)) < 0.5
+    checkins &= np.arange(span) >= habit_starts[:, None]
+    habit_index, checkin_offsets = np.nonzero(checkins)
+    checkin_rows = habit_rows[habit_index]
+    origin = 738000
+
+    start = time.perf_counter()
+    stats = compute(n_users, days, origin, checkin_rows, checkin_offsets.astype(np.int32),
+                    habit_rows, habit_starts)
+    elapsed = time.perf_counter() - start
+
+    print(f"users={n_users:,} habits={len(habit_rows):,} checkins={len(checkin_rows):,} "
+          f"(mean {lengths.mean():.0f} days due per habit)")
+    print(f"compute: {elapsed * 1000:.1f}ms ({n_users / elapsed:,.0f} users/s)")
+    print(f"mean 30-day rate today: {stats['rate_30d'][:, -1].mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark task search on a synthetic corpus.
+
+    python benchmarks/search_benchmark.py [n_tasks] [n_users] [n_queries]
+
+Builds a throwaway SQLite database with n_tasks tasks (default 1,000,000)
+whose titles and descriptions draw words from a Zipf-distributed vocabulary,
+spread over n_users users, some lists and shares. The FTS5 index is filled
+by the same triggers the app uses. It then times application.search queries
+for random users with common and rare words, against the LIKE fallback.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_dir = tempfile.mkdtemp(prefix="search-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_dir, 'bench.db')}"
+
+from infrastructure.database import Base, SessionLocal, engine  # noqa: E402
+from application import search  # noqa: E402
+from application.models import Task, TaskList, User, list_shares  # noqa: E402
+
+VOCABULARY = 20_000
+BATCH = 50_000
+
+
+def build(n_tasks: int, n_users: int, rng):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    words = np.array([f"w{i}" for i in range(VOCABULARY)])
+    n_lists = max(1, n_users // 5)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i + 1, "email": f"user{i}@example.com", "password": "x"} for i in range(n_users)
+        ])
+        conn.execute(TaskList.__table__.insert(), [
+            {"id": i + 1, "name": f"List {i}", "owner_id": int(rng.integers(1, n_users + 1))} for i in range(n_lists)
+        ])
+        shares = {(int(rng.integers(1, n_lists + 1)), int(rng.integers(1, n_users + 1))) for _ in range(n_lists * 3)}
+        conn.execute(list_shares.insert(), [
+            {"list_id": list_id, "user_id": user_id, "role": "read"} for list_id, user_id in shares
+        ])
+    start = time.perf_counter()
+    for first in range(0, n_tasks, BATCH):
+        size = min(BATCH, n_tasks - first)
+        ranks = np.minimum(rng.zipf(1.3, size=(size, 12)), VOCABULARY) - 1
+        users = rng.integers(1, n_users + 1, size=size)
+        lists = np.where(rng.random(size) < 0.3, rng.integers(1, n_lists + 1, size=size), 0)
+        rows = [{
+            "title": " ".join(words[ranks[i, :4]]),
+            "description": " ".join(words[ranks[i, 4:]]) if i % 2 else None,
+            "user_id": int(users[i]),
+            "list_id": int(lists[i]) or None,
+            "created_at": now,
+        } for i in range(size)]
+        with engine.begin() as conn:
+            conn.execute(Task.__table__.insert(), rows)
+    return time.perf_counter() - start
+
+
+def time_queries(backend: str, queries, limit: int = 20):
+    db = SessionLocal()
+    timings = []
+    try:
+        for user_id, tokens in queries:
+            start = time.perf_counter()
+            list_ids = db.scalars(search.visible_lists_statement(user_id)).all() if backend == search.FTS5 else None
+            db.scalars(search.search_statement(backend, user_id, tokens, 0, limit, list_ids)).all()
+            timings.append(time.perf_counter() - start)
+    finally:
+        db.close()
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def main():
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    rng = np.random.default_rng(42)
+
+    elapsed = build(n_tasks, n_users, rng)
+    print(f"tasks={n_tasks:,} users={n_users:,} backend={search.backend_for('sqlite')}")
+    print(f"insert with FTS triggers: {elapsed:.1f}s ({n_tasks / elapsed:,.0f} tasks/s)")
+
+    users = rng.integers(1, n_users + 1, size=n_queries)
+    cases = {
+        "common word": [["w0"]] * n_queries,
+        "rare word": [[f"w{rng.integers(1000, VOCABULARY)}"] for _ in range(n_queries)],
+        "two words": [["w1", f"w{rng.integers(2, 50)}"] for _ in range(n_queries)],
+    }
+    for name, tokens in cases.items():
+        queries = list(zip(users.tolist(), tokens))
+        p50, p95 = time_queries(search.FTS5, queries)
+        print(f"fts5 {name:12} p50={p50:7.2f}ms p95={p95:7.2f}ms")
+    like_queries = list(zip(users.tolist(), cases["rare word"]))[:10]
+    p50, p95 = time_queries(search.LIKE, like_queries)
+    print(f"like rare word    p50={p50:7.2f}ms p95={p95:7.2f}ms (fallback, {len(like_queries)} queries)")
+
+
+if __name__ == "__main__":
+    main()
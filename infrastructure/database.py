@@ -1,31 +1,170 @@
 import os
-from sqlalchemy import create_engine
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from infrastructure.replicas import ReplicaSet, RoutingSession
 
 # Load variables from .env
 load_dotenv()
 
 DB_URL = os.getenv("DB_URL", "sqlite:///./tracker.db")
 
-connect_args = {}
+# SQLite: applied to every new connection. WAL lets readers run alongside the
+# single writer, and busy_timeout makes writers wait instead of failing with
+# "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MiB
+}
 
-engine = create_engine(
-    DB_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DB_URL else {}
-)
+# Server databases (Postgres etc.): connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine()/create_async_engine() for `url`."""
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine, url: str):
+    """Install per-connection setup on a (sync) engine."""
+    if is_sqlite(url):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+engine = configure_engine(create_engine(DB_URL, **engine_options(DB_URL)), DB_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def async_url(url: str) -> str:
+    """
+    Map a sync DB_URL onto the matching async driver:
+    sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg.
+    """
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+# Async engine over the same database, for routes that await their queries
+# instead of holding a threadpool thread for the whole round trip.
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL") or async_url(DB_URL)
+async_engine = create_async_engine(ASYNC_DB_URL, **engine_options(ASYNC_DB_URL))
+configure_engine(async_engine.sync_engine, ASYNC_DB_URL)
+# Objects stay usable after commit, since templates render after the route returns
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas: comma-separated URLs of read-only copies of DB_URL.
+# Async replica URLs are derived the same way as ASYNC_DB_URL.
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+# After a request writes, the same browser session reads from the primary for
+# this long, so replication lag never hides its own changes.
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+replicas = ReplicaSet(
+    configure_engine(create_engine(url, **engine_options(url)), url) for url in DB_REPLICA_URLS
+)
+async_replicas = ReplicaSet(
+    configure_engine(create_async_engine(async_url(url), **engine_options(async_url(url))).sync_engine, url)
+    for url in DB_REPLICA_URLS
+)
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, primary=engine, replicas=replicas, autoflush=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=RoutingSession, primary=async_engine.sync_engine, replicas=async_replicas,
+    autoflush=False, expire_on_commit=False,
+)
+
 # Use the new 2.0 style
 Base = declarative_base()
 
+def dialect_insert(db, table):
+    """
+    Return an INSERT construct for the dialect of a session or connection, so callers can
+    use on_conflict_do_nothing()/on_conflict_do_update() on both SQLite and Postgres.
+    """
+    dialect = db.dialect if hasattr(db, "dialect") else db.get_bind().dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def _stick_to_primary(request: Request, db):
+    if db.info.get("wrote") and "session" in request.scope:
+        request.session["db_primary_until"] = time.time() + DB_REPLICA_STICKY_SECONDS
+
+
+def _reads_from_replica(request: Request) -> bool:
+    if "session" not in request.scope:
+        return True
+    return request.session.get("db_primary_until", 0) <= time.time()
+
+
 # Dependency to get DB session
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
     try:
         yield db
+        _stick_to_primary(request, db)
     finally:
         db.close()
 
+# Async dependency for routes declared with `async def`
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        yield db
+        _stick_to_primary(request, db)
+
+# Read-only routes: served by a replica when one is configured and healthy,
+# unless this browser session wrote something in the last few seconds
+def get_read_db(request: Request):
+    db = ReadSessionLocal(read_only=_reads_from_replica(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    async with AsyncReadSessionLocal(read_only=_reads_from_replica(request)) as db:
+        yield db
+
 # Create tables automatically (Demo only; use migrations in production)
 Base.metadata.create_all(bind=engine)
@@ -0,0 +1,124 @@
+"""
+Read-replica routing.
+
+ReplicaSet hands out replica engines round-robin, skipping any replica whose
+last connection attempt failed or was dropped until DB_REPLICA_RETRY_SECONDS
+have passed. When no replica is healthy, reads go to the primary.
+
+RoutingSession is a Session that sends reads to a replica only while it is in
+read-only mode and has not written anything; once it flushes, every later
+statement (including reads of what it just wrote) uses the primary. A read
+that fails on the replica with an OperationalError is retried once on the
+primary, and the rest of the session stays there, so a replica dying under a
+request costs that request a retry rather than an error.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+
+class ReplicaSet:
+    def __init__(self, engines=(), retry_after: float = DB_REPLICA_RETRY_SECONDS):
+        self.engines = list(engines)
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def choose(self):
+        """Next healthy replica engine, or None if there is none."""
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = self.engines[next(self._counter) % len(self.engines)]
+                if self._down_until.get(engine, 0) <= now:
+                    return engine
+        return None
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + self.retry_after
+        logger.warning("Read replica %s marked unhealthy for %ss", engine.url, self.retry_after)
+
+    def is_healthy(self, engine) -> bool:
+        return self._down_until.get(engine, 0) <= time.monotonic()
+
+    def _on_error(self, context):
+        # Connection failures and dropped connections take the replica out of
+        # rotation; ordinary SQL errors do not.
+        if context.connection is None or context.is_disconnect:
+            self.mark_down(context.engine)
+
+
+# session.info["wrote"] records that a session changed something, either by
+# flushing ORM objects or by executing an INSERT/UPDATE/DELETE statement.
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+class RoutingSession(Session):
+    """
+    Session bound to a primary engine that may read from `replicas`.
+    Also usable as the sync_session_class of an AsyncSession.
+    """
+
+    def __init__(self, *args, primary=None, replicas: ReplicaSet = None, read_only: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        self.replicas = replicas or ReplicaSet()
+        self.read_only = read_only
+        self._replica = None
+        self._replica_failed = False
+
+    def reads_from_replica(self, clause=None) -> bool:
+        return self.read_only and not self._replica_failed and not self._flushing \
+            and not self.info.get("wrote") and not isinstance(clause, UpdateBase)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.reads_from_replica(clause):
+            # Stay on one replica for the whole session unless it goes down
+            if self._replica is None or not self.replicas.is_healthy(self._replica):
+                self._replica = self.replicas.choose()
+            if self._replica is not None:
+                return self._replica
+        return self.primary
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _retry_on_primary(orm_execute_state):
+    session = orm_execute_state.session
+    if not session.reads_from_replica(orm_execute_state.statement):
+        return None
+    try:
+        return orm_execute_state.invoke_statement()
+    except OperationalError as e:
+        if session._replica is None:
+            raise
+        logger.warning("Read on replica %s failed, retrying on the primary: %s", session._replica.url, e.orig)
+        session._replica_failed = True
+        return orm_execute_state.invoke_statement()
@@ -2,7 +2,7 @@
 import sys
 import subprocess
 
-COMMANDS = ["run", "test"]
+COMMANDS = ["run", "test", "backfill", "habitstats", "broker", "worker"]
 
 def main():
     if len(sys.argv) < 2:
@@ -13,10 +13,81 @@ def main():
 
     if command == "run":
         # Run the FastAPI app with uvicorn
-        subprocess.run(["uvicorn", "application.main:app", "--host", "0.0.0.0", "--port", "8000"])
+        # permessage-deflate compresses the batched collaboration frames on the wire
+        subprocess.run(["uvicorn", "application.main:app", "--host", "0.0.0.0", "--port", "8000",
+                        "--ws", "wsproto", "--ws-per-message-deflate", "true"])
     elif command == "test":
         # Run pytest
         subprocess.run(["pytest", "--maxfail=1", "--disable-warnings", "-q"])
+    elif command == "backfill":
+        # Rebuild analytics rollups from the event log and existing users/tasks
+        from infrastructure.database import Base, SessionLocal, engine
+        from application.analytics import rebuild_rollups
+
+        Base.metadata.create_all(bind=engine)
+        batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        db = SessionLocal()
+        try:
+            print(rebuild_rollups(db, batch_size=batch_size))
+        finally:
+            db.close()
+    elif command == "habitstats":
+        # Nightly: recompute every user's habit trends into habit_stats_rollups
+        from infrastructure.database import Base, SessionLocal, engine
+        from application.habit_stats import rebuild_habit_stats
+
+        Base.metadata.create_all(bind=engine)
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+        db = SessionLocal()
+        try:
+            print(f"Habit stats written for {rebuild_habit_stats(db, days=days)} users")
+        finally:
+            db.close()
+    elif command == "broker":
+        # Pub/sub relay that lets WebSocket rooms span worker processes (WS_BACKPLANE_URL)
+        import asyncio
+        from application.realtime import serve_broker
+        from monitoring.logging_config import setup_logging
+
+        setup_logging()
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 7800
+        asyncio.run(serve_broker("127.0.0.1", port))
+    elif command == "worker":
+        # Background job workers (application.jobs): python manage.py worker [processes] [job types...]
+        import multiprocessing
+        import signal
+        from infrastructure.database import Base, SessionLocal, engine
+        from application.job_handlers import schedule_recurring
+        from application.jobs import run_worker
+
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            schedule_recurring(db)
+        finally:
+            db.close()
+        processes = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        types = sys.argv[3:] or None
+        if processes == 1:
+            run_worker(types)
+        else:
+            # Children open their own connections
+            engine.dispose()
+            workers = [multiprocessing.Process(target=run_worker, args=(types,)) for _ in range(processes)]
+            for worker in workers:
+                worker.start()
+
+            def stop_workers(signum, frame):
+                for worker in workers:
+                    worker.terminate()  # SIGTERM: each finishes its running jobs
+
+            signal.signal(signal.SIGTERM, stop_workers)
+            try:
+                for worker in workers:
+                    worker.join()
+            except KeyboardInterrupt:
+                for worker in workers:
+                    worker.join()
     else:
         print(f"Unknown command: {command}. Available commands: {COMMANDS}")
 
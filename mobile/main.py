@@ -1,3 +1,6 @@
+import json
+import os
+
 import requests
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen
@@ -34,18 +37,52 @@ class DashboardScreen(Screen):
     user = {}
     tasks = ListProperty([])
     status_message = StringProperty("")
+    changes_cursor = ""  # Cursor of the last change applied to the local store
+    task_store = {}  # Task id -> task, persisted between runs
     
     def on_enter(self):
+        self.load_store()
         self.fetch_tasks()
     
+    def store_path(self):
+        return os.path.join(App.get_running_app().user_data_dir, "tasks.json")
+    
+    def load_store(self):
+        try:
+            with open(self.store_path()) as f:
+                store = json.load(f)
+            self.changes_cursor = store.get("cursor", "")
+            self.task_store = {int(task_id): task for task_id, task in store.get("tasks", {}).items()}
+        except (OSError, ValueError):
+            self.changes_cursor, self.task_store = "", {}
+        self.tasks = sorted(self.task_store.values(), key=lambda task: task["id"])
+    
+    def save_store(self):
+        with open(self.store_path(), "w") as f:
+            json.dump({"cursor": self.changes_cursor, "tasks": self.task_store}, f)
+    
     def fetch_tasks(self):
+        # Delta sync: only tasks changed or deleted since our cursor are sent
         try:
-            response = requests.get(f"{API_BASE_URL}/tasks")
-            if response.status_code == 200:
+            while True:
+                response = requests.get(f"{API_BASE_URL}/tasks/changes", params={"since": self.changes_cursor})
+                if response.status_code == 400:
+                    # The server no longer understands our cursor: start over
+                    self.changes_cursor, self.task_store = "", {}
+                    continue
+                if response.status_code != 200:
+                    self.status_message = "Failed to fetch tasks"
+                    return
                 result = response.json()
-                self.tasks = result.get("tasks", [])
-            else:
-                self.status_message = "Failed to fetch tasks"
+                for task in result["tasks"]:
+                    self.task_store[task["id"]] = task
+                for task_id in result["deleted"]:
+                    self.task_store.pop(task_id, None)
+                self.changes_cursor = result["cursor"]
+                if not result["has_more"]:
+                    break
+            self.save_store()
+            self.tasks = sorted(self.task_store.values(), key=lambda task: task["id"])
         except Exception as e:
             self.status_message = f"Error: {e}"
     
@@ -1,32 +1,77 @@
 // Load localForage from CDN in base.html (see below)
 
+// Tasks are uploaded in chunks as NDJSON; the server answers with a result per
+// task, and only tasks that failed with a retryable error stay queued.
+const SYNC_CHUNK_SIZE = 500;
+
 window.addEventListener('online', syncTasks);
 
-function syncTasks() {
-  localforage.getItem('offlineTasks').then(tasks => {
-    if (tasks && tasks.length > 0) {
-      console.log("Syncing offline tasks...", tasks);
-      fetch('/sync_tasks', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ tasks: tasks })
-      })
-      .then(response => response.json())
-      .then(data => {
-        if (data.status === "success") {
-          localforage.removeItem('offlineTasks');
-          console.log('Offline tasks synced successfully.');
-        }
-      })
-      .catch(err => console.error("Error syncing tasks:", err));
+function newClientId() {
+  if (window.crypto && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function syncChunk(chunk) {
+  return fetch('/sync_tasks', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/x-ndjson'
+    },
+    body: chunk.map(task => JSON.stringify(task)).join('\n')
+  })
+  .then(response => {
+    if (!response.ok) {
+      throw new Error('Sync failed with status ' + response.status);
     }
+    return response.json();
+  })
+  .then(data => {
+    // Keep tasks that failed on the server; drop stored, duplicate and invalid ones
+    const retry = new Set(
+      data.results.filter(result => result.status === 'failed').map(result => result.index)
+    );
+    data.results
+      .filter(result => result.status === 'invalid')
+      .forEach(result => console.warn('Dropping invalid offline task:', result.error));
+    return chunk.filter((task, index) => retry.has(index));
   });
 }
 
+async function syncTasks() {
+  const tasks = await localforage.getItem('offlineTasks');
+  if (!tasks || tasks.length === 0) {
+    return;
+  }
+  console.log("Syncing offline tasks...", tasks.length);
+  let remaining = [];
+  for (let start = 0; start < tasks.length; start += SYNC_CHUNK_SIZE) {
+    const chunk = tasks.slice(start, start + SYNC_CHUNK_SIZE);
+    try {
+      remaining = remaining.concat(await syncChunk(chunk));
+    } catch (err) {
+      // Network or server error: keep this chunk and everything after it
+      console.error("Error syncing tasks:", err);
+      remaining = remaining.concat(tasks.slice(start));
+      break;
+    }
+  }
+  // Tasks saved while the sync was running are kept as well
+  const latest = (await localforage.getItem('offlineTasks')) || [];
+  remaining = remaining.concat(latest.slice(tasks.length));
+  if (remaining.length > 0) {
+    await localforage.setItem('offlineTasks', remaining);
+  } else {
+    await localforage.removeItem('offlineTasks');
+    console.log('Offline tasks synced successfully.');
+  }
+}
+
 // Call this function to save a task offline if the server is unreachable
 function saveTaskOffline(task) {
+  // The client_id lets the server ignore a task it has already stored
+  task.client_id = task.client_id || newClientId();
   localforage.getItem('offlineTasks').then(tasks => {
     tasks = tasks || [];
     tasks.push(task);
@@ -0,0 +1,81 @@
+import contextlib
+import os
+import tempfile
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Run the suite against a throwaway database instead of the checked-in tracker.db,
+# so schema changes and test data never leak into the repository.
+_test_dir = tempfile.mkdtemp(prefix="tracker-tests-")
+os.environ.setdefault("DB_URL", f"sqlite:///{os.path.join(_test_dir, 'test.db')}")
+os.environ.setdefault("IPFS_CACHE_DIR", os.path.join(_test_dir, "ipfs-cache"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from application.main import app  # noqa: E402
+from infrastructure.database import Base, async_engine, engine  # noqa: E402
+import application.models  # noqa: E402,F401  (registers the tables on Base.metadata)
+
+# Test clients are not used as context managers, so the app's startup hook
+# never runs; create the schema up front instead.
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    """A session on a fresh in-memory database with the full schema, for tests that need their own data."""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def count_queries():
+    """
+    Context manager recording the SQL statements run on the sync and async
+    engines inside its block:
+
+        with count_queries() as statements:
+            client.get("/lists")
+        assert len(statements) == 3
+    """
+    @contextlib.contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engines = (engine, async_engine.sync_engine)
+        for target in engines:
+            event.listen(target, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", record)
+
+    return counting
+
+
+@pytest.fixture
+def login():
+    """
+    Factory registering a new user on a fresh client, which stays logged in:
+
+        client, email = login()
+    """
+    def register(prefix: str = "user"):
+        client = TestClient(app)
+        email = f"{prefix}_{uuid.uuid4().hex[:8]}@example.com"
+        client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+        return client, email
+
+    return register
@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from application import analytics, retention
+from application.main import app
+from application.models import DailyRollup, RetentionRollup, Task, User
+
+client = TestClient(app)
+
+
+def _user(db, signed_up_at):
+    user = User(email=f"a_{uuid.uuid4().hex[:8]}@example.com", password="x", created_at=signed_up_at)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_rollups_count_each_user_once_per_day(db):
+    now = datetime.utcnow()
+    user = _user(db, now)
+    analytics.record_event(db, user.id, analytics.SIGNUP, occurred_at=now)
+    analytics.record_event(db, user.id, analytics.LOGIN, occurred_at=now)
+    analytics.record_event(db, user.id, analytics.TASK_COMPLETED, subject_id=1, occurred_at=now)
+    analytics.record_event(db, user.id, analytics.TASK_COMPLETED, subject_id=2, occurred_at=now)
+    db.commit()
+
+    rollup = db.get(DailyRollup, now.date())
+    assert rollup.active_users == 1
+    assert rollup.signups == 1
+    assert rollup.tasks_completed == 2
+    assert analytics.daily_active_users(db, days=7)["DAU"] == 1
+
+
+def test_retention_counts_week_four_activity(db):
+    signup = datetime.utcnow() - timedelta(weeks=6)
+    retained = _user(db, signup)
+    churned = _user(db, signup)
+    for user in (retained, churned):
+        analytics.record_event(db, user.id, analytics.SIGNUP, occurred_at=signup)
+    analytics.record_event(db, retained.id, analytics.LOGIN, occurred_at=signup + timedelta(weeks=4))
+    analytics.record_event(db, retained.id, analytics.LOGIN, occurred_at=signup + timedelta(weeks=4))
+    db.commit()
+
+    report = analytics.four_week_retention(db)
+    assert report["4_week_retention_percentage"] == 50.0
+    cohort = report["cohorts"][0]
+    assert cohort["size"] == 2
+    assert cohort["retention"][0] == 100.0
+    assert cohort["retention"][4] == 50.0
+
+
+def test_rebuild_rollups_matches_incremental(db):
+    start = datetime.utcnow() - timedelta(days=10)
+    user = _user(db, start)
+    db.add_all([
+        Task(title="old", user_id=user.id, created_at=start, completed=True),
+        Task(title="new", user_id=user.id, created_at=start + timedelta(days=3)),
+    ])
+    db.commit()
+    analytics.record_event(db, user.id, analytics.LOGIN, occurred_at=start + timedelta(days=5))
+    db.commit()
+
+    result = analytics.rebuild_rollups(db, batch_size=2)
+    assert (result["seeded"], result["replayed"]) == (4, 5)
+    assert db.get(DailyRollup, start.date()).tasks_completed == 1
+    assert db.scalar(select(RetentionRollup.active_users).where(RetentionRollup.week_offset == 0)) == 1
+
+    # Seeding is idempotent
+    assert analytics.rebuild_rollups(db)["seeded"] == 0
+
+
+def test_failed_rebuild_keeps_the_old_rollups(db, monkeypatch):
+    start = datetime.utcnow() - timedelta(days=2)
+    user = _user(db, start)
+    analytics.record_event(db, user.id, analytics.LOGIN, occurred_at=start)
+    db.commit()
+    analytics.rebuild_rollups(db)
+    before = db.get(DailyRollup, start.date()).active_users
+
+    applied = []
+
+    def apply_then_fail(*args, **kwargs):
+        if applied:
+            raise RuntimeError("interrupted")
+        applied.append(args)
+        return original(*args, **kwargs)
+
+    original = analytics.apply_event
+    monkeypatch.setattr(analytics, "apply_event", apply_then_fail)
+    with pytest.raises(RuntimeError):
+        analytics.rebuild_rollups(db, batch_size=1)
+    db.expire_all()
+    assert db.get(DailyRollup, start.date()).active_users == before
+
+
+def test_cohort_matrix_from_arrays():
+    monday = datetime(2025, 1, 6).toordinal()
+    signup_days = np.array([monday, monday + 2, monday + 7])
+    user_rows = np.array([0, 0, 1, 2, 2])
+    activity_days = np.array([monday + 7, monday + 29, monday - 3, monday + 8, monday + 14])
+
+    weeks, counts = retention.cohort_matrix(signup_days, user_rows, activity_days, weeks=4)
+
+    assert [retention.week_date(week).isoformat() for week in weeks] == ["2025-01-06", "2025-01-13"]
+    assert counts.tolist() == [[2, 1, 0, 0, 1], [1, 1, 0, 0, 0]]
+
+
+def test_vectorized_rebuild_matches_incremental_retention(db):
+    signup = datetime.utcnow() - timedelta(weeks=5)
+    users = [_user(db, signup + timedelta(days=i)) for i in range(4)]
+    for i, user in enumerate(users):
+        analytics.record_event(db, user.id, analytics.SIGNUP, occurred_at=user.created_at)
+        for week in range(1, i + 2):
+            analytics.record_event(db, user.id, analytics.LOGIN, occurred_at=user.created_at + timedelta(weeks=week))
+    db.commit()
+    incremental = analytics.four_week_retention(db)
+
+    analytics.rebuild_retention_rollups(db, batch_size=3)
+    assert analytics.four_week_retention(db) == incremental
+
+
+def test_analytics_endpoints_report_real_counts():
+    email = f"metrics_{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+    client.post("/create_task", data={"title": "Count me"}, follow_redirects=False)
+
+    dau = client.get("/analytics/dau?days=7").json()
+    assert dau["DAU"] >= 1
+    assert len(dau["days"]) == 7
+
+    tasks = client.get("/analytics/tasks_per_day").json()
+    assert "tasks_completed_per_day" in tasks
+
+    retention = client.get("/analytics/retention").json()
+    assert retention["cohorts"][-1]["size"] >= 1
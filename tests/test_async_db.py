@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from application.main import app
+from infrastructure.database import async_engine, async_url, engine
+
+client = TestClient(app)
+
+
+def test_async_url_maps_drivers():
+    assert async_url("sqlite:///./tracker.db") == "sqlite+aiosqlite:///./tracker.db"
+    assert async_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+    assert async_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert async_url("mysql+aiomysql://u:p@db/app") == "mysql+aiomysql://u:p@db/app"
+
+
+def test_json_routes_use_async_engine():
+    email = f"async_{uuid.uuid4().hex[:8]}@example.com"
+    user_id = client.post("/users", json={"email": email, "password": "secret"}).json()["id"]
+
+    sync_statements, async_statements = [], []
+
+    def on_sync(conn, cursor, statement, *args):
+        sync_statements.append(statement)
+
+    def on_async(conn, cursor, statement, *args):
+        async_statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_sync)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", on_async)
+    try:
+        task = client.post(f"/users/{user_id}/tasks", json={"title": "Async"}).json()
+        assert client.patch(f"/tasks/{task['id']}").json()["completed"] is True
+        assert client.get(f"/users/{user_id}/tasks").json()[0]["title"] == "Async"
+    finally:
+        event.remove(engine, "before_cursor_execute", on_sync)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", on_async)
+
+    assert async_statements
+    assert not sync_statements
+
+
+def test_concurrent_requests_share_one_event_loop():
+    email = f"async_{uuid.uuid4().hex[:8]}@example.com"
+    user_id = client.post("/users", json={"email": email, "password": "secret"}).json()["id"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get(f"/users/{user_id}") for _ in range(20)))
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 20
+    assert {r.json()["email"] for r in responses} == {email}
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from application import blockchain
+from application.main import app
+
+client = TestClient(app)
+
+# Generous enough for slow CI machines; a blocking node connection would blow it
+IMPORT_BUDGET_SECONDS = 5.0
+
+IMPORT_SCRIPT = """
+import sys, time
+
+class BlockWeb3:
+    def find_spec(self, name, path=None, target=None):
+        if name == "web3" or name.startswith("web3."):
+            raise ImportError("web3 blocked")
+
+sys.meta_path.insert(0, BlockWeb3())
+start = time.perf_counter()
+import application.main
+print(time.perf_counter() - start, "web3" in sys.modules)
+"""
+
+
+def test_app_imports_within_budget_without_a_node(tmp_path):
+    env = dict(os.environ, BLOCKCHAIN_URL="http://127.0.0.1:9", DB_URL=f"sqlite:///{tmp_path / 'import.db'}")
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=60)
+    assert result.returncode == 0, result.stderr
+    elapsed, web3_loaded = result.stdout.split()[-2:]
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+    assert web3_loaded == "False"
+
+
+def test_health_probe_and_cached_connection(monkeypatch):
+    blockchain.reset_chain()
+    monkeypatch.setattr(blockchain, "_connect", lambda: (_ for _ in ()).throw(
+        blockchain.BlockchainUnavailable("node down")))
+    response = client.get("/health/blockchain")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "detail": "node down"}
+
+    connects = []
+
+    def connect():
+        connects.append(1)
+        return blockchain.Chain(SimpleNamespace(eth=SimpleNamespace(block_number=42)), None)
+
+    monkeypatch.setattr(blockchain, "_connect", connect)
+    assert client.get("/health/blockchain").json() == {"status": "ok", "block": 42}
+    assert client.get("/health/blockchain").status_code == 200
+    assert len(connects) == 1
+    blockchain.reset_chain()
@@ -0,0 +1,99 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from application import bulk
+from application.main import app
+from application.models import Task, TaskList
+from infrastructure.database import SessionLocal
+
+
+def _list(client, name="Bulk list"):
+    name = f"{name} {uuid.uuid4().hex[:6]}"
+    client.post("/lists", data={"name": name}, follow_redirects=False)
+    db = SessionLocal()
+    list_id = db.scalar(select(TaskList.id).where(TaskList.name == name))
+    db.close()
+    return list_id
+
+
+def _list_tasks(list_id):
+    db = SessionLocal()
+    titles = db.scalars(select(Task.title).where(Task.list_id == list_id).order_by(Task.id)).all()
+    db.close()
+    return titles
+
+
+def _create(client, count, **fields):
+    body = {"create": [dict(fields, title=f"Bulk {i}") for i in range(count)]}
+    return [result["task_id"] for result in client.post("/tasks/bulk", json=body).json()["results"]]
+
+
+def test_bulk_create_uses_one_insert(count_queries, login):
+    client, _ = login()
+    list_id = _list(client)
+    body = {"create": [{"title": f"Import {i}", "list_id": list_id if i % 2 else None} for i in range(200)]}
+    body["create"] += [{"title": "Keyed", "client_id": "k1"}, {"title": "Keyed again", "client_id": "k1"}]
+
+    with count_queries() as statements:
+        result = client.post("/tasks/bulk", json=body).json()
+    assert len([s for s in statements if s.startswith("INSERT INTO tasks")]) == 1
+    assert result["status"] == "success" and result["created"] == 201
+    assert [r["index"] for r in result["results"]] == list(range(202))
+    assert result["results"][-1]["status"] == "duplicate"
+    assert result["results"][-1]["task_id"] == result["results"][-2]["task_id"]
+    assert _list_tasks(list_id) == [f"Import {i}" for i in range(1, 200, 2)]
+    assert b"Import 199" in client.get(f"/lists/{list_id}").content
+
+
+def test_bulk_complete_is_set_based(count_queries, login):
+    client, _ = login()
+    few, many = _create(client, 3), _create(client, 60)
+    cursor = client.get("/tasks/changes").json()["cursor"]
+
+    with count_queries() as small:
+        client.post("/tasks/bulk", json={"complete": few})
+    with count_queries() as large:
+        result = client.post("/tasks/bulk", json={"complete": many + [many[0], 999999]}).json()
+    assert len(large) == len(small)
+    assert result["completed"] == 60
+    assert [r["status"] for r in result["results"][-2:]] == ["unchanged", "not_found"]
+
+    db = SessionLocal()
+    task = db.get(Task, many[0])
+    assert task.completed and task.completed_at and task.version == 2
+    db.close()
+    changed = client.get("/tasks/changes", params={"since": cursor}).json()["tasks"]
+    assert {task["id"] for task in changed} == set(few + many)
+
+
+def test_bulk_move_checks_both_lists(login):
+    owner, _ = login()
+    source, target = _list(owner, "Source"), _list(owner, "Target")
+    tasks = _create(owner, 2, list_id=source)
+
+    other, _ = login()
+    readonly = _list(other, "Read only")
+    other.post(f"/lists/{readonly}/share", data={"email": login()[1], "role": "read"}, follow_redirects=False)
+    result = owner.post("/tasks/bulk", json={"move": [
+        {"task_id": tasks[0], "list_id": target},
+        {"task_id": tasks[1], "list_id": readonly},
+        {"task_id": tasks[1], "list_id": None},
+    ]}).json()
+    assert [r["status"] for r in result["results"]] == ["moved", "not_found", "moved"]
+    assert result["status"] == "partial"
+
+    # Someone else cannot move or complete the owner's tasks
+    assert other.post("/tasks/bulk", json={"complete": tasks}).json()["completed"] == 0
+    assert _list_tasks(target) == ["Bulk 0"]
+    assert _list_tasks(source) == []
+    assert b"Bulk 0" in owner.get(f"/lists/{target}").content
+
+
+def test_bulk_limits(monkeypatch, login):
+    client, _ = login()
+    monkeypatch.setattr(bulk, "BULK_MAX_ITEMS", 2)
+    assert client.post("/tasks/bulk", json={"complete": [1, 2, 3]}).status_code == 413
+    assert client.post("/tasks/bulk", json={"create": [{"title": ""}]}).status_code == 422
+    assert TestClient(app).post("/tasks/bulk", json={}).status_code == 401
@@ -0,0 +1,161 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from application.chain_jobs import CHAIN_SEND_LEASE, ChainUnavailable, NonceManager, chain_jobs
+from application.jobs import QUEUED, JobWorker
+from application.models import Job, TaskList
+from infrastructure.database import SessionLocal
+
+
+class FakeChain:
+    """In-process stand-in for the web3 client: transactions are mined when the test says so."""
+
+    def __init__(self):
+        self.nonces = NonceManager(lambda address: 7)
+        self.sent = {}
+        self.receipts = {}
+        self.fail_next = False
+        self.fail_with = "insufficient funds"
+        self.down = False
+        self.resyncs = 0
+
+    def send_create_list(self, key, name, description):
+        if self.down:
+            raise ChainUnavailable("node down")
+        if self.fail_next:
+            self.fail_next = False
+            raise ValueError(self.fail_with)
+        nonce = self.nonces.next(key)
+        tx_hash = f"0x{uuid.uuid4().hex}"
+        self.sent[tx_hash] = (name, nonce)
+        return tx_hash
+
+    def receipt_status(self, tx_hash):
+        return self.receipts.get(tx_hash)
+
+    def reset_nonces(self):
+        self.resyncs += 1
+        self.nonces.reset()
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(chain_jobs, "_private_key", "0xkey")
+    monkeypatch.setattr(chain_jobs, "_client", fake)
+    return fake
+
+
+def _create(client, name):
+    response = client.post("/lists/dapp", data={"name": name}, follow_redirects=False)
+    assert response.status_code == 302
+    db = SessionLocal()
+    list_id = db.scalar(select(TaskList.id).where(TaskList.name == name))
+    db.close()
+    return list_id
+
+
+def test_nonce_manager_counts_locally_and_resyncs():
+    fetches = []
+    nonces = NonceManager(lambda address: fetches.append(address) or 3)
+    assert [nonces.next("0xa") for _ in range(3)] == [3, 4, 5]
+    nonces.reset("0xa")
+    assert nonces.next("0xa") == 3
+    assert fetches == ["0xa", "0xa"]
+
+
+def test_dapp_list_is_sent_in_the_background(chain, login):
+    client, _ = login()
+    names = [f"Chain {uuid.uuid4().hex[:6]}" for _ in range(3)]
+    list_ids = [_create(client, name) for name in names]
+    assert not chain.sent  # the requests did not touch the chain
+    assert client.get(f"/lists/{list_ids[0]}/chain").json()["status"] == "queued"
+
+    chain_jobs.run_once()
+    statuses = [client.get(f"/lists/{list_id}/chain").json() for list_id in list_ids]
+    assert [s["status"] for s in statuses] == ["pending"] * 3
+    # All three in flight at once, with consecutive nonces
+    assert sorted(chain.sent[s["tx_hash"]][1] for s in statuses) == [7, 8, 9]
+
+    chain.receipts[statuses[0]["tx_hash"]] = 1
+    chain.receipts[statuses[1]["tx_hash"]] = 0
+    chain_jobs.run_once()
+    after = [client.get(f"/lists/{list_id}/chain").json() for list_id in list_ids]
+    assert [s["status"] for s in after] == ["confirmed", "failed", "pending"]
+    assert after[1]["error"] == "Transaction reverted"
+
+
+def test_failed_send_is_recorded(chain, login):
+    client, _ = login()
+    list_id = _create(client, f"Chain {uuid.uuid4().hex[:6]}")
+    chain.fail_next = True
+    chain_jobs.run_once()
+    status = client.get(f"/lists/{list_id}/chain").json()
+    assert status["status"] == "failed" and status["error"] == "insufficient funds"
+
+
+def test_lists_stay_queued_while_the_node_is_down(chain, login):
+    client, _ = login()
+    list_id = _create(client, f"Chain {uuid.uuid4().hex[:6]}")
+    chain.down = True
+    chain_jobs.run_once()
+    assert client.get(f"/lists/{list_id}/chain").json()["status"] == "queued"
+
+    chain.down = False
+    chain_jobs.run_once()
+    assert client.get(f"/lists/{list_id}/chain").json()["status"] == "pending"
+
+
+def test_nonce_errors_leave_the_list_queued_and_resync(chain, login):
+    client, _ = login()
+    list_id = _create(client, f"Chain {uuid.uuid4().hex[:6]}")
+    chain.fail_next, chain.fail_with = True, "nonce too low"
+    chain_jobs.run_once()
+    status = client.get(f"/lists/{list_id}/chain").json()
+    assert status["status"] == "queued" and status["error"] is None
+
+    resyncs = chain.resyncs
+    chain_jobs.run_once()
+    assert client.get(f"/lists/{list_id}/chain").json()["status"] == "pending"
+    assert chain.resyncs == resyncs + 1
+
+
+def test_lists_left_sending_are_requeued_after_the_lease(chain, login):
+    client, _ = login()
+    list_id = _create(client, f"Chain {uuid.uuid4().hex[:6]}")
+    db = SessionLocal()
+    task_list = db.get(TaskList, list_id)
+    task_list.chain_status = "sending"
+    task_list.chain_claimed_at = datetime.utcnow() - timedelta(seconds=CHAIN_SEND_LEASE + 1)
+    db.commit()
+    assert chain_jobs.outstanding(db) >= 1
+    db.close()
+
+    chain_jobs.run_once()
+    assert client.get(f"/lists/{list_id}/chain").json()["status"] == "pending"
+
+
+def test_chain_status_needs_read_access(chain, login):
+    list_id = _create(login()[0], f"Chain {uuid.uuid4().hex[:6]}")
+    assert login()[0].get(f"/lists/{list_id}/chain").status_code == 403
+    assert login()[0].get("/lists/999999/chain").status_code == 404
+
+
+def test_dapp_list_queues_a_chain_sync_job(chain, login):
+    client, _ = login()
+    list_id = _create(client, f"Chain {uuid.uuid4().hex[:6]}")
+    db = SessionLocal()
+    queued = db.scalars(select(Job).where(Job.dedupe_key == "chain.sync", Job.status == QUEUED)).all()
+    db.close()
+    assert len(queued) == 1
+
+    JobWorker(types=["chain.sync"]).run_until_idle()
+    assert client.get(f"/lists/{list_id}/chain").json()["status"] == "pending"
+    # Polls again for the receipt
+    db = SessionLocal()
+    again = db.scalars(select(Job).where(Job.dedupe_key == "chain.sync", Job.status == QUEUED)).one()
+    db.close()
+    assert again.run_at > datetime.utcnow()
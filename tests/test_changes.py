@@ -0,0 +1,86 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from application import changes
+from application.main import app
+from application.models import ChangeSequence, Task
+from infrastructure.database import Base, SessionLocal
+
+
+def _create(client, *titles):
+    for title in titles:
+        client.post("/create_task", data={"title": title}, follow_redirects=False)
+
+
+def test_full_sync_then_deltas(login):
+    client, _ = login()
+    _create(client, "One", "Two")
+    first = client.get("/tasks/changes").json()
+    assert [task["title"] for task in first["tasks"]] == ["One", "Two"]
+    assert first["deleted"] == [] and first["has_more"] is False
+
+    empty = client.get("/tasks/changes", params={"since": first["cursor"]}).json()
+    assert empty["tasks"] == [] and empty["cursor"] == first["cursor"]
+
+    one, two = first["tasks"]
+    client.patch(f"/tasks/{two['id']}")
+    assert client.delete(f"/tasks/{one['id']}").status_code == 204
+    delta = client.get("/tasks/changes", params={"since": first["cursor"]}).json()
+    assert [(task["id"], task["completed"]) for task in delta["tasks"]] == [(two["id"], True)]
+    assert delta["deleted"] == [one["id"]]
+
+
+def test_changes_are_paged_in_sequence_order(login):
+    client, _ = login()
+    _create(client, "A", "B", "C")
+    seen, cursor = [], ""
+    while True:
+        page = client.get("/tasks/changes", params={"since": cursor, "limit": 2}).json()
+        seen += [task["title"] for task in page["tasks"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert seen == ["A", "B", "C"]
+
+
+def test_changes_are_per_user_and_validated(login):
+    owner, _ = login()
+    _create(owner, "Mine")
+    task_id = owner.get("/tasks/changes").json()["tasks"][0]["id"]
+
+    other, _ = login()
+    assert other.get("/tasks/changes").json()["tasks"] == []
+    assert other.delete(f"/tasks/{task_id}").status_code == 404
+    assert other.get("/tasks/changes", params={"since": "not-a-cursor"}).status_code == 400
+    assert TestClient(app).get("/tasks/changes").status_code == 401
+
+
+def test_sync_ingest_assigns_change_seqs(login):
+    client, _ = login()
+    body = "\n".join(json.dumps({"title": f"Offline {i}", "client_id": uuid.uuid4().hex}) for i in range(3))
+    response = client.post("/sync_tasks", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    tasks = client.get("/tasks/changes").json()["tasks"]
+    assert len(tasks) == 3
+
+    db = SessionLocal()
+    seqs = [db.get(Task, task["id"]).change_seq for task in tasks]
+    db.close()
+    assert len(set(seqs)) == 3 and 0 not in seqs
+
+
+def test_sequences_are_per_user_and_continue_the_shared_one(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'seq.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(ChangeSequence(name=changes.TASKS_SEQUENCE, value=40))
+    db.flush()
+    assert changes.reserve_change_seqs(db, 1, 3) == 41
+    assert changes.reserve_change_seqs(db, 2) == 41
+    assert changes.reserve_change_seqs(db, 1) == 44
+    db.close()
+    engine.dispose()
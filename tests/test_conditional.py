@@ -0,0 +1,92 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from application import analytics
+from application.main import app
+from application.models import Task, User
+from infrastructure.database import SessionLocal, engine
+
+client = TestClient(app)
+
+
+def _user():
+    email = f"etag_{uuid.uuid4().hex[:8]}@example.com"
+    return client.post("/users", json={"email": email, "password": "secret"}).json()["id"]
+
+
+def test_user_etag_and_last_modified():
+    user_id = _user()
+    response = client.get(f"/users/{user_id}")
+    etag = response.headers["ETag"]
+    assert etag.startswith('"')
+    assert response.headers["Last-Modified"].endswith("GMT")
+
+    assert client.get(f"/users/{user_id}", headers={"If-None-Match": etag}).status_code == 304
+    since = client.get(f"/users/{user_id}", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+    db = SessionLocal()
+    user = db.get(User, user_id)
+    user.is_verified = True
+    db.commit()
+    assert user.version == 2
+    db.close()
+
+    changed = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_task_page_etag_changes_with_task_versions():
+    user_id = _user()
+    task = client.post(f"/users/{user_id}/tasks", json={"title": "Poll me"}).json()
+    first = client.get(f"/users/{user_id}/tasks")
+    etag = first.headers["ETag"]
+
+    cached = client.get(f"/users/{user_id}/tasks", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    client.patch(f"/tasks/{task['id']}")
+    after_update = client.get(f"/users/{user_id}/tasks", headers={"If-None-Match": etag})
+    assert after_update.status_code == 200
+    assert after_update.json()[0]["completed"] is True
+
+    client.post(f"/users/{user_id}/tasks", json={"title": "Another"})
+    assert client.get(f"/users/{user_id}/tasks", headers={"If-None-Match": after_update.headers["ETag"]}).status_code == 200
+
+
+def test_task_page_is_validated_by_etag_only():
+    user_id = _user()
+    kept = client.post(f"/users/{user_id}/tasks", json={"title": "Keep"}).json()
+    gone = client.post(f"/users/{user_id}/tasks", json={"title": "Delete me"}).json()
+    first = client.get(f"/users/{user_id}/tasks")
+    assert "Last-Modified" not in first.headers
+
+    db = SessionLocal()
+    db.delete(db.get(Task, gone["id"]))
+    db.commit()
+    db.close()
+    after_delete = client.get(f"/users/{user_id}/tasks", headers={"If-None-Match": first.headers["ETag"]})
+    assert after_delete.status_code == 200
+    assert [task["id"] for task in after_delete.json()] == [kept["id"]]
+
+
+def test_concurrent_task_write_returns_conflict(monkeypatch):
+    user_id = _user()
+    task = client.post(f"/users/{user_id}/tasks", json={"title": "Raced"}).json()
+    record_event = analytics.record_event
+
+    def record_after_another_write(db, *args, **kwargs):
+        # Another request completes the task between this one's read and its commit
+        with engine.begin() as conn:
+            conn.execute(update(Task).where(Task.id == task["id"]).values(version=Task.version + 1))
+        monkeypatch.setattr(analytics, "record_event", record_event)
+        return record_event(db, *args, **kwargs)
+
+    monkeypatch.setattr(analytics, "record_event", record_after_another_write)
+    assert client.patch(f"/tasks/{task['id']}").status_code == 409
+    assert client.patch(f"/tasks/{task['id']}").json()["completed"] is True
@@ -0,0 +1,44 @@
+import asyncio
+
+from sqlalchemy import text
+
+from infrastructure import database
+from infrastructure.database import async_engine, engine, engine_options
+
+
+def _pragmas(conn):
+    return {
+        name: conn.execute(text(f"PRAGMA {name}")).scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size")
+    }
+
+
+EXPECTED = {
+    "journal_mode": "wal",
+    "synchronous": 1,  # NORMAL
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -65536,
+}
+
+
+def test_sqlite_connections_get_pragmas():
+    with engine.connect() as conn:
+        assert _pragmas(conn) == EXPECTED
+
+
+def test_async_sqlite_connections_get_pragmas():
+    async def run():
+        async with async_engine.connect() as conn:
+            return await conn.run_sync(_pragmas)
+
+    assert asyncio.run(run()) == EXPECTED
+
+
+def test_server_databases_get_pool_settings(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 3)
+    options = engine_options("postgresql://u:p@db/app")
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == 1800
+    assert engine_options("sqlite:///x.db") == {"connect_args": {"check_same_thread": False}}
@@ -0,0 +1,108 @@
+import json
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from application import habit_stats, habits
+from application.main import app
+from application.models import Habit, HabitStatsRollup, User
+
+END = date(2025, 3, 30)  # a Sunday
+
+
+def _habit(db, user_id, start, done_days):
+    habit = Habit(user_id=user_id, name="h", start_day=start, current_streak=0, longest_streak=0,
+                  total_completions=0, completion_bits=b"")
+    db.add(habit)
+    db.flush()
+    for day in done_days:
+        habits.check_in(db, habit, day)
+    db.commit()
+    return habit
+
+
+def _user(db):
+    user = User(email=f"s_{uuid.uuid4().hex[:8]}@example.com", password="x")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def test_matrices_and_rolling_rates():
+    # Two users over 10 days; user 1 has one habit from day 0, user 0 two habits from day 5
+    done, due = habit_stats.daily_matrices(
+        2, 10,
+        checkin_rows=np.array([1, 1, 1, 0, 0, 0], dtype=np.int32),
+        checkin_offsets=np.array([0, 1, 9, 5, 5, 12], dtype=np.int32),
+        habit_rows=np.array([1, 0, 0], dtype=np.int32),
+        habit_start_offsets=np.array([-3, 5, 5], dtype=np.int32),
+    )
+    assert done[1].tolist() == [1, 1, 0, 0, 0, 0, 0, 0, 0, 1]
+    assert done[0].tolist() == [0, 0, 0, 0, 0, 2, 0, 0, 0, 0]
+    assert due[0].tolist() == [0] * 5 + [2] * 5 and due[1].tolist() == [1] * 10
+    rolling = habit_stats.rolling_sum(done, 3)
+    assert rolling[1].tolist() == [1, 2, 2, 1, 0, 0, 0, 0, 0, 1]
+    assert habit_stats.rates(rolling, habit_stats.rolling_sum(due, 3))[0, 6] == 0.5
+    # Ordinal 1 is a Monday
+    assert habit_stats.weekday_totals(done, origin=1)[1].tolist() == [1, 1, 1, 0, 0, 0, 0]
+
+
+def test_user_stats_covers_all_habits(db):
+    user_id = _user(db)
+    start = END - timedelta(days=13)
+    _habit(db, user_id, start, [start + timedelta(days=i) for i in range(14)])
+    _habit(db, user_id, END - timedelta(days=6), [END - timedelta(days=i) for i in (0, 2)])
+
+    stats = habit_stats.user_stats(db, user_id, days=14, end=END)
+    assert stats["start"] == start.isoformat() and stats["habits"] == 2
+    assert stats["heatmap"] == [1] * 7 + [1, 1, 1, 1, 2, 1, 2]
+    assert stats["due"] == [1] * 7 + [2] * 7
+    assert stats["rate_7d"][-1] == round(9 / 14, 4)
+    assert stats["rate_30d"][-1] == round(16 / 21, 4)
+    sunday = stats["weekdays"][6]
+    assert (sunday["weekday"], sunday["completed"], sunday["due"]) == ("Sun", 3, 3)
+
+
+def test_nightly_batch_matches_user_stats(db):
+    users = [_user(db) for _ in range(5)]
+    rng = np.random.default_rng(7)
+    for user_id in users[:4]:
+        for _ in range(2):
+            start = END - timedelta(days=int(rng.integers(0, 60)))
+            span = (END - start).days + 1
+            done = sorted({start + timedelta(days=int(d)) for d in rng.integers(0, span, size=span // 2)})
+            _habit(db, user_id, start, done)
+
+    assert habit_stats.rebuild_habit_stats(db, days=60, end=END, batch_size=3) == 4
+    for user_id in users[:4]:
+        rollup = db.get(HabitStatsRollup, user_id)
+        single = habit_stats.user_stats(db, user_id, days=60, end=END)
+        assert rollup.computed_for == END and rollup.habits == 2
+        assert rollup.rate_7d == single["rate_7d"][-1] and rollup.rate_30d == single["rate_30d"][-1]
+        assert rollup.completions_30d == sum(single["heatmap"][-30:])
+        assert json.loads(rollup.weekday_rates) == [day["rate"] for day in single["weekdays"]]
+    assert db.get(HabitStatsRollup, users[4]) is None
+    # Rerunning updates in place
+    assert habit_stats.rebuild_habit_stats(db, days=60, end=END) == 4
+
+
+def test_batch_can_leave_commit_to_the_caller(db):
+    user_id = _user(db)
+    _habit(db, user_id, END, [END])
+    assert habit_stats.rebuild_habit_stats(db, days=7, end=END, batch_size=1, commit=False) == 1
+    db.rollback()
+    assert db.get(HabitStatsRollup, user_id) is None
+
+
+def test_habit_stats_endpoint():
+    client = TestClient(app)
+    email = f"stats_{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+    habit_id = client.post("/habits", json={"name": "Run"}).json()["id"]
+    client.post(f"/habits/{habit_id}/checkins")
+
+    stats = client.get("/analytics/habits", params={"days": 30}).json()
+    assert len(stats["heatmap"]) == 30 and stats["heatmap"][-1] == 1
+    assert stats["rate_7d"][-1] == 1.0 and stats["habits"] == 1
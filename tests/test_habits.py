@@ -0,0 +1,116 @@
+import base64
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+
+from application import habits
+from application.models import Habit, HabitCheckIn
+from infrastructure.database import SessionLocal
+
+
+class _Log(list):
+    """Stands in for the session: check_in() only adds the log row."""
+    add = list.append
+
+
+def _habit(start=date(2024, 1, 1)):
+    return Habit(id=1, user_id=1, name="Read", start_day=start, current_streak=0,
+                 longest_streak=0, total_completions=0, completion_bits=b"")
+
+
+def _streak_from_bits(habit):
+    offset = (habit.last_completed_day - habit.start_day).days
+    return habits.run_before(habit.completion_bits, offset) + 1
+
+
+def test_in_order_check_ins_extend_and_reset_the_streak():
+    habit, log = _habit(), _Log()
+    for offset in [0, 1, 2, 5, 6]:
+        assert habits.check_in(log, habit, habit.start_day + timedelta(days=offset))
+    assert (habit.current_streak, habit.longest_streak, habit.total_completions) == (2, 3, 5)
+    assert habit.last_completed_day == date(2024, 1, 7)
+    assert [row.day.day for row in log] == [1, 2, 3, 6, 7]
+    # Checking in a day twice changes nothing
+    assert not habits.check_in(log, habit, date(2024, 1, 7))
+    assert habit.total_completions == 5 and len(log) == 5
+
+
+def test_backfill_merges_runs():
+    habit, log = _habit(), _Log()
+    days = [d for d in range(20) if d != 9]
+    for offset in days:
+        habits.check_in(log, habit, habit.start_day + timedelta(days=offset))
+    assert (habit.current_streak, habit.longest_streak) == (10, 10)
+    habits.check_in(log, habit, habit.start_day + timedelta(days=9))
+    assert (habit.current_streak, habit.longest_streak) == (20, 20)
+    assert habit.current_streak == _streak_from_bits(habit)
+
+
+def test_backfill_before_the_current_run_keeps_it():
+    habit, log = _habit(), _Log()
+    for offset in [0, 1, 3, 4, 5]:
+        habits.check_in(log, habit, habit.start_day + timedelta(days=offset))
+    habits.check_in(log, habit, habit.start_day + timedelta(days=7))
+    habits.check_in(log, habit, habit.start_day + timedelta(days=2))
+    assert (habit.current_streak, habit.longest_streak) == (1, 6)
+
+
+def test_bit_runs_cross_byte_boundaries():
+    bits = b""
+    for i in range(3, 30):
+        bits = habits.set_bit(bits, i)
+    assert habits.run_before(bits, 30) == 27
+    assert habits.run_after(bits, 2) == 27
+    assert habits.run_before(bits, 3) == 0 and habits.run_after(bits, 29) == 0
+    assert habits.slice_bits(bits, 2, 4) == bytes([0b1110])
+    assert habits.slice_bits(bits, -2, 6) == bytes([0b100000])
+
+
+def test_summary_expires_the_streak_after_a_missed_day():
+    habit, log = _habit(), _Log()
+    for offset in range(4):
+        habits.check_in(log, habit, habit.start_day + timedelta(days=offset))
+    assert habits.summary(habit, on=date(2024, 1, 5))["current_streak"] == 4
+    stale = habits.summary(habit, on=date(2024, 1, 6))
+    assert stale["current_streak"] == 0 and stale["longest_streak"] == 4
+    assert stale["completion_rate"] == round(4 / 6, 4)
+
+
+def test_habit_api_check_in_and_calendar(login):
+    client, _ = login()
+    created = client.post("/habits", json={"name": "Stretch"})
+    assert created.status_code == 201
+    habit = created.json()
+    assert habit["current_streak"] == 0 and habit["start_day"] == habits.today().isoformat()
+
+    done = client.post(f"/habits/{habit['id']}/checkins").json()
+    assert (done["current_streak"], done["total_completions"], done["done_today"]) == (1, 1, True)
+    again = client.post(f"/habits/{habit['id']}/checkins", json={})
+    assert again.status_code == 200 and again.json()["total_completions"] == 1
+
+    db = SessionLocal()
+    assert db.scalar(select(func.count()).select_from(HabitCheckIn).where(HabitCheckIn.habit_id == habit["id"])) == 1
+    db.close()
+
+    calendar = client.get(f"/habits/{habit['id']}/calendar").json()
+    assert calendar["days"] == 365
+    bits = base64.b64decode(calendar["bits"])
+    assert habits.has_bit(bits, 364) and sum(bin(b).count("1") for b in bits) == 1
+
+    assert [h["name"] for h in client.get("/habits").json()] == ["Stretch"]
+
+
+def test_habit_api_rejects_bad_days_and_other_users(login):
+    client, _ = login()
+    habit_id = client.post("/habits", json={"name": "Walk"}).json()["id"]
+    tomorrow = (habits.today() + timedelta(days=1)).isoformat()
+    assert client.post(f"/habits/{habit_id}/checkins", json={"day": tomorrow}).status_code == 400
+    yesterday = (habits.today() - timedelta(days=1)).isoformat()
+    assert client.post(f"/habits/{habit_id}/checkins", json={"day": yesterday}).status_code == 400  # before start
+    bad_range = {"start": habits.today().isoformat(), "end": yesterday}
+    assert client.get(f"/habits/{habit_id}/calendar", params=bad_range).status_code == 400
+
+    other, _ = login()
+    assert other.post(f"/habits/{habit_id}/checkins").status_code == 404
+    assert other.get(f"/habits/{habit_id}/calendar").status_code == 404
+    assert other.get("/habits").json() == []
@@ -0,0 +1,69 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from application.identity import CurrentUser, UserCache, user_cache
+from application.main import app
+from application.models import User
+from infrastructure.database import SessionLocal, engine
+
+
+def _identity(user_id):
+    return CurrentUser(id=user_id, email=f"{user_id}@example.com", is_admin=False, is_verified=False, created_at=None)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.set(_identity(1))
+    cache.set(_identity(2))
+    cache.get(1)
+    cache.set(_identity(3))
+    assert cache.get(2) is None
+    assert cache.get(1).id == 1
+    assert cache.get(3).id == 3
+
+
+def test_cache_entries_expire():
+    cache = UserCache(maxsize=10, ttl=0.01)
+    cache.set(_identity(1))
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_updating_user_invalidates_cache():
+    db = SessionLocal()
+    user = User(email=f"cache_{uuid.uuid4().hex[:8]}@example.com", password="x")
+    db.add(user)
+    db.commit()
+    user_cache.set(CurrentUser.from_user(user))
+
+    user.is_verified = True
+    db.commit()
+    assert user_cache.get(user.id) is None
+    db.close()
+
+
+def test_authenticated_requests_skip_user_lookup():
+    client = TestClient(app)
+    email = f"cached_{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+    client.get("/dashboard")
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/dashboard")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert email.encode() in response.content
+    # The dashboard reads users.content_version for its page cache, but never loads the User row
+    assert not [s for s in statements if "FROM users" in s and "users.email" in s]
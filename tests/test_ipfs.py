@@ -1,9 +1,26 @@
+import asyncio
+import hashlib
 import json
+
+import httpx
 import pytest
 import requests
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from application.ipfs import IpfsClient, IpfsError
+from application.ipfs_cache import ContentCache, content_cache
 from application.utils import store_task_on_ipfs, retrieve_task_from_ipfs
 
 
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """The mocked daemon reuses hashes across tests, so start each one uncached."""
+    content_cache.clear()
+
+
 class MockResponse:
     """Mock response object for testing IPFS API."""
     def __init__(self, json_data, status_code):
@@ -85,3 +102,140 @@ def test_retrieve_task_from_ipfs_failure(monkeypatch):
     ipfs_hash = "QmInvalidHash"
     task_data = retrieve_task_from_ipfs(ipfs_hash)
     assert task_data is None
+
+
+# ----------------------------
+# Async client against a fake IPFS HTTP API
+# ----------------------------
+
+class FakeIpfs:
+    """In-memory IPFS API: /add (with directory wrapping) and /cat."""
+
+    def __init__(self, failures=0, delay=0):
+        self.objects = {}
+        self.requests = []
+        self.failures = failures
+        self.delay = delay
+        self.in_flight = self.max_in_flight = 0
+        self.app = Starlette(routes=[
+            Route("/api/v0/add", self.add, methods=["POST"]),
+            Route("/api/v0/cat", self.cat, methods=["POST"]),
+        ])
+
+    async def add(self, request: Request):
+        self.requests.append(request.url.path)
+        if self.failures:
+            self.failures -= 1
+            return Response(status_code=503)
+        form = await request.form()
+        lines = []
+        for upload in form.getlist("file"):
+            content = await upload.read()
+            ipfs_hash = "Qm" + hashlib.sha256(content).hexdigest()[:20]
+            self.objects[ipfs_hash] = content
+            lines.append(json.dumps({"Name": upload.filename, "Hash": ipfs_hash}))
+        lines.append(json.dumps({"Name": "", "Hash": "QmDirectory"}))
+        return Response("\n".join(lines), media_type="application/json")
+
+    async def cat(self, request: Request):
+        self.requests.append(request.url.path)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        content = self.objects.get(request.query_params["arg"])
+        return Response(content, status_code=200 if content is not None else 500)
+
+    def client(self, **kwargs):
+        kwargs.setdefault("backoff", 0)
+        return IpfsClient(base_url="http://ipfs/api/v0", transport=httpx.ASGITransport(app=self.app), **kwargs)
+
+
+def test_add_many_pins_a_batch_in_one_request():
+    fake = FakeIpfs()
+    tasks = [{"title": f"Task {i}"} for i in range(5)]
+
+    async def run():
+        client = fake.client()
+        hashes = await client.add_many(tasks)
+        restored = await client.cat_many(hashes)
+        await client.aclose()
+        return hashes, restored
+
+    hashes, restored = asyncio.run(run())
+    assert fake.requests.count("/api/v0/add") == 1
+    assert len(set(hashes)) == 5
+    assert restored == tasks
+
+
+def test_add_many_splits_large_batches():
+    fake = FakeIpfs()
+
+    async def run():
+        client = fake.client(batch_size=2)
+        hashes = await client.add_many([{"n": i} for i in range(5)])
+        await client.aclose()
+        return hashes
+
+    assert len(asyncio.run(run())) == 5
+    assert fake.requests.count("/api/v0/add") == 3
+
+
+def test_retries_transient_errors_then_gives_up():
+    fake = FakeIpfs(failures=2)
+
+    async def run(client):
+        try:
+            return await client.add_json({"title": "Retry"})
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run(fake.client(retries=2))).startswith("Qm")
+    assert len(fake.requests) == 3
+
+    fake.failures = 5
+    with pytest.raises(IpfsError):
+        asyncio.run(run(fake.client(retries=1)))
+
+
+def test_concurrency_is_bounded():
+    fake = FakeIpfs(delay=0.01)
+
+    async def run():
+        client = fake.client(max_concurrency=3)
+        hashes = await client.add_many([{"n": i} for i in range(10)])
+        await client.cat_many(hashes)
+        await client.aclose()
+
+    asyncio.run(run())
+    assert fake.max_in_flight == 3
+
+
+def test_cat_is_cached_and_deduplicated(tmp_path):
+    fake = FakeIpfs(delay=0.01)
+
+    async def run():
+        client = fake.client(cache=ContentCache(directory=str(tmp_path)))
+        [ipfs_hash] = await client.add_many([{"title": "Popular"}])
+        client.cache.clear()
+        first = await client.cat_many([ipfs_hash] * 10)
+        again = await client.cat_json(ipfs_hash)
+        await client.aclose()
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == [{"title": "Popular"}] * 10 and again == {"title": "Popular"}
+    assert fake.requests.count("/api/v0/cat") == 1
+
+
+def test_retrieve_uses_cache(monkeypatch):
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(args)
+        return MockResponse({"title": "Cached"}, 200)
+
+    monkeypatch.setattr(requests, "get", mock_get)
+    assert retrieve_task_from_ipfs("QmCachedHash123") == {"title": "Cached"}
+    assert retrieve_task_from_ipfs("QmCachedHash123") == {"title": "Cached"}
+    assert len(calls) == 1
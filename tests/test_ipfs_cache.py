@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from application.ipfs_cache import ContentCache
+
+
+def test_memory_tier_is_an_lru(tmp_path):
+    cache = ContentCache(directory=str(tmp_path), memory_bytes=10, memory_entry_bytes=6)
+    cache.put("QmAAAAAAAA", b"aaaa")
+    cache.put("QmBBBBBBBB", b"bbbb")
+    cache.get("QmAAAAAAAA")
+    cache.put("QmCCCCCCCC", b"cccc")
+    assert cache.get("QmAAAAAAAA") == b"aaaa"
+    assert cache.memory_hits == 2
+
+    # Evicted from memory but still on disk
+    assert cache.get("QmBBBBBBBB") == b"bbbb"
+    assert cache.disk_hits == 1
+
+
+def test_disk_tier_persists_and_evicts_by_size(tmp_path):
+    cache = ContentCache(directory=str(tmp_path), disk_bytes=10, memory_bytes=0)
+    cache.put("QmAAAAAAAA", b"aaaa")
+    cache.put("QmBBBBBBBB", b"bbbb")
+    cache.get("QmAAAAAAAA")
+    cache.put("QmCCCCCCCC", b"cccc")
+
+    reopened = ContentCache(directory=str(tmp_path), disk_bytes=10, memory_bytes=0)
+    assert reopened.get("QmBBBBBBBB") is None
+    assert reopened.get("QmAAAAAAAA") == b"aaaa"
+    assert reopened.get("QmCCCCCCCC") == b"cccc"
+    assert len(list(tmp_path.rglob("Qm*"))) == 2
+
+
+@pytest.mark.parametrize("cid", ["../../etc/passwd", "Qm/escape00", "short"])
+def test_unsafe_cids_are_not_cached(tmp_path, cid):
+    cache = ContentCache(directory=str(tmp_path))
+    cache.put(cid, b"data")
+    assert cache.get(cid) is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_concurrent_misses_fetch_once(tmp_path):
+    cache = ContentCache(directory=str(tmp_path))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"content"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("QmPopular00", fetch)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"content"] * 8
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    cache = ContentCache(directory=str(tmp_path))
+
+    def fail():
+        raise IOError("daemon down")
+
+    with pytest.raises(IOError):
+        cache.get_or_fetch("QmFailing00", fail)
+    assert cache.get_or_fetch("QmFailing00", lambda: b"ok") == b"ok"
+
+
+def test_disk_reads_do_not_block_memory_hits(tmp_path):
+    cache = ContentCache(directory=str(tmp_path), memory_entry_bytes=4)
+    cache.put("QmSmall000", b"tiny")
+    cache.put("QmLarge000", b"too big for memory")
+    reading, release = threading.Event(), threading.Event()
+    read = cache._read
+
+    def slow_read(cid):
+        reading.set()
+        release.wait(5)
+        return read(cid)
+
+    cache._read = slow_read
+    slow = threading.Thread(target=cache.get, args=("QmLarge000",))
+    slow.start()
+    assert reading.wait(5)
+    started = time.monotonic()
+    assert cache.get("QmSmall000") == b"tiny"
+    assert time.monotonic() - started < 1
+    release.set()
+    slow.join()
+    assert cache.disk_hits == 1
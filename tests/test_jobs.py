@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from application import jobs
+from application.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobWorker, enqueue, job_type
+from application.models import Job
+from infrastructure.database import Base
+
+calls = []
+flaky_failures = {"left": 0}
+release = threading.Event()
+
+
+@job_type("test.echo", concurrency=4)
+def echo(db, value=None):
+    calls.append(value)
+    return {"echo": value}
+
+
+@job_type("test.flaky", max_attempts=2)
+def flaky(db):
+    if flaky_failures["left"]:
+        flaky_failures["left"] -= 1
+        raise RuntimeError("temporary failure")
+    return "ok"
+
+
+@job_type("test.single", concurrency=1, lease=60)
+def single(db):
+    release.wait(5)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    calls.clear()
+    release.clear()
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def _enqueue(session_factory, name, **kwargs):
+    db = session_factory()
+    job = enqueue(db, name, **kwargs)
+    db.commit()
+    db.close()
+    return job
+
+
+def _job(session_factory, job_id):
+    db = session_factory()
+    job = db.get(Job, job_id)
+    db.close()
+    return job
+
+
+def test_jobs_run_by_priority_and_record_results(session_factory):
+    low = _enqueue(session_factory, "test.echo", value="low")
+    high = _enqueue(session_factory, "test.echo", value="high", priority=5)
+    later = _enqueue(session_factory, "test.echo", value="later", delay=3600)
+
+    worker = JobWorker(session_factory=session_factory)
+    assert worker.run_until_idle() == 2
+    assert calls == ["high", "low"]
+    done = _job(session_factory, high.id)
+    assert (done.status, done.result, done.attempts) == (SUCCEEDED, '{"echo": "high"}', 1)
+    assert _job(session_factory, low.id).status == SUCCEEDED
+    assert _job(session_factory, later.id).status == QUEUED
+
+
+def test_failures_are_retried_with_backoff_then_failed(session_factory):
+    flaky_failures["left"] = 1
+    job = _enqueue(session_factory, "test.flaky")
+    worker = JobWorker(session_factory=session_factory)
+    assert worker.execute(worker.claim(1)[0]) == QUEUED
+    retry = _job(session_factory, job.id)
+    assert retry.last_error == "temporary failure" and retry.run_at > datetime.utcnow()
+    assert worker.claim(1) == []  # not due yet
+
+    assert worker.claim(1, now=retry.run_at) == [job.id]
+    assert worker.execute(job.id) == SUCCEEDED
+
+    flaky_failures["left"] = 2
+    job = _enqueue(session_factory, "test.flaky")
+    worker.execute(worker.claim(1)[0])
+    worker.execute(worker.claim(1, now=datetime.utcnow() + timedelta(hours=2))[0])
+    failed = _job(session_factory, job.id)
+    assert (failed.status, failed.attempts) == (FAILED, 2)
+
+
+def test_backoff_grows_and_is_capped():
+    assert 2.5 <= jobs.backoff(1, base=5) <= 5
+    assert 20 <= jobs.backoff(4, base=5) <= 40
+    assert jobs.backoff(30, base=5, cap=60) <= 60
+
+
+def test_concurrency_is_limited_per_type(session_factory):
+    for _ in range(2):
+        _enqueue(session_factory, "test.single")
+    _enqueue(session_factory, "test.echo", value="free")
+    first = JobWorker(session_factory=session_factory, name="a")
+    second = JobWorker(session_factory=session_factory, name="b")
+    assert len(first.claim(5)) == 2  # one test.single and the echo job
+    assert second.claim(5) == []
+
+
+def test_expired_leases_are_requeued(session_factory):
+    job = _enqueue(session_factory, "test.single")
+    worker = JobWorker(session_factory=session_factory)
+    worker.claim(1)
+    assert _job(session_factory, job.id).status == RUNNING
+    db = session_factory()
+    assert jobs.requeue_expired(db, now=datetime.utcnow() + timedelta(minutes=2)) == 1
+    db.close()
+    assert _job(session_factory, job.id).status == QUEUED
+    # The first worker no longer holds the job, so its late result is discarded
+    release.set()
+    assert worker.execute(job.id) == QUEUED
+
+
+def test_dedupe_key_keeps_one_queued_job(session_factory):
+    first = _enqueue(session_factory, "test.echo", delay=60, dedupe_key="echo")
+    assert _enqueue(session_factory, "test.echo", dedupe_key="echo") is None
+    db = session_factory()
+    queued = db.scalars(select(Job).where(Job.dedupe_key == "echo")).all()
+    db.close()
+    assert [job.id for job in queued] == [first.id]
+    assert queued[0].run_at <= datetime.utcnow()
+
+
+def test_unknown_job_type_is_rejected(session_factory):
+    with pytest.raises(ValueError):
+        _enqueue(session_factory, "test.missing")
+
+
+def test_worker_thread_runs_jobs_concurrently(session_factory):
+    worker = JobWorker(session_factory=session_factory, concurrency=4, poll_interval=0.05)
+    worker.start()
+    try:
+        ids = [_enqueue(session_factory, "test.echo", value=i).id for i in range(6)]
+        worker.notify()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if all(_job(session_factory, job_id).status == SUCCEEDED for job_id in ids):
+                break
+            time.sleep(0.05)
+    finally:
+        worker.stop()
+    assert sorted(calls) == list(range(6))
+
+
+def test_nightly_habit_stats_reschedule_themselves(session_factory, monkeypatch):
+    from application import job_handlers
+
+    monkeypatch.setattr(job_handlers, "HABIT_STATS_HOUR", 2)
+    assert job_handlers.next_habit_stats_run(datetime(2025, 3, 1, 1)) == datetime(2025, 3, 1, 2)
+    assert job_handlers.next_habit_stats_run(datetime(2025, 3, 1, 2)) == datetime(2025, 3, 2, 2)
+
+    db = session_factory()
+    job_handlers.schedule_recurring(db)
+    job_handlers.schedule_recurring(db)
+    scheduled = db.scalars(select(Job).where(Job.job_type == "habits.stats")).all()
+    assert len(scheduled) == 1 and scheduled[0].run_at > datetime.utcnow()
+    db.close()
+
+    worker = JobWorker(session_factory=session_factory)
+    worker.execute(worker.claim(1, now=scheduled[0].run_at)[0])
+    db = session_factory()
+    statuses = db.scalars(select(Job.status).where(Job.job_type == "habits.stats").order_by(Job.id)).all()
+    db.close()
+    assert statuses == [SUCCEEDED, QUEUED]
+
+
+def test_dedupe_queues_behind_a_running_job(session_factory):
+    running = _enqueue(session_factory, "test.single", dedupe_key="single")
+    worker = JobWorker(session_factory=session_factory)
+    assert worker.claim(1) == [running.id]
+    behind = _enqueue(session_factory, "test.single", dedupe_key="single")
+    assert behind is not None and _enqueue(session_factory, "test.single", dedupe_key="single") is None
+    # Waits for the running one: the type runs one at a time
+    assert worker.claim(1) == []
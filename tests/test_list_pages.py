@@ -0,0 +1,76 @@
+import uuid
+
+from application.page_cache import page_cache
+from application.models import Task, TaskList, User, list_shares
+from infrastructure.database import SessionLocal
+
+
+def _email(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:8]}@example.com"
+
+
+def _user_id(email):
+    db = SessionLocal()
+    user_id = db.query(User.id).filter(User.email == email).scalar()
+    db.close()
+    return user_id
+
+
+def _add_lists(owner_id, viewer_id, count, tasks_per_list=3, members=2):
+    """Create `count` lists owned by owner_id, each shared with viewer_id and `members` other users."""
+    db = SessionLocal()
+    list_ids = []
+    for _ in range(count):
+        task_list = TaskList(name="Groceries", owner_id=owner_id)
+        db.add(task_list)
+        db.flush()
+        db.add_all(Task(title=f"Item {i}", user_id=owner_id, list_id=task_list.id) for i in range(tasks_per_list))
+        others = [User(email=_email("member"), password="x") for _ in range(members)]
+        db.add_all(others)
+        db.flush()
+        shares = [{"list_id": task_list.id, "user_id": viewer_id, "role": "read"}] if viewer_id != owner_id else []
+        shares += [{"list_id": task_list.id, "user_id": other.id, "role": "read"} for other in others]
+        db.execute(list_shares.insert(), shares)
+        list_ids.append(task_list.id)
+    db.commit()
+    db.close()
+    return list_ids
+
+
+def _measure(client, url, count_queries):
+    client.get(url)  # warm the user cache
+    page_cache.clear()  # measure rendering, not a page cache hit
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements), response
+
+
+def test_lists_page_runs_constant_queries(count_queries, login):
+    client, email = login("pages")
+    user_id, other = _user_id(email), _user_id(login("pages")[1])
+    _add_lists(user_id, user_id, 1)
+    _add_lists(other, user_id, 1)
+    few, _ = _measure(client, "/lists", count_queries)
+
+    _add_lists(user_id, user_id, 5)
+    _add_lists(other, user_id, 5)
+    many, response = _measure(client, "/lists", count_queries)
+
+    assert few == many == 2
+    assert response.text.count("(3 tasks") == 12
+    assert response.text.count("owned by pages_") == 6
+
+
+def test_list_details_page_runs_constant_queries(count_queries, login):
+    client, email = login("pages")
+    user_id = _user_id(email)
+    small = _add_lists(user_id, user_id, 1, tasks_per_list=1, members=1)[0]
+    large = _add_lists(user_id, user_id, 1, tasks_per_list=20, members=8)[0]
+
+    few, _ = _measure(client, f"/lists/{small}", count_queries)
+    many, response = _measure(client, f"/lists/{large}", count_queries)
+
+    assert few == many == 4
+    assert response.text.count("Item ") == 20
+    assert response.text.count("member_") == 8
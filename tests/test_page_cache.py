@@ -0,0 +1,92 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from application.main import app
+from application.models import TaskList
+from application.page_cache import PageCache, page_cache
+from infrastructure.database import SessionLocal
+
+
+def test_cache_evicts_by_bytes_and_skips_large_pages():
+    cache = PageCache(max_bytes=10, max_entries=10, max_entry_bytes=6)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    cache.get("a")
+    cache.set("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"aaaa"
+    assert cache.size == 8
+
+    page = cache.set("big", b"x" * 7)
+    assert page.etag and cache.get("big") is None
+
+
+def test_dashboard_is_cached_until_a_task_changes(count_queries, login):
+    client, _ = login()
+    client.post("/create_task", data={"title": "Cached task"}, follow_redirects=False)
+    first = client.get("/dashboard")
+    etag = first.headers["ETag"]
+
+    with count_queries() as statements:
+        again = client.get("/dashboard")
+    assert again.content == first.content
+    assert len(statements) == 1  # the version check only
+
+    not_modified = client.get("/dashboard", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    client.post("/create_task", data={"title": "Second task"}, follow_redirects=False)
+    changed = client.get("/dashboard", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert b"Second task" in changed.content
+    assert changed.headers["ETag"] != etag
+
+
+def test_list_page_is_invalidated_by_tasks_and_shares(login):
+    owner, _ = login()
+    owner.post("/lists", data={"name": "Cached list"}, follow_redirects=False)
+    list_id = int(owner.get("/lists").text.split('href="/lists/')[1].split('"')[0])
+
+    first = owner.get(f"/lists/{list_id}")
+    hits = page_cache.hits
+    assert owner.get(f"/lists/{list_id}").content == first.content
+    assert page_cache.hits == hits + 1
+
+    owner.post(f"/lists/{list_id}/tasks", data={"title": "List item"}, follow_redirects=False)
+    assert b"List item" in owner.get(f"/lists/{list_id}").content
+
+    member_email = f"pagecache_member_{uuid.uuid4().hex[:8]}@example.com"
+    TestClient(app).post("/register", data={"email": member_email, "password": "password123"}, follow_redirects=False)
+    owner.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "read"}, follow_redirects=False)
+    assert member_email.encode() in owner.get(f"/lists/{list_id}").content
+
+
+def test_bad_dashboard_cursors_are_rejected_uncached(login):
+    client, _ = login()
+    entries = len(page_cache)
+    for cursor in ("junk", "more-junk"):
+        assert client.get("/dashboard", params={"cursor": cursor}).status_code == 400
+    assert len(page_cache) == entries
+
+
+def test_list_version_follows_rendered_columns_only():
+    db = SessionLocal()
+    task_list = TaskList(name="Versioned list")
+    db.add(task_list)
+    db.commit()
+    db.refresh(task_list)
+    version = task_list.content_version
+
+    task_list.chain_status = "pending"
+    task_list.chain_tx_hash = "0x" + "ab" * 32
+    db.commit()
+    db.refresh(task_list)
+    assert task_list.content_version == version
+
+    task_list.name = "Renamed list"
+    db.commit()
+    db.refresh(task_list)
+    assert task_list.content_version == version + 1
+    db.close()
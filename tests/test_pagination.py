@@ -0,0 +1,46 @@
+import uuid
+from fastapi.testclient import TestClient
+from application.main import app
+from application.pagination import encode_cursor, decode_cursor
+from application.models import Task
+from datetime import datetime
+
+client = TestClient(app)
+
+
+def _create_user():
+    email = f"pager_{uuid.uuid4().hex[:8]}@example.com"
+    response = client.post("/users", json={"email": email, "password": "password123"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_cursor_round_trip():
+    task = Task(id=42, created_at=datetime(2025, 1, 2, 3, 4, 5, 6))
+    assert decode_cursor(encode_cursor(task)) == (task.created_at, 42)
+
+
+def test_tasks_endpoint_walks_pages_with_cursor():
+    user_id = _create_user()
+    for i in range(5):
+        client.post(f"/users/{user_id}/tasks", json={"title": f"Task {i}"})
+
+    titles = []
+    url = f"/users/{user_id}/tasks?limit=2"
+    pages = 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        titles.extend(task["title"] for task in response.json())
+        pages += 1
+        next_cursor = response.headers.get("X-Next-Cursor")
+        url = f"/users/{user_id}/tasks?limit=2&cursor={next_cursor}" if next_cursor else None
+
+    assert pages == 3
+    assert titles == [f"Task {i}" for i in range(5)]
+
+
+def test_tasks_endpoint_rejects_bad_cursor():
+    user_id = _create_user()
+    response = client.get(f"/users/{user_id}/tasks?cursor=not-a-cursor")
+    assert response.status_code == 400
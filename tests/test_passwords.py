@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from application import passwords
+from application.main import app
+from application.passwords import PasswordService, PasswordServiceBusy
+
+client = TestClient(app)
+
+
+def test_hash_and_verify_on_pool():
+    service = PasswordService(rounds=4, workers=1)
+
+    async def run():
+        hashed = await service.hash("secret123")
+        return hashed, await service.verify_and_update("secret123", hashed), await service.verify_and_update("wrong", hashed)
+
+    hashed, (valid, new_hash), (invalid, _) = asyncio.run(run())
+    service.shutdown()
+    assert hashed.startswith("$2b$04$")
+    assert valid and new_hash is None
+    assert not invalid
+
+
+def test_verify_returns_rehash_when_cost_changes():
+    old_hash = passwords._hash("secret123", 4)
+    service = PasswordService(rounds=5, workers=1)
+    valid, new_hash = asyncio.run(service.verify_and_update("secret123", old_hash))
+    service.shutdown()
+    assert valid
+    assert new_hash.startswith("$2b$05$")
+
+
+def test_full_queue_raises_busy():
+    service = PasswordService(rounds=4, workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run():
+        blocker = asyncio.ensure_future(service._submit(release.wait))
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(PasswordServiceBusy):
+                await service.hash("secret123")
+        finally:
+            release.set()
+            await blocker
+
+    asyncio.run(run())
+    service.shutdown()
+    assert service.pending == 0
+
+
+def test_login_returns_429_when_pool_is_saturated(monkeypatch):
+    email = f"busy_{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+
+    async def busy(*args, **kwargs):
+        raise PasswordServiceBusy()
+
+    monkeypatch.setattr(passwords.password_service, "verify_and_update", busy)
+    response = client.post("/login", data={"email": email, "password": "password123"}, follow_redirects=False)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
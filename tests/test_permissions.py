@@ -0,0 +1,72 @@
+import uuid
+
+from sqlalchemy import event
+
+from application import permissions
+from application.identity import CurrentUser
+from application.models import TaskList
+from infrastructure.database import SessionLocal, engine
+
+
+def _create_list(client):
+    client.post("/lists", data={"name": f"List {uuid.uuid4().hex[:6]}"}, follow_redirects=False)
+    db = SessionLocal()
+    try:
+        return db.query(TaskList).order_by(TaskList.id.desc()).first().id
+    finally:
+        db.close()
+
+
+def test_roles_are_enforced(login):
+    owner, _ = login()
+    member, member_email = login()
+    list_id = _create_list(owner)
+
+    assert member.get(f"/lists/{list_id}").status_code == 403
+
+    owner.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "read"}, follow_redirects=False)
+    assert member.get(f"/lists/{list_id}").status_code == 200
+    response = member.post(f"/lists/{list_id}/tasks", data={"title": "Nope"}, follow_redirects=False)
+    assert response.status_code == 403
+
+    # Re-sharing updates the existing row instead of adding a duplicate
+    owner.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "write"}, follow_redirects=False)
+    response = member.post(f"/lists/{list_id}/tasks", data={"title": "Yes"}, follow_redirects=False)
+    assert response.status_code == 302
+
+    response = member.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "admin"}, follow_redirects=False)
+    assert response.status_code == 403
+
+
+def test_share_rejects_unknown_role(login):
+    owner, _ = login()
+    _, member_email = login()
+    list_id = _create_list(owner)
+    response = owner.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "superuser"}, follow_redirects=False)
+    assert response.status_code == 400
+
+
+def test_access_check_is_a_single_statement(login):
+    owner, _ = login()
+    list_id = _create_list(owner)
+    db = SessionLocal()
+    owner_id = db.get(TaskList, list_id).owner_id
+    user = CurrentUser(id=owner_id, email="", is_admin=False, is_verified=False, created_at=None)
+    db.expunge_all()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        access = permissions.get_list_access(db, list_id, user)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+    assert access.role == permissions.OWNER
+    assert access.allows(permissions.WRITE)
+    assert not permissions.get_list_access(db, 10 ** 9, user).exists
+    db.close()
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from application.main import app
+from application.models import TaskList
+from application.realtime import (
+    BroadcastHub,
+    Broker,
+    BrokerBackplane,
+    Coalescer,
+    SLOW_CONSUMER_CLOSE_CODE,
+    merge_ops,
+    parse_op,
+)
+from infrastructure.database import SessionLocal
+
+
+class FakeWebSocket:
+    def __init__(self, stall=False):
+        self.sent = []
+        self.closed_with = None
+        self._stall = asyncio.Event() if stall else None
+
+    async def send_text(self, message):
+        if self._stall is not None:
+            await self._stall.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def test_publish_reaches_peers_but_not_sender():
+    async def run():
+        hub = BroadcastHub()
+        alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        a = await hub.join(1, alice)
+        await hub.join(1, bob)
+        await hub.join(2, carol)
+        await hub.publish(1, "hello", sender=a)
+        await asyncio.sleep(0.01)
+        return alice.sent[1:], bob.sent[1:], carol.sent[1:]
+
+    assert asyncio.run(run()) == ([], ["hello"], [])
+
+
+def test_merge_ops_drops_superseded_state():
+    add = {"op": "task.add", "client_id": "c", "title": "a"}
+    assert merge_ops(add, {"op": "task.complete", "client_id": "c"}) == {
+        "op": "task.add", "client_id": "c", "title": "a", "completed": True,
+    }
+    edit = merge_ops({"op": "task.complete", "task_id": 1}, {"op": "task.edit", "task_id": 1, "title": "b"})
+    assert edit == {"op": "task.edit", "task_id": 1, "title": "b", "completed": True}
+
+
+def test_coalescer_batches_a_burst_into_one_frame():
+    async def run():
+        frames = []
+
+        async def flush(room, frame):
+            frames.append((room, frame))
+
+        coalescer = Coalescer(flush, window=0.01)
+        for i in range(50):
+            coalescer.add(1, {"op": "task.edit", "task_id": i % 5, "title": f"v{i}"})
+        await asyncio.sleep(0.05)
+        return frames, coalescer.superseded
+
+    frames, superseded = asyncio.run(run())
+    assert len(frames) == 1
+    assert superseded == 45
+    ops = json.loads(frames[0][1])["ops"]
+    assert [op["title"] for op in ops] == ["v45", "v46", "v47", "v48", "v49"]
+
+
+def test_slow_consumer_is_evicted_without_stalling_room():
+    async def run():
+        hub = BroadcastHub(queue_size=2)
+        slow, fast = FakeWebSocket(stall=True), FakeWebSocket()
+        await hub.join(1, slow)
+        await hub.join(1, fast)
+        for i in range(5):
+            await hub.publish(1, f"m{i}")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        return hub, slow, fast
+
+    hub, slow, fast = asyncio.run(run())
+    assert fast.sent[1:] == [f"m{i}" for i in range(5)]
+    assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert hub.evicted == 1
+    assert len(hub.rooms[1]) == 1
+
+
+def test_broker_backplane_spans_hubs():
+    async def run():
+        broker = Broker()
+        port = await broker.start()
+        worker_a = BroadcastHub(BrokerBackplane("127.0.0.1", port))
+        worker_b = BroadcastHub(BrokerBackplane("127.0.0.1", port))
+        sender_ws, peer_ws = FakeWebSocket(), FakeWebSocket()
+        sender = await worker_a.join(7, sender_ws)
+        await worker_b.join(7, peer_ws)
+        await worker_a.publish(7, "across workers", sender=sender)
+        for _ in range(100):
+            if len(peer_ws.sent) > 1:
+                break
+            await asyncio.sleep(0.01)
+        await worker_a.stop()
+        await worker_b.stop()
+        await broker.stop()
+        return sender_ws.sent[1:], peer_ws.sent[1:]
+
+    assert asyncio.run(run()) == ([], ["across workers"])
+
+
+def test_broker_drops_oversized_frames_only():
+    async def run():
+        broker = Broker(frame_limit=1024)
+        port = await broker.start()
+        reader, subscriber = await asyncio.open_connection("127.0.0.1", port)
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        while len(broker.subscribers) < 2:
+            await asyncio.sleep(0.01)
+        writer.write(b"x" * 5000 + b"\n" + b'{"ok": 1}\n')
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout=5)
+        subscriber.close()
+        writer.close()
+        await broker.stop()
+        return line
+
+    assert asyncio.run(run()) == b'{"ok": 1}\n'
+
+
+def test_ops_are_size_limited():
+    with pytest.raises(ValueError):
+        parse_op(json.dumps({"op": "task.edit", "task_id": 1, "description": "x" * 2001}))
+
+
+def test_list_socket_requires_access_and_relays():
+    with TestClient(app) as owner:
+        email = f"ws_{uuid.uuid4().hex[:8]}@example.com"
+        owner.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+        owner.post("/lists", data={"name": "Live list"}, follow_redirects=False)
+        db = SessionLocal()
+        list_id = db.query(TaskList).order_by(TaskList.id.desc()).first().id
+        db.close()
+
+        with owner.websocket_connect(f"/ws/list/{list_id}") as first, \
+                owner.websocket_connect(f"/ws/list/{list_id}") as second:
+            first_id = first.receive_json()["connection_id"]
+            assert second.receive_json()["type"] == "hello"
+
+            first.send_text("ping")
+            assert first.receive_json()["type"] == "error"
+
+            first.send_json({"op": "task.add", "client_id": "c1", "title": "Draft"})
+            first.send_json({"op": "task.edit", "client_id": "c1", "title": "Final"})
+            first.send_json({"op": "task.complete", "task_id": 3})
+            batch = second.receive_json()
+            assert batch == {"type": "batch", "ops": [
+                {"op": "task.add", "client_id": "c1", "title": "Final", "by": first_id},
+                {"op": "task.complete", "task_id": 3, "by": first_id},
+            ]}
+
+    with TestClient(app) as stranger:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with stranger.websocket_connect(f"/ws/list/{list_id}"):
+                pass
+        assert closed.value.code == 1008
+
+
+def test_read_only_members_cannot_send_ops():
+    owner_email = f"ws_{uuid.uuid4().hex[:8]}@example.com"
+    member_email = f"ws_{uuid.uuid4().hex[:8]}@example.com"
+    # One client (and event loop) for both users: a socket keeps the session it connected with
+    with TestClient(app) as client:
+        client.post("/register", data={"email": member_email, "password": "password123"}, follow_redirects=False)
+        client.post("/register", data={"email": owner_email, "password": "password123"}, follow_redirects=False)
+        name = f"Shared live list {uuid.uuid4().hex[:6]}"
+        client.post("/lists", data={"name": name}, follow_redirects=False)
+        db = SessionLocal()
+        list_id = db.query(TaskList).filter(TaskList.name == name).one().id
+        db.close()
+        client.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "read"}, follow_redirects=False)
+
+        with client.websocket_connect(f"/ws/list/{list_id}") as writer:
+            writer_id = writer.receive_json()["connection_id"]
+            client.post("/login", data={"email": member_email, "password": "password123"}, follow_redirects=False)
+            with client.websocket_connect(f"/ws/list/{list_id}") as reader:
+                assert reader.receive_json()["type"] == "hello"
+                reader.send_json({"op": "task.complete", "task_id": 1})
+                assert reader.receive_json() == {"type": "error", "detail": "Read-only access to this list"}
+                writer.send_json({"op": "task.complete", "task_id": 2})
+                assert reader.receive_json() == {
+                    "type": "batch", "ops": [{"op": "task.complete", "task_id": 2, "by": writer_id}]
+                }
@@ -0,0 +1,85 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert, text
+
+from application.main import app
+from application.models import Task
+from infrastructure import database
+from infrastructure.replicas import ReplicaSet, RoutingSession
+
+
+def _replica():
+    # A second engine on the test database stands in for a replica
+    return create_engine(database.DB_URL)
+
+
+def test_replicas_round_robin_and_skip_unhealthy():
+    first, second = _replica(), _replica()
+    replicas = ReplicaSet([first, second], retry_after=60)
+    assert [replicas.choose() for _ in range(4)] == [first, second, first, second]
+
+    replicas.mark_down(first)
+    assert {replicas.choose() for _ in range(4)} == {second}
+    replicas.mark_down(second)
+    assert replicas.choose() is None
+
+
+def test_connection_failure_marks_replica_down():
+    broken = create_engine("sqlite:///file:/nonexistent/replica.db?mode=ro&uri=true")
+    replicas = ReplicaSet([broken], retry_after=60)
+    try:
+        with broken.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        pass
+    assert not replicas.is_healthy(broken)
+    session = RoutingSession(primary=database.engine, replicas=replicas, read_only=True)
+    assert session.get_bind() is database.engine
+
+
+def test_failed_replica_read_is_retried_on_primary():
+    broken = create_engine("sqlite:///file:/nonexistent/replica.db?mode=ro&uri=true")
+    # Not yet known to be down, so the first read is sent to it
+    session = RoutingSession(primary=database.engine, replicas=ReplicaSet([broken]), read_only=True)
+    try:
+        assert session.get_bind() is broken
+        assert session.execute(text("SELECT 1")).scalar() == 1
+        assert session.get_bind() is database.engine
+    finally:
+        session.close()
+
+
+def test_writes_stay_on_primary():
+    replica = _replica()
+    session = RoutingSession(primary=database.engine, replicas=ReplicaSet([replica]), read_only=True)
+    try:
+        assert session.get_bind() is replica
+        assert session.get_bind(clause=insert(Task)) is database.engine
+        session.add(Task(title="Replica routing"))
+        session.flush()
+        # Read-after-write within the session goes to the primary
+        assert session.get_bind() is database.engine
+    finally:
+        session.rollback()
+        session.close()
+    assert RoutingSession(primary=database.engine, replicas=ReplicaSet([replica])).get_bind() is database.engine
+
+
+def test_read_routes_use_replica_until_the_session_writes(monkeypatch):
+    replica = _replica()
+    monkeypatch.setitem(database.ReadSessionLocal.kw, "replicas", ReplicaSet([replica]))
+    statements = []
+    event.listen(replica, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    client = TestClient(app)
+    assert client.get("/analytics/dau").status_code == 200
+    assert statements
+
+    email = f"replica_{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/register", data={"email": email, "password": "password123"}, follow_redirects=False)
+    client.post("/create_task", data={"title": "Fresh"}, follow_redirects=False)
+    statements.clear()
+    response = client.get("/dashboard")
+    assert b"Fresh" in response.content
+    assert not statements
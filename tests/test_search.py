@@ -0,0 +1,91 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from application import search
+from application.main import app
+from application.models import Task, TaskList
+from infrastructure.database import SessionLocal
+
+
+def _word():
+    # A token no other test uses
+    return "zq" + uuid.uuid4().hex[:10]
+
+
+def _create(client, *tasks, **fields):
+    body = {"create": [dict(fields, title=title, description=description) for title, description in tasks]}
+    return [r["task_id"] for r in client.post("/tasks/bulk", json=body).json()["results"]]
+
+
+def _search(client, q, **params):
+    return client.get("/tasks/search", params=dict(params, q=q))
+
+
+def test_title_matches_rank_first_and_prefixes_match(login):
+    client, _ = login()
+    word = _word()
+    in_description, in_title = _create(client, ("Weekly chores", f"buy {word}s"), (f"{word}s shopping", None))
+    results = _search(client, f"{word}").json()["results"]
+    assert [task["id"] for task in results] == [in_title, in_description]
+    assert [task["id"] for task in _search(client, f"chore {word[:6]}").json()["results"]] == [in_description]
+
+
+def test_results_are_permission_filtered(login):
+    owner, _ = login()
+    member, member_email = login()
+    stranger, _ = login()
+    word = _word()
+    owner.post("/lists", data={"name": f"Shared {word}"}, follow_redirects=False)
+    db = SessionLocal()
+    list_id = db.scalar(select(TaskList.id).where(TaskList.name == f"Shared {word}"))
+    db.close()
+    owner.post(f"/lists/{list_id}/share", data={"email": member_email, "role": "read"}, follow_redirects=False)
+    shared, private = _create(owner, (f"{word} shared", None), (f"{word} private", None), list_id=None)
+    owner.post("/tasks/bulk", json={"move": [{"task_id": shared, "list_id": list_id}]})
+
+    assert {t["id"] for t in _search(owner, word).json()["results"]} == {shared, private}
+    assert [t["id"] for t in _search(member, word).json()["results"]] == [shared]
+    assert _search(stranger, word).json()["results"] == []
+
+
+def test_index_follows_updates_and_deletes(login):
+    client, _ = login()
+    old, new = _word(), _word()
+    [task_id] = _create(client, (f"{old} title", None))
+    db = SessionLocal()
+    db.get(Task, task_id).title = f"{new} title"
+    db.commit()
+    db.close()
+    assert _search(client, old).json()["results"] == []
+    assert [t["id"] for t in _search(client, new).json()["results"]] == [task_id]
+
+    client.delete(f"/tasks/{task_id}")
+    assert _search(client, new).json()["results"] == []
+
+
+def test_paging_and_bad_input(login):
+    client, _ = login()
+    word = _word()
+    ids = _create(client, *[(f"{word} {i}", None) for i in range(5)])
+    first = _search(client, word, limit=3).json()
+    second = _search(client, word, limit=3, cursor=first["next_cursor"]).json()
+    assert second["next_cursor"] is None
+    assert sorted(t["id"] for t in first["results"] + second["results"]) == ids
+
+    assert _search(client, '"unbalanced AND (').status_code == 200
+    assert _search(client, "  ** ").status_code == 400
+    assert _search(client, word, cursor="-1").status_code == 400
+    assert TestClient(app).get("/tasks/search", params={"q": word}).status_code == 401
+
+
+def test_like_fallback_matches_the_same_tasks(login):
+    client, _ = login()
+    word = _word()
+    ids = _create(client, (f"{word} one", None), ("two", f"about {word}_x"))
+    db = SessionLocal()
+    owner_id = db.get(Task, ids[0]).user_id
+    rows = db.scalars(search.search_statement(search.LIKE, owner_id, [word], 0, 10)).all()
+    db.close()
+    assert sorted(task.id for task in rows) == ids
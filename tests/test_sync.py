@@ -0,0 +1,72 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+
+from application import sync
+from application.main import app
+from application.models import Task
+from infrastructure.database import SessionLocal, engine
+
+
+def _task_count(client_ids):
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(Task).where(Task.client_id.in_(client_ids)))
+    finally:
+        db.close()
+
+
+def test_sync_requires_login():
+    response = TestClient(app).post("/sync_tasks", json={"tasks": []})
+    assert response.status_code == 401
+
+
+def test_sync_is_idempotent_and_reports_each_item(login):
+    client, _ = login()
+    first, second = uuid.uuid4().hex, uuid.uuid4().hex
+    tasks = [
+        {"client_id": first, "title": "Offline one", "created_at": "2024-01-02T03:04:05Z"},
+        {"client_id": second, "title": "Offline two", "completed": True},
+        {"client_id": first, "title": "Offline one again"},
+        {"client_id": "bad", "title": ""},
+    ]
+    data = client.post("/sync_tasks", json={"tasks": tasks}).json()
+    assert data["status"] == "partial"
+    assert [r["status"] for r in data["results"]] == ["created", "created", "duplicate", "invalid"]
+    assert data["results"][2]["task_id"] == data["results"][0]["task_id"]
+    assert "title" in data["results"][3]["error"]
+
+    retry = client.post("/sync_tasks", json={"tasks": tasks[:2]}).json()
+    assert retry["status"] == "success"
+    assert [r["status"] for r in retry["results"]] == ["duplicate", "duplicate"]
+    assert [r["task_id"] for r in retry["results"]] == [r["task_id"] for r in data["results"][:2]]
+    assert _task_count([first, second]) == 2
+
+
+def test_sync_accepts_ndjson_in_chunks(monkeypatch, login):
+    monkeypatch.setattr(sync, "SYNC_CHUNK_SIZE", 10)
+    client, _ = login()
+    client_ids = [uuid.uuid4().hex for _ in range(25)]
+    lines = [json.dumps({"client_id": cid, "title": f"Task {i}"}) for i, cid in enumerate(client_ids)]
+    lines.insert(5, "{not json")
+    body = "\n".join(lines) + "\n"
+
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO tasks"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/sync_tasks", content=body, headers={"Content-Type": "application/x-ndjson"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    data = response.json()
+    assert data["created"] == 25 and data["invalid"] == 1
+    assert data["results"][5]["status"] == "invalid"
+    assert len(inserts) == 3
+    assert _task_count(client_ids) == 25